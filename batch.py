@@ -0,0 +1,27 @@
+import json
+
+# Largest ID list a batch tool accepts in one call
+MAX_BATCH_IDS = 1000
+
+# Up to this many IDs are bound as an IN list; longer lists are passed as one
+# JSON array and probed through json_each(), which needs no temp table (the
+# pooled connections are read-only) and stays clear of SQLite's variable limit.
+IN_LIST_THRESHOLD = 100
+
+# Set-returning function that unpacks the JSON array, per backend (backends.py)
+JSON_IDS = {
+    "sqlite": "SELECT value FROM json_each(:ids)",
+    "postgres": "SELECT value FROM json_array_elements_text(CAST(:ids AS json))",
+}
+
+
+def batch_query(query: str, ids: list[str], dialect: str = "sqlite") -> tuple[str, dict, list[str]]:
+    """Render a ``{ids}`` batch query; returns (sql, parameters, deduplicated ids)"""
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > MAX_BATCH_IDS:
+        raise ValueError(f"at most {MAX_BATCH_IDS} ids per call, got {len(ids)}")
+    if len(ids) <= IN_LIST_THRESHOLD:
+        params = {f"id_{i}": value for i, value in enumerate(ids)}
+        placeholders = ", ".join(f":{name}" for name in params) or "NULL"
+        return query.format(ids=placeholders), params, ids
+    return query.format(ids=JSON_IDS[dialect]), {"ids": json.dumps(ids)}, ids
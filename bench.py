@@ -0,0 +1,416 @@
+"""Load benchmarks and trace replay for the MCP claims server.
+
+load    Generates (once) a dataset of a preset size, starts mcp_test_server.py
+        on it over a transport (stdio), and drives every registered tool at
+        each requested concurrency. Reports p50/p95/p99 latency per tool and
+        overall, throughput, and the server's RSS.
+replay  Replays a recorded trace of real agent tool calls, either at the
+        recorded pace or as fast as the concurrency allows.
+compare Checks a result file against a baseline.
+
+To record a trace, run the server with CLAIMS_TRACE_FILE=<path> set, e.g.
+through "env" in the agent's MultiServerMCPClient config. Every tool call
+is then appended to that file as one JSON line.
+
+Results are JSON files. With --baseline, a run is compared against a
+stored baseline and the exit status is 1 if a tool got slower, throughput
+or memory regressed, or a tool query's plan changed for the worse.
+
+    python bench.py load --dataset small --concurrency 1 8 32 --save-baseline
+    python bench.py load --dataset small --concurrency 1 8 32 --baseline bench_baselines/load-small.json
+    python bench.py replay traces/agent.jsonl --db claims.db --speed 1
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from generate_data import DEFAULT_COUNTS, generate
+from indexes import query_plan
+from pagination import KEYSETS, page_query
+from queries import QUERIES
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mcp_test_server.py")
+DATA_DIR = "bench_data"
+RESULTS_DIR = "bench_results"
+BASELINE_DIR = "bench_baselines"
+
+# Dataset presets: overrides of generate_data.DEFAULT_COUNTS
+DATASETS = {
+    "small": {"users": 2_000, "policies": 2_400, "claims": 20_000, "pre_authorizations": 1_000,
+              "communications": 6_000},
+    "medium": {"users": 20_000, "policies": 24_000, "claims": 200_000, "pre_authorizations": 10_000,
+               "communications": 60_000},
+    "large": {},
+}
+# IDs sampled from the dataset to build tool arguments
+SAMPLE_IDS = 200
+BATCH_IDS = 10
+# Search text for the full-text search tools
+SEARCH_TERMS = ["routine", "prescription", "claim status", "synthetic event", "reimbursement"]
+
+# Regression thresholds used by compare
+LATENCY_TOLERANCE = 0.20  # relative p95 increase
+LATENCY_FLOOR_MS = 1.0    # ignore increases smaller than this
+THROUGHPUT_TOLERANCE = 0.15
+RSS_TOLERANCE = 0.25
+
+
+def dataset_path(name: str) -> str:
+    return os.path.join(DATA_DIR, f"{name}.db")
+
+
+def ensure_dataset(name: str, seed: int = 0, workers: int = 1) -> str:
+    """Path of the preset dataset, generating it on first use"""
+    path = dataset_path(name)
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        print(f"generating dataset {name} at {path}")
+        generate(path, {**DEFAULT_COUNTS, **DATASETS[name]}, seed=seed, workers=workers)
+    return path
+
+
+def table_counts(db: str) -> dict:
+    conn = sqlite3.connect(f"file:{db}?mode=ro", uri=True)
+    try:
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        return {table: conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] for table in tables}
+    finally:
+        conn.close()
+
+
+def tool_query_plans(db: str) -> dict:
+    """EXPLAIN QUERY PLAN of every tool query on ``db``, seek pages included"""
+    conn = sqlite3.connect(f"file:{db}?mode=ro", uri=True)
+    try:
+        plans = {}
+        for tool, query in QUERIES.items():
+            if tool in KEYSETS:
+                plans[tool] = query_plan(conn, page_query(tool, query, seek=False))
+                plans[f"{tool}[seek]"] = query_plan(conn, page_query(tool, query, seek=True))
+            else:
+                plans[tool] = query_plan(conn, query)
+        return plans
+    finally:
+        conn.close()
+
+
+def sample_ids(db: str, seed: int = 0) -> dict:
+    """Random IDs per argument name, drawn from the dataset"""
+    conn = sqlite3.connect(f"file:{db}?mode=ro", uri=True)
+    rng = random.Random(seed)
+    sources = {
+        "user_id": "users",
+        "provider_id": "insurance_providers",
+        "policy_id": "policies",
+        "claim_id": "claims",
+    }
+    try:
+        ids = {}
+        for column, table in sources.items():
+            # Seek to random rowids so sampling never reads the table whole
+            top = conn.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0] or 0
+            picks = {rng.randint(1, top) for _ in range(SAMPLE_IDS)} if top else set()
+            ids[column] = sorted({
+                row[0] for pick in sorted(picks)
+                for row in conn.execute(f"SELECT {column} FROM {table} WHERE rowid >= ? LIMIT 1", (pick,))
+            })
+        ids["query"] = SEARCH_TERMS
+        return ids
+    finally:
+        conn.close()
+
+
+def tool_arguments(tool, ids: dict, rng: random.Random) -> dict | None:
+    """Arguments for one call of ``tool``, or None if its required inputs can't be filled"""
+    schema = tool.inputSchema or {}
+    arguments = {}
+    for name in schema.get("properties", {}):
+        if name in ids and ids[name]:
+            arguments[name] = rng.choice(ids[name])
+        elif name.endswith("_ids") and ids.get(name[:-1]):
+            arguments[name] = rng.sample(ids[name[:-1]], min(BATCH_IDS, len(ids[name[:-1]])))
+        elif name in schema.get("required", []):
+            return None
+    return arguments
+
+
+@contextlib.asynccontextmanager
+async def stdio_session(db: str, env: dict | None = None):
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    params = StdioServerParameters(
+        command=sys.executable,
+        args=[SERVER],
+        env={**os.environ, **(env or {}), "CLAIMS_DB_PATH": os.path.abspath(db)},
+        cwd=os.path.dirname(SERVER),
+    )
+    with open(os.devnull, "w") as errlog:
+        async with stdio_client(params, errlog=errlog) as (read, write), ClientSession(read, write) as session:
+            await session.initialize()
+            yield session
+
+
+# Transport name -> async context manager yielding an initialized ClientSession
+TRANSPORTS = {"stdio": stdio_session}
+
+
+def percentiles(samples: list[float]) -> dict:
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    values = np.asarray(samples)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3),
+            "mean": round(float(values.mean()), 3), "max": round(float(values.max()), 3)}
+
+
+async def drive(session, calls: list[tuple], concurrency: int, paced: bool = False, speed: float = 1.0) -> dict:
+    """Run ``calls`` of (offset seconds, tool, arguments) and summarize the latencies.
+
+    Unpaced calls are issued as fast as ``concurrency`` allows; paced calls
+    start at their recorded offsets divided by ``speed``.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = {}
+    errors = {}
+    start = time.perf_counter()
+
+    async def call(offset, tool, arguments):
+        if paced:
+            delay = offset / speed - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        async with semaphore:
+            began = time.perf_counter()
+            try:
+                result = await session.call_tool(tool, arguments)
+                failed = result.isError
+            except Exception:
+                failed = True
+            latencies.setdefault(tool, []).append((time.perf_counter() - began) * 1000)
+            errors[tool] = errors.get(tool, 0) + failed
+
+    await asyncio.gather(*(call(*c) for c in calls))
+    wall = time.perf_counter() - start
+    every = [ms for samples in latencies.values() for ms in samples]
+    return {
+        "concurrency": concurrency,
+        "calls": len(calls),
+        "errors": sum(errors.values()),
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(calls) / wall, 2) if wall else None,
+        "latency_ms": percentiles(every),
+        "tools": {
+            tool: {"calls": len(samples), "errors": errors[tool], **percentiles(samples)}
+            for tool, samples in sorted(latencies.items())
+        },
+    }
+
+
+async def server_memory(session) -> dict:
+    result = await session.call_tool("server_stats", {})
+    try:
+        return json.loads(result.content[0].text)["process"]
+    except (IndexError, KeyError, ValueError, AttributeError):
+        return {}
+
+
+async def run_load(db: str, transport: str, concurrency: list[int], calls_per_tool: int, tools: list[str] | None,
+                   seed: int = 0) -> list[dict]:
+    ids = sample_ids(db, seed)
+    rng = random.Random(seed)
+    runs = []
+    async with TRANSPORTS[transport](db) as session:
+        listed = (await session.list_tools()).tools
+        selected = [t for t in listed if tools is None or t.name in tools]
+        skipped = []
+        for level in concurrency:
+            calls = []
+            for _ in range(calls_per_tool):
+                for tool in selected:
+                    arguments = tool_arguments(tool, ids, rng)
+                    if arguments is None:
+                        if tool.name not in skipped:
+                            skipped.append(tool.name)
+                        continue
+                    calls.append((0.0, tool.name, arguments))
+            rng.shuffle(calls)
+            run = await drive(session, calls, level)
+            run["process"] = await server_memory(session)
+            run["skipped_tools"] = skipped
+            runs.append(run)
+            latency = run["latency_ms"]
+            print(f"concurrency {level:>3}: {run['calls']} calls, {run['throughput_rps']} calls/s, "
+                  f"p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms, "
+                  f"{run['errors']} errors, rss {(run['process'].get('rss_bytes') or 0) / 2**20:.1f} MiB")
+    return runs
+
+
+def load_trace(path: str) -> list[tuple]:
+    """(offset seconds, tool, arguments) for each recorded call, in start order"""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                records.append((record["ts"], record["tool"], record.get("arguments") or {}))
+    records.sort(key=lambda r: r[0])
+    first = records[0][0] if records else 0.0
+    return [(ts - first, tool, arguments) for ts, tool, arguments in records]
+
+
+async def run_replay(db: str, transport: str, trace: list[tuple], concurrency: int, speed: float) -> list[dict]:
+    async with TRANSPORTS[transport](db) as session:
+        run = await drive(session, trace, concurrency, paced=speed > 0, speed=speed or 1.0)
+        run["process"] = await server_memory(session)
+    latency = run["latency_ms"]
+    print(f"replayed {run['calls']} calls in {run['wall_s']} s: p50 {latency['p50']} ms, "
+          f"p95 {latency['p95']} ms, p99 {latency['p99']} ms, {run['errors']} errors")
+    return [run]
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(SERVER), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _scans(plan: list[str]) -> int:
+    return sum(step.startswith("SCAN ") and "CONSTANT ROW" not in step for step in plan)
+
+
+def compare(current: dict, baseline: dict, tolerance: float = LATENCY_TOLERANCE) -> list[str]:
+    """Human-readable regressions of ``current`` against ``baseline``"""
+    regressions = []
+    base_runs = {run["concurrency"]: run for run in baseline.get("runs", [])}
+    for run in current.get("runs", []):
+        base = base_runs.get(run["concurrency"])
+        if base is None:
+            continue
+        label = f"concurrency {run['concurrency']}"
+        if base.get("throughput_rps") and run.get("throughput_rps") is not None and \
+                run["throughput_rps"] < base["throughput_rps"] * (1 - THROUGHPUT_TOLERANCE):
+            regressions.append(f"{label}: throughput {base['throughput_rps']} -> {run['throughput_rps']} calls/s")
+        base_rss = (base.get("process") or {}).get("peak_rss_bytes")
+        rss = (run.get("process") or {}).get("peak_rss_bytes")
+        if base_rss and rss and rss > base_rss * (1 + RSS_TOLERANCE):
+            regressions.append(f"{label}: peak RSS {base_rss / 2**20:.1f} -> {rss / 2**20:.1f} MiB")
+        for tool, stats in run["tools"].items():
+            before = base["tools"].get(tool, {}).get("p95")
+            after = stats.get("p95")
+            if before is not None and after is not None and \
+                    after > before * (1 + tolerance) and after - before > LATENCY_FLOOR_MS:
+                regressions.append(f"{label}: {tool} p95 {before} -> {after} ms")
+            if stats.get("errors") and not base["tools"].get(tool, {}).get("errors"):
+                regressions.append(f"{label}: {tool} now fails ({stats['errors']} errors)")
+    for tool, plan in current.get("plans", {}).items():
+        before = baseline.get("plans", {}).get(tool)
+        if before is not None and plan != before and _scans(plan) > _scans(before):
+            regressions.append(f"plan: {tool} now scans: {'; '.join(plan)}")
+    return regressions
+
+
+def report(result: dict, out: str | None, baseline: str | None, save_baseline: bool) -> int:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    out = out or os.path.join(RESULTS_DIR, f"{result['name']}-{stamp}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"results written to {out}")
+
+    status = 0
+    if baseline and os.path.exists(baseline):
+        with open(baseline, encoding="utf-8") as f:
+            regressions = compare(result, json.load(f))
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            status = 1
+        else:
+            print(f"no regressions against {baseline}")
+    if save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        target = os.path.join(BASELINE_DIR, f"{result['name']}.json")
+        with open(target, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"baseline saved to {target}")
+    return status
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def common(sub):
+        sub.add_argument("--dataset", choices=sorted(DATASETS), default="small")
+        sub.add_argument("--db", help="benchmark this database instead of a generated dataset")
+        sub.add_argument("--transport", choices=sorted(TRANSPORTS), default="stdio")
+        sub.add_argument("--out", help="result file (default: bench_results/<name>-<time>.json)")
+        sub.add_argument("--baseline", help="baseline file to flag regressions against")
+        sub.add_argument("--save-baseline", action="store_true", help="also store this run as the baseline")
+        sub.add_argument("--seed", type=int, default=0)
+
+    load = commands.add_parser("load", help="drive every tool at fixed concurrency levels")
+    common(load)
+    load.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    load.add_argument("--calls", type=int, default=20, help="calls per tool per concurrency level")
+    load.add_argument("--tools", nargs="+", help="only these tools")
+
+    replay = commands.add_parser("replay", help="replay a recorded tool-call trace")
+    replay.add_argument("trace")
+    common(replay)
+    replay.add_argument("--concurrency", type=int, default=8)
+    replay.add_argument("--speed", type=float, default=0.0,
+                        help="pace relative to the recording (2 = twice as fast); 0 replays without pauses")
+
+    check = commands.add_parser("compare", help="compare a result file with a baseline")
+    check.add_argument("result")
+    check.add_argument("baseline")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        with open(args.result, encoding="utf-8") as f:
+            current = json.load(f)
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(current, json.load(f))
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if regressions else 0)
+
+    db = args.db or ensure_dataset(args.dataset, seed=args.seed)
+    source = os.path.splitext(os.path.basename(db))[0] if args.db else args.dataset
+    if args.command == "load":
+        name = f"load-{source}"
+        runs = asyncio.run(run_load(db, args.transport, args.concurrency, args.calls, args.tools, args.seed))
+    else:
+        name = f"replay-{os.path.splitext(os.path.basename(args.trace))[0]}-{source}"
+        runs = asyncio.run(run_replay(db, args.transport, load_trace(args.trace), args.concurrency, args.speed))
+
+    result = {
+        "name": name,
+        "kind": args.command,
+        "dataset": source,
+        "transport": args.transport,
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "rows": table_counts(db),
+        "runs": runs,
+        "plans": tool_query_plans(db),
+    }
+    sys.exit(report(result, args.out, args.baseline, args.save_baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,426 @@
+"""Admission control for ad hoc SQL from the agent.
+
+Before a generated query runs, its ``EXPLAIN QUERY PLAN`` is costed against
+cached row-count estimates (and sqlite_stat1 fan-outs where ANALYZE has run):
+each SCAN visits the whole table, each SEARCH the rows one index key
+matches, and nested loops multiply. Then the query is
+
+- run as is, when it is cheap
+- run with an injected LIMIT, when it is cheap to plan but would return
+  more rows than a tool response should carry
+- queued on a background worker with a larger budget, when it is expensive
+- rejected, when even the background budget could not finish it
+
+Whatever is admitted still runs under a hard budget: a wall-clock deadline
+and a VM instruction cap enforced by the connection pool's progress
+handler, plus a cap on fetched rows.
+
+    guard = CostGuard(StatementRegistry(ConnectionPool("claims.db")))
+    outcome = guard.run(sql, params)   # {"status": "done" | "queued", ...}
+"""
+import contextvars
+import itertools
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+import sqlglot
+from sqlglot import exp
+
+from db_pool import QUERY_DEADLINE, QUERY_STEP_BUDGET, QueryBudgetExceeded, QueryTimeout
+
+# Estimated rows visited above which a query goes to the background queue
+QUEUE_COST = 500_000
+# Estimated rows visited above which a query is refused outright
+MAX_COST = 50_000_000
+# Estimated result rows above which an unbounded query gets a LIMIT
+MAX_RESULT_ROWS = 1000
+# Fallback selectivities when sqlite_stat1 has nothing for an index
+EQ_SELECTIVITY = 0.01
+RANGE_SELECTIVITY = 0.25
+# Background jobs kept for polling after they finish
+MAX_JOBS = 256
+# Minimum seconds between two index scans recounting one table's fan-outs
+RECOUNT_SECONDS = 30.0
+
+
+class Budget(NamedTuple):
+    seconds: float
+    steps: int      # SQLite VM instructions
+    rows: int       # rows fetched into the result
+
+
+INTERACTIVE = Budget(seconds=5.0, steps=200_000_000, rows=MAX_RESULT_ROWS)
+BACKGROUND = Budget(seconds=120.0, steps=10_000_000_000, rows=50_000)
+
+
+class QueryRejected(Exception):
+    """Raised for a query whose estimated cost is over MAX_COST"""
+
+
+class Admission(NamedTuple):
+    action: str     # "run", "limit", "queue" or "reject"
+    sql: str        # the SQL to execute (with the injected LIMIT for "limit")
+    cost: float     # estimated rows visited
+    rows: float     # estimated result rows
+    reason: str
+    plan: list[str]
+
+
+_SEARCH_COLUMNS = re.compile(r"\((.*)\)\s*$")
+_LOOP = re.compile(r"^(SCAN|SEARCH) (\w+)")
+_SUBPLAN = re.compile(r"^(?:MATERIALIZE|CO-ROUTINE) (\w+)")
+
+
+class TableStats:
+    """Row counts and index fan-outs, re-read only after a table changes.
+
+    Like the result cache, ``PRAGMA data_version`` tells cheaply whether any
+    other connection committed, and the table_versions change counters tell
+    which tables' numbers are stale. Row counts are estimated from
+    MAX(rowid), an index seek. Fan-outs come from sqlite_stat1 when ANALYZE
+    has run, and otherwise from one GROUP BY over the index. That scan runs
+    on a separate connection outside the lock, at most once per
+    ``recount_seconds`` per table. Meanwhile, admissions use the stale
+    number, or the fallback selectivities when there is none yet.
+    """
+
+    def __init__(self, path: str, recount_seconds: float = RECOUNT_SECONDS):
+        self.path = path
+        self.recount_seconds = recount_seconds
+        self._conn = self._connect()
+        self._lock = threading.Lock()
+        self._recount_conn = None
+        self._recount_lock = threading.Lock()
+        self._recounted = {}  # table -> time.monotonic() of its last recount
+        self._data_version = None
+        self._versions = {}
+        self._counts = {}    # table -> (version, row count)
+        self._fanouts = {}   # (index, key columns) -> (version, average rows per key)
+        self._indexes = {}   # index -> (table, columns, unique)
+        self._analyzed = {}  # index -> sqlite_stat1 rows per key prefix of length 1, 2, ...
+        self._stat_rows = {}  # table -> row count sqlite_stat1 recorded at the last ANALYZE
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+
+    def _refresh(self) -> None:
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+        try:
+            self._versions = dict(self._conn.execute("SELECT table_name, version FROM table_versions"))
+        except sqlite3.OperationalError:
+            # No change counters: any commit makes every number stale
+            self._versions = {}
+            self._counts.clear()
+            self._fanouts.clear()
+        self._analyzed, self._stat_rows = {}, {}
+        try:
+            for table, idx, stat in self._conn.execute("SELECT tbl, idx, stat FROM sqlite_stat1"):
+                counts = [int(n) for n in stat.split() if n.isdigit()]
+                if counts:
+                    self._stat_rows[table] = counts[0]
+                if idx is not None:
+                    self._analyzed[idx] = counts[1:]
+        except sqlite3.OperationalError:
+            pass
+        self._indexes = {}
+        tables = [row[0] for row in self._conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        for table in tables:
+            for _, name, unique, *_ in self._conn.execute(f'PRAGMA index_list("{table}")'):
+                columns = [row[2] for row in self._conn.execute(f'PRAGMA index_info("{name}")')]
+                self._indexes[name] = (table, columns, bool(unique))
+
+    def _recount(self, cache: dict, key, table: str, sql: str, load):
+        """Cached value while ``table`` is unchanged; otherwise rerun ``sql`` off the lock.
+
+        Called with the lock held; returns with it held. A stale value is
+        kept until the table's last recount is ``recount_seconds`` old, and
+        while another thread is recounting.
+        """
+        version = self._versions.get(table)
+        cached = cache.get(key)
+        if cached is not None and version is not None and cached[0] == version:
+            return cached[1]
+        stale = cached[1] if cached is not None else None
+        if stale is not None and time.monotonic() - self._recounted.get(table, float("-inf")) < self.recount_seconds:
+            return stale
+        if not self._recount_lock.acquire(blocking=False):
+            return stale
+        self._lock.release()
+        try:
+            if self._recount_conn is None:
+                self._recount_conn = self._connect()
+            value = load(self._recount_conn.execute(sql).fetchone())
+        finally:
+            self._recount_lock.release()
+            self._lock.acquire()
+        cache[key] = (version, value)
+        self._recounted[table] = time.monotonic()
+        return value
+
+    def row_count(self, table: str) -> int | None:
+        """Estimated rows in ``table``, or None if there is no such table"""
+        with self._lock:
+            self._refresh()
+            version = self._versions.get(table)
+            cached = self._counts.get(table)
+            if cached is not None and version is not None and cached[0] == version:
+                return cached[1]
+            try:
+                # The largest rowid is one seek and matches the count until rows are deleted
+                count = self._conn.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()[0] or 0
+            except sqlite3.OperationalError:
+                if table in self._stat_rows:
+                    count = self._stat_rows[table]
+                else:
+                    # WITHOUT ROWID and never analyzed: count it, off the lock and rate-limited
+                    try:
+                        return self._recount(self._counts, table, table, f'SELECT COUNT(*) FROM "{table}"',
+                                             lambda row: row[0])
+                    except sqlite3.OperationalError:
+                        return None
+            self._counts[table] = (version, count)
+            return count
+
+    def fanout(self, index: str, columns: int) -> float | None:
+        """Average rows matching equality on the first ``columns`` columns of ``index``"""
+        with self._lock:
+            self._refresh()
+            if index not in self._indexes:
+                return None
+            table, index_columns, unique = self._indexes[index]
+            if unique and columns >= len(index_columns):
+                return 1.0
+            analyzed = self._analyzed.get(index)
+            if analyzed and len(analyzed) >= columns:
+                return float(analyzed[columns - 1])
+            keys = ", ".join(f'"{column}"' for column in index_columns[:columns])
+            # The GROUP BY walks the index in order, so this is one index scan
+            sql = (f'SELECT COALESCE(SUM(n), 0), COUNT(*) FROM '
+                   f'(SELECT COUNT(*) AS n FROM "{table}" INDEXED BY "{index}" GROUP BY {keys})')
+            try:
+                return self._recount(self._fanouts, (index, columns), table, sql,
+                                     lambda row: row[0] / row[1] if row[1] else 1.0)
+            except sqlite3.OperationalError:
+                return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"tables": {table: count for table, (_, count) in self._counts.items()},
+                    "fanouts": {f"{index}/{n}": round(value, 2) for (index, n), (_, value) in self._fanouts.items()},
+                    "analyzed_indexes": len(self._analyzed)}
+
+
+def source_tables(tree) -> dict:
+    """Alias (or table name) -> table name for every table a query reads"""
+    sources = {}
+    for table in tree.find_all(exp.Table):
+        sources[table.alias_or_name] = table.name
+        sources.setdefault(table.name, table.name)
+    return sources
+
+
+def estimate_plan(plan: list[tuple], sources: dict, stats: TableStats) -> tuple[float, float]:
+    """(rows visited, result rows) for an EXPLAIN QUERY PLAN result"""
+    children = {}
+    for node_id, parent, _, detail in plan:
+        children.setdefault(parent, []).append((node_id, detail))
+    derived = {}  # materialized CTE / subquery name -> its estimated rows
+
+    def loop_rows(name: str, detail: str) -> tuple[float, float]:
+        """(rows this loop level yields per outer row, extra one-off cost)"""
+        table = sources.get(name, name)
+        total = derived.get(name)
+        if total is None:
+            total = stats.row_count(table) or 1
+        if detail.startswith("SCAN"):
+            return total, 0.0
+        match = _SEARCH_COLUMNS.search(detail)
+        terms = match.group(1).split(" AND ") if match else []
+        equalities = sum(term.endswith("=?") for term in terms)
+        ranges = len(terms) - equalities
+        build = total if "AUTOMATIC" in detail else 0.0
+        if ("PRIMARY KEY" in detail or "rowid=?" in detail) and equalities and not ranges:
+            return 1.0, build
+        index = re.search(r"INDEX (\w+)", detail)
+        rows = None
+        if index and equalities and not ranges and "AUTOMATIC" not in detail:
+            rows = stats.fanout(index.group(1), equalities)
+        if rows is None:
+            rows = total * EQ_SELECTIVITY ** equalities * RANGE_SELECTIVITY ** min(ranges, 1)
+        return max(1.0, rows), build
+
+    def walk(parent: int) -> tuple[float, float]:
+        cost, outer = 0.0, 1.0
+        for node_id, detail in children.get(parent, ()):
+            subplan = _SUBPLAN.match(detail)
+            loop = _LOOP.match(detail)
+            if subplan:
+                sub_cost, sub_rows = walk(node_id)
+                derived[subplan.group(1)] = sub_rows
+                cost += sub_cost
+            elif loop:
+                rows, build = loop_rows(loop.group(2), detail)
+                outer *= rows
+                cost += outer + build
+            elif detail.startswith("USE TEMP B-TREE"):
+                cost += outer  # one b-tree insert per row
+            elif detail.startswith("CORRELATED"):
+                cost += outer * walk(node_id)[0]
+            else:
+                # Uncorrelated subqueries and compound members run once
+                sub_cost, sub_rows = walk(node_id)
+                cost += sub_cost
+                if detail.startswith(("COMPOUND", "UNION", "LEFT-MOST")):
+                    outer = outer + sub_rows if outer > 1 else sub_rows
+        return cost, outer
+
+    return walk(0)
+
+
+def _limit_value(tree, params: dict) -> int | None:
+    limit = tree.args.get("limit")
+    if limit is None:
+        return None
+    value = limit.expression
+    if isinstance(value, exp.Literal) and value.is_int:
+        return int(value.this)
+    if isinstance(value, exp.Placeholder) and isinstance(params.get(value.name), int):
+        return params[value.name]
+    return None
+
+
+def _is_aggregate(tree) -> bool:
+    return isinstance(tree, exp.Select) and (
+        tree.args.get("group") is not None
+        or any(isinstance(e.unalias(), exp.AggFunc) for e in tree.expressions)
+    )
+
+
+class CostGuard:
+    """Costs, admits and runs ad hoc SQL through a StatementRegistry.
+
+    Queued queries run one at a time on a background thread, so however many
+    expensive questions arrive they hold at most one pooled connection.
+    """
+
+    def __init__(self, registry, stats: TableStats | None = None, queue_cost: float = QUEUE_COST,
+                 max_cost: float = MAX_COST, max_result_rows: int = MAX_RESULT_ROWS,
+                 interactive: Budget = INTERACTIVE, background: Budget = BACKGROUND, dialect: str = "sqlite"):
+        self.registry = registry
+        self.stats_cache = stats or TableStats(registry.pool.path)
+        self.queue_cost = queue_cost
+        self.max_cost = max_cost
+        self.max_result_rows = max_result_rows
+        self.interactive = interactive
+        self.background = background
+        self.dialect = dialect
+        self._queue = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sql-queue")
+        self._jobs = {}
+        self._job_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._stats = {"run": 0, "limit": 0, "queue": 0, "reject": 0, "budget_exceeded": 0}
+
+    def admit(self, sql: str, params: dict | None = None) -> Admission:
+        params = dict(params or {})
+        canonical, bound = self.registry.prepare(sql, params)
+        with self.registry.pool.connection() as conn:
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {canonical}", bound).fetchall()
+        try:
+            tree = sqlglot.parse_one(sql, read=self.dialect)
+        except sqlglot.errors.ParseError:
+            tree = None
+        sources = source_tables(tree) if tree is not None else {}
+        cost, rows = estimate_plan(plan, sources, self.stats_cache)
+        details = [detail for *_, detail in plan]
+
+        limit = _limit_value(tree, params) if tree is not None else None
+        aggregate = tree is not None and _is_aggregate(tree)
+        if aggregate and tree.args.get("group") is None:
+            rows = 1.0
+        if limit is not None:
+            # Without a sort or grouping, SQLite stops scanning once LIMIT rows are out
+            if not aggregate and not any(d.startswith("USE TEMP B-TREE") for d in details) and rows > limit:
+                cost *= limit / rows
+            rows = min(rows, limit)
+
+        if cost > self.max_cost:
+            action, reason = "reject", f"estimated {cost:,.0f} rows visited exceeds {self.max_cost:,.0f}"
+        elif cost > self.queue_cost:
+            action, reason = "queue", f"estimated {cost:,.0f} rows visited exceeds {self.queue_cost:,.0f}"
+        elif limit is None and not aggregate and rows > self.max_result_rows and hasattr(tree, "limit"):
+            action, reason = "limit", f"estimated {rows:,.0f} result rows; limited to {self.max_result_rows}"
+            sql = tree.limit(self.max_result_rows).sql(dialect=self.dialect)
+        else:
+            action, reason = "run", "within budget"
+        with self._lock:
+            self._stats[action] += 1
+        return Admission(action, sql, cost, rows, reason, details)
+
+    def execute(self, sql: str, params: dict | None = None, budget: Budget | None = None) -> dict:
+        """Run ``sql`` under ``budget``; raises QueryTimeout / QueryBudgetExceeded"""
+        budget = budget or self.interactive
+        ctx = contextvars.copy_context()
+        ctx.run(QUERY_DEADLINE.set, time.monotonic() + budget.seconds)
+        ctx.run(QUERY_STEP_BUDGET.set, budget.steps)
+        try:
+            columns, rows = ctx.run(self.registry.run, sql, params, budget.rows + 1)
+        except (QueryTimeout, QueryBudgetExceeded):
+            with self._lock:
+                self._stats["budget_exceeded"] += 1
+            raise
+        return {"columns": columns, "rows": rows[:budget.rows], "truncated": len(rows) > budget.rows}
+
+    def run(self, sql: str, params: dict | None = None) -> dict:
+        """Admit and run ``sql``: the result now, or a job id to poll with ``job``"""
+        admission = self.admit(sql, params)
+        if admission.action == "reject":
+            raise QueryRejected(admission.reason)
+        if admission.action == "queue":
+            return self.submit(admission, params)
+        result = self.execute(admission.sql, params)
+        return {"status": "done", "action": admission.action, "reason": admission.reason, **result}
+
+    def submit(self, admission: Admission, params: dict | None = None) -> dict:
+        job_id = next(self._job_ids)
+        future = self._queue.submit(self.execute, admission.sql, params, self.background)
+        with self._lock:
+            self._jobs[job_id] = (admission, future)
+            while len(self._jobs) > MAX_JOBS:
+                self._jobs.pop(next(iter(self._jobs)))
+        return {"status": "queued", "job_id": job_id, "reason": admission.reason}
+
+    def job(self, job_id: int, timeout: float | None = None) -> dict:
+        """Status of a queued query; waits up to ``timeout`` seconds for it to finish"""
+        with self._lock:
+            entry = self._jobs.get(job_id)
+        if entry is None:
+            return {"status": "unknown", "job_id": job_id}
+        _, future = entry
+        if timeout is not None and not future.done():
+            try:
+                future.exception(timeout=timeout)
+            except TimeoutError:
+                pass
+        if not future.done():
+            return {"status": "running" if future.running() else "pending", "job_id": job_id}
+        error = future.exception()
+        if error is not None:
+            return {"status": "failed", "job_id": job_id, "error": str(error)}
+        return {"status": "done", "job_id": job_id, **future.result()}
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["jobs"] = len(self._jobs)
+        stats.update(self.stats_cache.stats())
+        return stats
+
+    def shutdown(self) -> None:
+        self._queue.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,170 @@
+"""Incremental maintenance of coverage_limits.used_coverage.
+
+used_coverage is the sum of amount_approved over a user's Approved claims
+of one claim_type in one service year. Triggers on claims apply each
+insert, update and delete to that sum as a delta, so the tools can read
+remaining coverage straight from coverage_limits. ``rebuild`` recomputes
+every sum in one grouped pass and ``verify`` reports rows that drifted.
+
+INSERT OR REPLACE deletes the row it replaces without firing the delete
+trigger unless the connection has PRAGMA recursive_triggers on, so the old
+amount would stay counted. Writers of claims should upsert (ON CONFLICT DO
+UPDATE fires the update trigger) or turn the pragma on, as import_data.py
+does; ``verify`` catches any drift either way.
+
+    python coverage_usage.py --db claims.db verify
+    python coverage_usage.py --db claims.db rebuild
+"""
+import argparse
+import sqlite3
+import sys
+import time
+
+APPROVED = "Approved"
+# Incremental float sums drift by a few ulps; anything under a cent is a match
+TOLERANCE = 0.005
+
+_YEAR = "CAST(strftime('%Y', {row}.service_date) AS INTEGER)"
+_COUNTS = "{row}.status = '" + APPROVED + "' AND {row}.amount_approved IS NOT NULL"
+
+
+def _add(row: str) -> str:
+    # Usage without a coverage_limits row still gets one (max_coverage NULL), so no delta is lost
+    return f"""
+        INSERT INTO coverage_limits (user_id, claim_type, year, max_coverage, used_coverage)
+        SELECT {row}.user_id, {row}.claim_type, {_YEAR.format(row=row)}, NULL, {row}.amount_approved
+        WHERE {_COUNTS.format(row=row)}
+        ON CONFLICT (user_id, claim_type, year)
+        DO UPDATE SET used_coverage = coalesce(used_coverage, 0) + excluded.used_coverage;"""
+
+
+def _subtract(row: str) -> str:
+    return f"""
+        UPDATE coverage_limits SET used_coverage = used_coverage - {row}.amount_approved
+        WHERE {_COUNTS.format(row=row)}
+          AND user_id = {row}.user_id AND claim_type = {row}.claim_type
+          AND year = {_YEAR.format(row=row)};"""
+
+
+TRIGGERS = {
+    "trg_claims_coverage_insert": f"AFTER INSERT ON claims BEGIN {_add('NEW')} END",
+    "trg_claims_coverage_delete": f"AFTER DELETE ON claims BEGIN {_subtract('OLD')} END",
+    "trg_claims_coverage_update": (
+        "AFTER UPDATE OF user_id, claim_type, service_date, status, amount_approved ON claims "
+        f"BEGIN {_subtract('OLD')} {_add('NEW')} END"
+    ),
+}
+
+# One grouped pass over claims into a temp table keyed like coverage_limits,
+# so the follow-up UPDATE and comparison are index lookups
+_USAGE = [
+    "DROP TABLE IF EXISTS temp.coverage_usage",
+    """
+    CREATE TEMP TABLE coverage_usage (
+        user_id TEXT,
+        claim_type TEXT,
+        year INTEGER,
+        used REAL,
+        PRIMARY KEY (user_id, claim_type, year)
+    ) WITHOUT ROWID
+    """,
+    f"""
+    INSERT INTO temp.coverage_usage
+    SELECT user_id, claim_type, {_YEAR.format(row='claims')}, round(sum(amount_approved), 2)
+    FROM claims
+    WHERE {_COUNTS.format(row='claims')}
+    GROUP BY 1, 2, 3
+    """,
+]
+
+_EXPECTED = """coalesce((
+    SELECT used FROM temp.coverage_usage u
+    WHERE u.user_id = coverage_limits.user_id
+      AND u.claim_type = coverage_limits.claim_type
+      AND u.year = coverage_limits.year
+), 0)"""
+
+
+def create_coverage_triggers(conn: sqlite3.Connection) -> None:
+    """Install the claims triggers that keep used_coverage current"""
+    for name, body in TRIGGERS.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+
+def _compute_usage(conn: sqlite3.Connection) -> None:
+    for statement in _USAGE:
+        conn.execute(statement)
+
+
+def rebuild(conn: sqlite3.Connection) -> int:
+    """Recompute every used_coverage from claims; returns the number of rows changed.
+
+    Runs in the caller's transaction, so wrap it in one to keep readers from
+    seeing a half-rebuilt table.
+    """
+    _compute_usage(conn)
+    changed = conn.execute(f"""
+        UPDATE coverage_limits SET used_coverage = {_EXPECTED}
+        WHERE used_coverage IS NULL OR abs(used_coverage - {_EXPECTED}) >= {TOLERANCE}
+    """).rowcount
+    changed += conn.execute("""
+        INSERT INTO coverage_limits (user_id, claim_type, year, max_coverage, used_coverage)
+        SELECT user_id, claim_type, year, NULL, used FROM temp.coverage_usage WHERE true
+        ON CONFLICT (user_id, claim_type, year) DO NOTHING
+    """).rowcount
+    conn.execute("DROP TABLE temp.coverage_usage")
+    return changed
+
+
+def verify(conn: sqlite3.Connection, limit: int = 20) -> dict:
+    """Compare stored used_coverage with a fresh aggregate of claims"""
+    _compute_usage(conn)
+    drifted = conn.execute(f"""
+        SELECT user_id, claim_type, year, used_coverage, {_EXPECTED} AS expected
+        FROM coverage_limits
+        WHERE abs(coalesce(used_coverage, 0) - {_EXPECTED}) >= {TOLERANCE}
+    """).fetchall()
+    missing = conn.execute("""
+        SELECT u.user_id, u.claim_type, u.year, NULL, u.used
+        FROM temp.coverage_usage u
+        WHERE NOT EXISTS (
+            SELECT 1 FROM coverage_limits c
+            WHERE c.user_id = u.user_id AND c.claim_type = u.claim_type AND c.year = u.year
+        )
+    """).fetchall()
+    conn.execute("DROP TABLE temp.coverage_usage")
+    rows = drifted + missing
+    return {
+        "ok": not rows,
+        "drifted": len(drifted),
+        "missing": len(missing),
+        "examples": [
+            {"user_id": r[0], "claim_type": r[1], "year": r[2], "used_coverage": r[3], "expected": r[4]}
+            for r in rows[:limit]
+        ],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("verify", "rebuild"))
+    parser.add_argument("--db", default="claims.db")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, isolation_level=None, timeout=30.0)
+    start = time.perf_counter()
+    if args.command == "rebuild":
+        conn.execute("BEGIN IMMEDIATE")
+        create_coverage_triggers(conn)
+        changed = rebuild(conn)
+        conn.execute("COMMIT")
+        print(f"rebuilt used_coverage: {changed:,} rows changed in {time.perf_counter() - start:.1f}s")
+    else:
+        report = verify(conn)
+        for row in report["examples"]:
+            print(row)
+        print(f"{report['drifted']:,} drifted, {report['missing']:,} missing "
+              f"({time.perf_counter() - start:.1f}s)")
+        if not report["ok"]:
+            sys.exit("used_coverage is out of date; run: python coverage_usage.py rebuild")
+    conn.close()
@@ -5,6 +5,8 @@ from datetime import datetime, timedelta
 
 import pandas as pd
 
+from coverage_usage import rebuild as rebuild_used_coverage
+
 # Connect to the database
 conn = sqlite3.connect("claims.db")
 cursor = conn.cursor()
@@ -213,16 +215,18 @@ for claim_id in claim_ids[6:9]:
         "2024-01-01"
     ))
 
-# Insert coverage_limits
+# Insert coverage_limits; the claims triggers may already have opened the row,
+# and used_coverage is derived from approved claims below
 for user_id in user_ids:
     cursor.execute("""
         INSERT INTO coverage_limits VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (user_id, claim_type, year) DO UPDATE SET max_coverage = excluded.max_coverage
     """, (
         user_id,
         "dental",
         2024,
         1000.00,
-        random.uniform(100, 800)
+        0.0
     ))
 
 # Insert claim_audit_logs
@@ -279,6 +283,7 @@ for user_id in user_ids:
         "America/Toronto"
     ))
 
+rebuild_used_coverage(conn)
 conn.commit()
 conn.close()
 
@@ -0,0 +1,206 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from queue import Empty, LifoQueue
+
+# CLAIMS_DB_PATH lets the benchmarks point a server at a generated dataset
+DB_PATH = os.environ.get("CLAIMS_DB_PATH", "claims.db")
+
+# Monotonic deadline for queries run in the current context; None means no limit
+QUERY_DEADLINE = ContextVar("query_deadline", default=None)
+# Cap on SQLite VM instructions for queries run in the current context; None means no cap
+QUERY_STEP_BUDGET = ContextVar("query_step_budget", default=None)
+# VM instructions between deadline checks
+PROGRESS_STEPS = 1000
+
+# Applied to every pooled connection right after it is opened
+PRAGMAS = {
+    "mmap_size": 256 * 1024 * 1024,  # 256 MiB memory-mapped reads
+    "cache_size": -64000,            # ~64 MiB page cache per connection
+    "temp_store": "MEMORY",
+    "query_only": "ON",
+}
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection became free within the checkout timeout"""
+
+
+class QueryTimeout(Exception):
+    """Raised when a query was interrupted because it ran past QUERY_DEADLINE"""
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a query was interrupted because it used up QUERY_STEP_BUDGET"""
+
+
+class _Progress:
+    """Progress handler that interrupts past a deadline or an instruction budget"""
+
+    def __init__(self, deadline: float | None, max_steps: int | None):
+        self.deadline = deadline
+        self.max_steps = max_steps
+        self.steps = 0
+
+    def __call__(self) -> bool:
+        self.steps += PROGRESS_STEPS
+        if self.max_steps is not None and self.steps > self.max_steps:
+            return True
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+
+class ConnectionPool:
+    """Bounded pool of long-lived, read-only SQLite connections.
+
+    Connections are opened lazily up to ``size`` and then reused for the life
+    of the process, so tools never pay the open/parse cost per call.
+    """
+
+    def __init__(self, path: str = DB_PATH, size: int = 8, timeout: float = 5.0, pragmas: dict | None = None,
+                 cached_statements: int = 256):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.cached_statements = cached_statements  # prepared statements kept per connection
+        self.pragmas = dict(PRAGMAS if pragmas is None else pragmas)
+        self._idle = LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._all = []
+        self._stats = {
+            "opened": 0,
+            "checkouts": 0,
+            "returns": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "query_timeouts": 0,
+            "budget_exceeded": 0,
+            "in_use": 0,
+            "peak_in_use": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+        }
+        self.journal_mode = self._enable_wal()
+
+    def _enable_wal(self) -> str:
+        # journal_mode is persistent, but it can only be switched from a writable connection;
+        # mode=rw never creates the file, so a wrong path fails here instead of serving an empty database
+        try:
+            conn = sqlite3.connect(f"file:{self.path}?mode=rw", uri=True)
+        except sqlite3.OperationalError as e:
+            if not os.path.exists(self.path):
+                raise FileNotFoundError(f"no claims database at {self.path}; create it with python tables.py") from e
+            raise
+        try:
+            return conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            f"file:{self.path}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _checkout(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+
+        with self._lock:
+            if len(self._all) < self.size:
+                conn = self._connect()
+                self._all.append(conn)
+                self._stats["opened"] += 1
+                return conn
+
+        # Pool exhausted: wait for a connection to be returned
+        start = time.perf_counter()
+        with self._lock:
+            self._stats["waits"] += 1
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except Empty:
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise PoolTimeout(f"no connection available after {self.timeout}s (pool size {self.size})")
+        waited = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._stats["total_wait_ms"] += waited
+            self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], waited)
+        return conn
+
+    def _return(self, conn: sqlite3.Connection) -> None:
+        # Don't hand out a connection that still pins an old read snapshot
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put_nowait(conn)
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of a ``with`` block.
+
+        If QUERY_DEADLINE is set, statements still running past it are
+        interrupted through a progress handler and raise QueryTimeout; past
+        QUERY_STEP_BUDGET they raise QueryBudgetExceeded.
+        """
+        conn = self._checkout()
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["in_use"] += 1
+            self._stats["peak_in_use"] = max(self._stats["peak_in_use"], self._stats["in_use"])
+        deadline = QUERY_DEADLINE.get()
+        max_steps = QUERY_STEP_BUDGET.get()
+        progress = None
+        if deadline is not None or max_steps is not None:
+            progress = _Progress(deadline, max_steps)
+            conn.set_progress_handler(progress, PROGRESS_STEPS)
+        try:
+            yield conn
+        except sqlite3.OperationalError as e:
+            if progress is not None and "interrupted" in str(e):
+                if max_steps is not None and progress.steps > max_steps:
+                    with self._lock:
+                        self._stats["budget_exceeded"] += 1
+                    raise QueryBudgetExceeded(f"query exceeded its budget of {max_steps} VM steps") from e
+                if deadline is not None and time.monotonic() > deadline:
+                    with self._lock:
+                        self._stats["query_timeouts"] += 1
+                    raise QueryTimeout("query exceeded its time budget") from e
+            raise
+        finally:
+            if progress is not None:
+                conn.set_progress_handler(None, 0)
+            self._return(conn)
+            with self._lock:
+                self._stats["returns"] += 1
+                self._stats["in_use"] -= 1
+
+    def stats(self) -> dict:
+        """Snapshot of checkout/return metrics"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["size"] = self.size
+        stats["idle"] = self._idle.qsize()
+        stats["journal_mode"] = self.journal_mode
+        stats["avg_wait_ms"] = stats["total_wait_ms"] / stats["waits"] if stats["waits"] else 0.0
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+        while True:
+            try:
+                self._idle.get_nowait()
+            except Empty:
+                break
@@ -0,0 +1,151 @@
+"""Full-text indexes over claim descriptions, audit notes and communications.
+
+Each indexed table gets an external-content FTS5 table: the text stays in
+the source table, and the FTS5 table holds only the inverted index, keyed
+by the source rowid. Triggers keep the index in step with every insert,
+update and delete, so a search is an index probe ranked by BM25 instead of
+a LIKE '%...%' scan.
+
+The indexed tables key on TEXT ids, so their rowids have no INTEGER
+PRIMARY KEY alias and VACUUM may renumber them, leaving the index pointing
+at the wrong rows. Vacuum through this module instead, which rebuilds the
+indexes in the same step:
+
+    python fulltext.py --db claims.db vacuum
+    python fulltext.py --db claims.db check
+"""
+import argparse
+import re
+import sqlite3
+import time
+
+TOKENIZER = "porter unicode61 remove_diacritics 2"
+
+# FTS table -> (source table, indexed columns)
+FTS_TABLES = {
+    "claims_fts": ("claims", ("description",)),
+    "claim_audit_logs_fts": ("claim_audit_logs", ("notes",)),
+    "communications_log_fts": ("communications_log", ("subject", "content")),
+}
+
+_PHRASE = re.compile(r'"([^"]+)"')
+
+
+def _triggers(fts: str, table: str, columns: tuple) -> list[str]:
+    names = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    insert = f"INSERT INTO {fts} (rowid, {names}) VALUES (new.rowid, {new});"
+    delete = f"INSERT INTO {fts} ({fts}, rowid, {names}) VALUES ('delete', old.rowid, {old});"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS trg_{fts}_insert AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{fts}_delete AFTER DELETE ON {table} BEGIN {delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{fts}_update AFTER UPDATE OF {names} ON {table} "
+        f"BEGIN {delete} {insert} END",
+    ]
+
+
+def create_fulltext(conn: sqlite3.Connection, populate: bool = True) -> None:
+    """Create the FTS5 tables and their sync triggers; safe to re-run.
+
+    A newly created index is filled from its source table unless
+    ``populate`` is False.
+    """
+    for fts, (table, columns) in FTS_TABLES.items():
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (fts,)).fetchone()
+        conn.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{', '.join(columns)}, content='{table}', content_rowid='rowid', tokenize='{TOKENIZER}')"
+        )
+        for trigger in _triggers(fts, table, columns):
+            conn.execute(trigger)
+        if not exists and populate:
+            conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+
+def rebuild(conn: sqlite3.Connection) -> None:
+    """Re-index every FTS table from its source table, e.g. after a bulk load or VACUUM"""
+    for fts in FTS_TABLES:
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('optimize')")
+
+
+def vacuum(conn: sqlite3.Connection) -> None:
+    """VACUUM the database, then re-index every FTS table against the renumbered rowids"""
+    conn.commit()
+    conn.execute("VACUUM")
+    with conn:
+        rebuild(conn)
+
+
+def check(conn: sqlite3.Connection) -> dict:
+    """{fts table: error message or None} from FTS5's integrity check against the source rows"""
+    results = {}
+    for fts in FTS_TABLES:
+        try:
+            conn.execute(f"INSERT INTO {fts} ({fts}, rank) VALUES ('integrity-check', 1)")
+            results[fts] = None
+        except sqlite3.DatabaseError as e:
+            results[fts] = str(e)
+    return results
+
+
+def match_query(text: str, any_term: bool = False) -> str:
+    """Turn free text into an FTS5 MATCH expression.
+
+    "Quoted phrases" stay phrases, every other word becomes a quoted term
+    (so FTS5 operators and punctuation in user text are never parsed), and
+    a trailing ``*`` on a word keeps prefix matching. Terms are ANDed unless
+    ``any_term`` is set.
+    """
+    terms = [f'"{phrase.strip()}"' for phrase in _PHRASE.findall(text) if phrase.strip()]
+    rest = _PHRASE.sub(" ", text)
+    for match in re.finditer(r"(\w+)(\*?)", rest):
+        terms.append(f'"{match.group(1)}"{match.group(2)}')
+    return (" OR " if any_term else " ").join(terms)
+
+
+def tsquery(text: str, any_term: bool = False) -> str:
+    """The same search as ``match_query``, as a Postgres to_tsquery() expression"""
+    terms = []
+    for phrase in _PHRASE.findall(text):
+        words = re.findall(r"\w+", phrase)
+        if words:
+            terms.append("(" + " <-> ".join(f"'{word}'" for word in words) + ")")
+    for match in re.finditer(r"(\w+)(\*?)", _PHRASE.sub(" ", text)):
+        terms.append(f"'{match.group(1)}'" + (":*" if match.group(2) else ""))
+    return (" | " if any_term else " & ").join(terms)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="claims.db")
+    parser.add_argument("command", choices=["create", "rebuild", "vacuum", "check"])
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    start = time.perf_counter()
+    if args.command == "check":
+        failures = {fts: error for fts, error in check(conn).items() if error}
+        for fts, error in failures.items():
+            print(f"{fts}: {error}")
+        conn.close()
+        if failures:
+            raise SystemExit(f"{len(failures)} full-text indexes are out of sync; run rebuild")
+        print(f"All {len(FTS_TABLES)} full-text indexes match their tables")
+        return
+    if args.command == "vacuum":
+        vacuum(conn)
+        conn.close()
+        print(f"vacuum and rebuild of {len(FTS_TABLES)} full-text indexes done in {time.perf_counter() - start:.1f}s")
+        return
+    with conn:
+        create_fulltext(conn, populate=args.command == "create")
+        if args.command == "rebuild":
+            rebuild(conn)
+    conn.close()
+    print(f"{args.command} of {len(FTS_TABLES)} full-text indexes done in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
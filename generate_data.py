@@ -0,0 +1,515 @@
+"""Bulk synthetic data generator for load testing the MCP tools.
+
+Unlike data.py, which inserts a handful of rows, this scales to tens of
+millions of rows while keeping referential integrity: policies belong to real
+users, claims to real policies (and that policy's user and provider), and each
+claim gets a detail row in the table matching its claim_type.
+
+    python generate_data.py --db claims.db --users 1000000 --claims 50000000
+
+With --workers N (0 = every core) chunks are generated in a process pool into
+per-shard staging databases and merged into the target with ATTACH +
+INSERT ... SELECT. Every chunk draws from its own seed derived from --seed, and
+shards are merged in chunk order, so a given seed yields a byte-identical
+database for any worker count above one. The serial path (--workers 1) loads
+the same rows in the same order, but interleaves tables on disk differently.
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from coverage_usage import create_coverage_triggers, rebuild as rebuild_used_coverage
+from fulltext import create_fulltext
+from indexes import create_indexes
+from result_cache import create_change_counters
+from summaries import SUMMARY_TABLES, create_summaries, refresh as refresh_summaries
+from tables import TABLES, schema_sql
+
+CHUNK_ROWS = 200_000
+CHUNKS_PER_SHARD = 5
+ROWS_PER_STATEMENT = 100  # 100 rows x 12 columns stays far below SQLite's variable limit
+
+CLAIM_TYPES = np.array(["drug", "dental", "vision", "hospital"])
+CLAIM_STATUSES = np.array(["Pending", "Approved", "Rejected"])
+PLAN_TYPES = np.array(["Basic", "Standard", "Premium"])
+FREQUENCIES = np.array(["monthly", "quarterly", "annually"])
+DRUG_NAMES = np.array(["Paracetamol", "Atorvastatin", "Metformin", "Ibuprofen", "Amoxicillin"])
+DENTAL_CATEGORIES = np.array(["Cleaning", "Filling", "Root Canal", "Crown", "Extraction"])
+ROOM_TYPES = np.array(["Private", "Semi-Private", "Ward"])
+VISION_PRODUCTS = np.array(["Glasses", "Contacts", "Eye Exam"])
+DOCUMENT_TYPES = np.array(["Receipt", "Prescription", "Referral", "Invoice"])
+AUDIT_EVENTS = np.array(["Submitted", "Reviewed", "Approved", "Rejected", "Paid"])
+PERFORMERS = np.array(["system", "agent", "admin"])
+COMM_TYPES = np.array(["email", "sms", "letter"])
+COMM_STATUSES = np.array(["sent", "delivered", "failed"])
+PREAUTH_SERVICES = np.array(["MRI scan", "CT scan", "Physiotherapy", "Surgery", "Orthodontics"])
+
+DEFAULT_COUNTS = {
+    "providers": 50,
+    "plans_per_provider": 3,
+    "users": 100_000,
+    "policies": 120_000,
+    "claims": 1_000_000,
+    "payments_per_policy": 6,
+    "audit_per_claim": 2,
+    "document_ratio": 0.5,
+    "pre_authorizations": 50_000,
+    "communications": 300_000,
+    "coverage_years": (2023, 2024),
+}
+
+# Day lookup tables: indexing a prebuilt string array is far cheaper than
+# formatting a date per row
+EPOCH = np.datetime64("2023-01-01")
+SERVICE_DAYS = 730
+DAYS = (EPOCH + np.arange(-365 * 80, SERVICE_DAYS + 365)).astype(str)
+DAY_OFFSET = 365 * 80  # index of EPOCH in DAYS
+# summary_state.refreshed_at of a generated database: the end of the service window
+LOADED_AT = f"{DAYS[DAY_OFFSET + SERVICE_DAYS]} 00:00:00"
+CLOCK = np.array([f" {h:02d}:{m:02d}:00" for h in range(24) for m in range(60)])
+
+
+def _ids(prefix: str, lo: int, hi: int, width: int = 10) -> np.ndarray:
+    # Zero-padded so rows arrive in primary-key order and inserts only append
+    return np.char.add(prefix, np.char.zfill(np.arange(lo, hi).astype(str), width))
+
+
+def _dates(days: np.ndarray) -> np.ndarray:
+    return DAYS[days + DAY_OFFSET]
+
+
+def _timestamps(rng: np.random.Generator, days: np.ndarray) -> np.ndarray:
+    return np.char.add(_dates(days), CLOCK[rng.integers(0, len(CLOCK), len(days))])
+
+
+def _money(rng: np.random.Generator, low: float, high: float, n: int) -> np.ndarray:
+    return np.round(rng.uniform(low, high, n), 2)
+
+
+def user_ids(idx: np.ndarray) -> np.ndarray:
+    # Matches the User1, User2, ... convention used by data.py and the notebooks
+    return np.char.add("User", (idx + 1).astype(str))
+
+
+def provider_ids(idx: np.ndarray) -> np.ndarray:
+    return np.char.add("prov", (idx + 1).astype(str))
+
+
+def policy_ids(idx: np.ndarray) -> np.ndarray:
+    return np.char.add("POL", np.char.zfill(idx.astype(str), 10))
+
+
+class Topology:
+    """Foreign-key layout shared by every chunk: which provider each user has
+    and which user owns each policy."""
+
+    def __init__(self, counts: dict, seed: int):
+        rng = np.random.default_rng([seed, 0])
+        self.counts = counts
+        self.user_provider = rng.integers(0, counts["providers"], counts["users"], dtype=np.int32)
+        self.policy_user = rng.integers(0, counts["users"], counts["policies"], dtype=np.int32)
+
+
+# Each generator returns {table: (columns, [column arrays])} for rows lo..hi
+
+def gen_providers(rng, topo, lo, hi):
+    idx = np.arange(lo, hi)
+    n = hi - lo
+    return {"insurance_providers": (
+        ("provider_id", "name", "description"),
+        [provider_ids(idx), np.char.add("Provider ", (idx + 1).astype(str)), np.full(n, "Synthetic provider")],
+    )}
+
+
+def gen_provider_plans(rng, topo, lo, hi):
+    n = hi - lo
+    idx = np.arange(lo, hi)
+    return {"provider_plans": (
+        ("plan_id", "provider_id", "name", "description", "base_premium",
+         "drug_limit", "dental_limit", "vision_limit"),
+        [_ids("PLN", lo, hi), provider_ids(idx // topo.counts["plans_per_provider"]),
+         np.char.add("Plan_", idx.astype(str)), np.full(n, "Standard insurance plan"),
+         _money(rng, 50, 150, n), _money(rng, 500, 2000, n), _money(rng, 300, 1000, n), _money(rng, 150, 700, n)],
+    )}
+
+
+def gen_users(rng, topo, lo, hi):
+    n = hi - lo
+    idx = np.arange(lo, hi)
+    dob = rng.integers(-365 * 45, -365 * 20, n)
+    years = topo.counts["coverage_years"]
+    limit_users = np.repeat(idx, len(CLAIM_TYPES) * len(years))
+    return {
+        "users": (
+            ("user_id", "name", "dob", "health_card", "email", "phone", "provider_id"),
+            [user_ids(idx), np.char.add("User_name", (idx + 1).astype(str)), _dates(dob),
+             np.char.add("HC", (idx + 1000).astype(str)),
+             np.char.add(np.char.add("user", (idx + 1).astype(str)), "@example.com"),
+             np.char.add("555-", np.char.zfill((idx % 10_000_000).astype(str), 7)),
+             provider_ids(topo.user_provider[lo:hi])],
+        ),
+        "user_preferences": (
+            ("user_id", "communication_opt_in", "consent_to_share_data", "language_preference", "timezone"),
+            [user_ids(idx), rng.integers(0, 2, n), rng.integers(0, 2, n),
+             np.full(n, "en"), np.full(n, "America/Toronto")],
+        ),
+        # used_coverage starts at zero; finish_load derives it from approved claims
+        "coverage_limits": (
+            ("user_id", "claim_type", "year", "max_coverage", "used_coverage"),
+            [user_ids(limit_users), np.tile(np.repeat(CLAIM_TYPES, len(years)), n),
+             np.tile(np.array(years), n * len(CLAIM_TYPES)),
+             np.full(len(limit_users), 1000.0), np.zeros(len(limit_users))],
+        ),
+    }
+
+
+def gen_policies(rng, topo, lo, hi):
+    n = hi - lo
+    owner = topo.policy_user[lo:hi]
+    start = rng.integers(-365, SERVICE_DAYS - 365, n)
+    return {"policies": (
+        ("policy_id", "user_id", "provider_id", "policy_number", "plan_type", "coverage_start",
+         "coverage_end", "monthly_premium", "billing_frequency", "active"),
+        [policy_ids(np.arange(lo, hi)), user_ids(owner), provider_ids(topo.user_provider[owner]),
+         np.char.add("POL", rng.integers(1000, 9999, n).astype(str)), PLAN_TYPES[rng.integers(0, 3, n)],
+         _dates(start), _dates(start + 365), _money(rng, 100, 500, n),
+         FREQUENCIES[rng.integers(0, 3, n)], (rng.random(n) < 0.9).astype(np.int8)],
+    )}
+
+
+def gen_payments(rng, topo, lo, hi):
+    per_policy = topo.counts["payments_per_policy"]
+    idx = np.arange(lo, hi)
+    policy = idx // per_policy
+    n = hi - lo
+    due = (idx % per_policy) * 30 + rng.integers(0, 5, n)
+    paid = rng.random(n) < 0.95
+    amount = _money(rng, 100, 500, n)
+    return {"premium_payments": (
+        ("payment_id", "policy_id", "due_date", "paid_date", "amount_due", "amount_paid",
+         "payment_status", "payment_method"),
+        [_ids("PAY", lo, hi), policy_ids(policy), _dates(due),
+         np.where(paid, _dates(due + rng.integers(0, 10, n)), None),
+         amount, np.where(paid, amount, 0.0), np.where(paid, "Paid", "Due"), np.full(n, "Credit Card")],
+    )}
+
+
+def gen_claims(rng, topo, lo, hi):
+    """Claims plus their detail rows, audit trail and documents"""
+    n = hi - lo
+    policy = rng.integers(0, topo.counts["policies"], n)
+    owner = topo.policy_user[policy]
+    claim_ids = _ids("CLM", lo, hi)
+    kind = rng.integers(0, len(CLAIM_TYPES), n)
+    service = rng.integers(0, SERVICE_DAYS, n)
+    claimed = _money(rng, 50, 500, n)
+    status = rng.integers(0, len(CLAIM_STATUSES), n)
+    approved = np.where(CLAIM_STATUSES[status] == "Approved", np.round(claimed * rng.uniform(0.5, 1.0, n), 2), 0.0)
+
+    out = {"claims": (
+        ("claim_id", "user_id", "provider_id", "policy_id", "service_date", "claim_type", "service_code",
+         "description", "amount_claimed", "amount_approved", "status", "submitted_at"),
+        [claim_ids, user_ids(owner), provider_ids(topo.user_provider[owner]), policy_ids(policy),
+         _dates(service), CLAIM_TYPES[kind], np.char.add("SVC", rng.integers(100, 999, n).astype(str)),
+         np.full(n, "Routine check or prescription"), claimed, approved, CLAIM_STATUSES[status],
+         _timestamps(rng, service + rng.integers(0, 14, n))],
+    )}
+
+    sel = kind == 0
+    m = int(sel.sum())
+    out["drug_details"] = (
+        ("claim_id", "drug_name", "DIN_code", "quantity", "dosage"),
+        [claim_ids[sel], DRUG_NAMES[rng.integers(0, len(DRUG_NAMES), m)],
+         np.char.add("D", rng.integers(10000, 99999, m).astype(str)), rng.integers(10, 90, m),
+         np.char.add(rng.integers(250, 1000, m).astype(str), "mg")],
+    )
+    sel = kind == 1
+    m = int(sel.sum())
+    out["dental_details"] = (
+        ("claim_id", "category", "tooth_code", "procedure_code"),
+        [claim_ids[sel], DENTAL_CATEGORIES[rng.integers(0, len(DENTAL_CATEGORIES), m)],
+         np.char.add("T", rng.integers(1, 32, m).astype(str)),
+         np.char.add("PROC", rng.integers(100, 999, m).astype(str))],
+    )
+    sel = kind == 2
+    m = int(sel.sum())
+    out["vision_claims"] = (
+        ("claim_id", "product_type", "coverage_limit", "eligibility_date"),
+        [claim_ids[sel], VISION_PRODUCTS[rng.integers(0, len(VISION_PRODUCTS), m)],
+         np.full(m, 200.0), _dates(service[sel] - 365)],
+    )
+    sel = kind == 3
+    m = int(sel.sum())
+    admitted = service[sel]
+    out["hospital_visits"] = (
+        ("claim_id", "room_type", "admission_date", "discharge_date"),
+        [claim_ids[sel], ROOM_TYPES[rng.integers(0, len(ROOM_TYPES), m)],
+         _dates(admitted), _dates(admitted + rng.integers(1, 10, m))],
+    )
+
+    per_claim = topo.counts["audit_per_claim"]
+    audit_claim = np.repeat(np.arange(n), per_claim)
+    k = len(audit_claim)
+    out["claim_audit_logs"] = (
+        ("audit_id", "claim_id", "event_time", "event_type", "performed_by", "notes"),
+        [_ids("AUD", lo * per_claim, hi * per_claim), claim_ids[audit_claim],
+         _timestamps(rng, service[audit_claim] + np.tile(np.arange(per_claim), n) * 3),
+         AUDIT_EVENTS[np.minimum(np.tile(np.arange(per_claim), n), len(AUDIT_EVENTS) - 1)],
+         PERFORMERS[rng.integers(0, len(PERFORMERS), k)], np.full(k, "Synthetic event")],
+    )
+
+    sel = np.flatnonzero(rng.random(n) < topo.counts["document_ratio"])
+    m = len(sel)
+    out["claim_documents"] = (
+        ("document_id", "claim_id", "file_name", "uploaded_at", "document_type", "secure_url"),
+        [np.char.add("DOC", claim_ids[sel]), claim_ids[sel], np.full(m, "receipt.pdf"),
+         _timestamps(rng, service[sel] + 1), DOCUMENT_TYPES[rng.integers(0, len(DOCUMENT_TYPES), m)],
+         np.full(m, "")],
+    )
+    return out
+
+
+def gen_pre_authorizations(rng, topo, lo, hi):
+    n = hi - lo
+    policy = rng.integers(0, topo.counts["policies"], n)
+    requested = rng.integers(0, SERVICE_DAYS, n)
+    status = rng.integers(0, len(CLAIM_STATUSES), n)
+    approved = CLAIM_STATUSES[status] == "Approved"
+    return {"pre_authorizations": (
+        ("auth_id", "user_id", "policy_id", "service_requested", "estimated_cost", "request_date",
+         "approved_date", "status", "agent_notes"),
+        [_ids("PA", lo, hi), user_ids(topo.policy_user[policy]), policy_ids(policy),
+         PREAUTH_SERVICES[rng.integers(0, len(PREAUTH_SERVICES), n)], _money(rng, 100, 5000, n),
+         _dates(requested), np.where(approved, _dates(requested + rng.integers(1, 10, n)), None),
+         CLAIM_STATUSES[status], np.full(n, "Synthetic request")],
+    )}
+
+
+def gen_communications(rng, topo, lo, hi):
+    n = hi - lo
+    return {"communications_log": (
+        ("log_id", "user_id", "type", "subject", "content", "sent_at", "status"),
+        [_ids("COM", lo, hi), user_ids(rng.integers(0, topo.counts["users"], n)),
+         COMM_TYPES[rng.integers(0, len(COMM_TYPES), n)], np.full(n, "Claim update"),
+         np.full(n, "Your claim status has changed."), _timestamps(rng, rng.integers(0, SERVICE_DAYS, n)),
+         COMM_STATUSES[rng.integers(0, len(COMM_STATUSES), n)]],
+    )}
+
+
+def plan(counts: dict) -> list:
+    """(name, generator, total rows) in foreign-key order"""
+    return [
+        ("providers", gen_providers, counts["providers"]),
+        ("provider_plans", gen_provider_plans, counts["providers"] * counts["plans_per_provider"]),
+        ("users", gen_users, counts["users"]),
+        ("policies", gen_policies, counts["policies"]),
+        ("payments", gen_payments, counts["policies"] * counts["payments_per_policy"]),
+        ("claims", gen_claims, counts["claims"]),
+        ("pre_authorizations", gen_pre_authorizations, counts["pre_authorizations"]),
+        ("communications", gen_communications, counts["communications"]),
+    ]
+
+
+def tune_for_load(conn: sqlite3.Connection) -> None:
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA locking_mode=EXCLUSIVE")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-1000000")  # ~1 GiB
+
+
+def insert_chunk(conn: sqlite3.Connection, chunk: dict) -> Counter:
+    """Insert a generated chunk; returns rows inserted per table"""
+    rows = Counter()
+    for table, (columns, arrays) in chunk.items():
+        n = len(arrays[0])
+        if not n:
+            continue
+        width = len(columns)
+        # Lay the chunk out row-major in one object array, then bind it
+        # ROWS_PER_STATEMENT rows at a time through a multi-row VALUES list
+        grid = np.empty((n, width), dtype=object)
+        for i, values in enumerate(arrays):
+            grid[:, i] = values
+        flat = grid.ravel().tolist()
+        head = f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+        row = f"({', '.join('?' * width)})"
+        step = ROWS_PER_STATEMENT * width
+        full = n - n % ROWS_PER_STATEMENT
+        if full:
+            conn.executemany(head + ", ".join([row] * ROWS_PER_STATEMENT),
+                             (flat[i:i + step] for i in range(0, full * width, step)))
+        if full < n:
+            rest = flat[full * width:]
+            conn.executemany(head + row, (rest[i:i + width] for i in range(0, len(rest), width)))
+        rows[table] += n
+    return rows
+
+
+def finish_load(conn: sqlite3.Connection) -> None:
+    """Derive used_coverage, then build indexes, summaries, full-text indexes and triggers once the data is in"""
+    start = time.perf_counter()
+    conn.execute("BEGIN")
+    rebuild_used_coverage(conn)
+    conn.execute("COMMIT")
+    create_indexes(conn)
+    create_coverage_triggers(conn)
+    create_summaries(conn)
+    refresh_summaries(conn, full=True)
+    # refresh() stamps the wall clock and its own timing; pin both so a seed
+    # always yields the same bytes
+    conn.execute("UPDATE summary_state SET refreshed_at = ?, refresh_ms = NULL", (LOADED_AT,))
+    create_fulltext(conn)
+    create_change_counters(conn, TABLES + SUMMARY_TABLES)
+    conn.commit()
+    conn.execute("PRAGMA locking_mode=NORMAL")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    print(f"used_coverage, indexes, summaries and full-text indexes built in {time.perf_counter() - start:.1f}s")
+
+
+def build_chunk(generator, topo: Topology, seed: int, step: int, chunk_no: int, chunk_rows: int, count: int) -> dict:
+    # Every chunk has its own seed, so output doesn't depend on which process makes it
+    rng = np.random.default_rng([seed, step, chunk_no])
+    lo = chunk_no * chunk_rows
+    return generator(rng, topo, lo, min(lo + chunk_rows, count))
+
+
+_worker_topology = None
+
+
+def _init_worker(counts: dict, seed: int) -> None:
+    global _worker_topology
+    _worker_topology = Topology(counts, seed)
+
+
+def build_shard(path: str, generator, seed: int, step: int, chunk_nos: range, chunk_rows: int, count: int) -> str:
+    """Generate a run of chunks into a constraint-free staging database"""
+    conn = sqlite3.connect(path, isolation_level=None)
+    tune_for_load(conn)
+    for chunk_no in chunk_nos:
+        chunk = build_chunk(generator, _worker_topology, seed, step, chunk_no, chunk_rows, count)
+        for table, (columns, _) in chunk.items():
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)})")
+        conn.execute("BEGIN")
+        insert_chunk(conn, chunk)
+        conn.execute("COMMIT")
+    conn.close()
+    return path
+
+
+def merge_shard(conn: sqlite3.Connection, path: str) -> Counter:
+    """Copy a staging shard into the target; returns rows merged per table"""
+    conn.execute("ATTACH DATABASE ? AS shard", (path,))
+    rows = Counter()
+    conn.execute("BEGIN")
+    for (table,) in conn.execute("SELECT name FROM shard.sqlite_master WHERE type = 'table' ORDER BY rowid").fetchall():
+        columns = ", ".join(row[1] for row in conn.execute(f"PRAGMA shard.table_info({table})"))
+        rows[table] += conn.execute(
+            f"INSERT INTO main.{table} ({columns}) SELECT {columns} FROM shard.{table} ORDER BY rowid"
+        ).rowcount
+    conn.execute("COMMIT")
+    conn.execute("DETACH DATABASE shard")
+    os.remove(path)
+    return rows
+
+
+def print_table_rows(per_table: Counter, indent: str = "") -> None:
+    for table, rows in per_table.items():
+        print(f"{indent}{table}: {rows:,} rows")
+
+
+def load_serial(conn: sqlite3.Connection, counts: dict, seed: int, chunk_rows: int) -> int:
+    topo = Topology(counts, seed)
+    total = 0
+    for step, (name, generator, count) in enumerate(plan(counts), start=1):
+        step_start = time.perf_counter()
+        per_table = Counter()
+        for chunk_no in range(-(-count // chunk_rows)):
+            conn.execute("BEGIN")
+            per_table += insert_chunk(conn, build_chunk(generator, topo, seed, step, chunk_no, chunk_rows, count))
+            conn.execute("COMMIT")
+        elapsed = time.perf_counter() - step_start
+        # One generator step fills a table and its child tables; report each one
+        rows = sum(per_table.values())
+        print(f"{name} step: {rows:,} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
+        print_table_rows(per_table, indent="  ")
+        total += rows
+    return total
+
+
+def load_sharded(conn: sqlite3.Connection, path: str, counts: dict, seed: int, chunk_rows: int, workers: int) -> int:
+    staging = path + ".shards"
+    os.makedirs(staging, exist_ok=True)
+    shards = []
+    for step, (_, generator, count) in enumerate(plan(counts), start=1):
+        chunks = -(-count // chunk_rows)
+        for first in range(0, chunks, CHUNKS_PER_SHARD):
+            chunk_nos = range(first, min(first + CHUNKS_PER_SHARD, chunks))
+            shard_path = os.path.join(staging, f"{step:02d}_{first:08d}.db")
+            shards.append((shard_path, generator, seed, step, chunk_nos, chunk_rows, count))
+
+    per_table = Counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(counts, seed)) as pool:
+            futures = [pool.submit(build_shard, *args) for args in shards]
+            # Merge strictly in submission order (not completion order) to keep output deterministic;
+            # later shards keep generating while earlier ones are merged
+            for future in futures:
+                per_table += merge_shard(conn, future.result())
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    print_table_rows(per_table)
+    return sum(per_table.values())
+
+
+def generate(path: str, counts: dict, seed: int = 0, chunk_rows: int = CHUNK_ROWS, workers: int = 1) -> int:
+    if os.path.exists(path):
+        raise FileExistsError(f"{path} already exists; bulk generation needs a fresh database")
+    conn = sqlite3.connect(path, isolation_level=None)
+    tune_for_load(conn)
+    conn.executescript(schema_sql)
+
+    started = time.perf_counter()
+    if workers == 1:
+        total = load_serial(conn, counts, seed, chunk_rows)
+    else:
+        total = load_sharded(conn, path, counts, seed, chunk_rows, workers or os.cpu_count())
+
+    elapsed = time.perf_counter() - started
+    print(f"loaded {total:,} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)")
+    finish_load(conn)
+    conn.close()
+    return total
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default="claims.db")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--workers", type=int, default=1, help="generator processes; 0 uses every core")
+    for name, value in DEFAULT_COUNTS.items():
+        if isinstance(value, tuple):
+            continue
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    return parser.parse_args(argv)
+
+
+def counts_from_args(args) -> dict:
+    counts = dict(DEFAULT_COUNTS)
+    for name in counts:
+        if hasattr(args, name):
+            counts[name] = getattr(args, name)
+    return counts
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    generate(args.db, counts_from_args(args), seed=args.seed, chunk_rows=args.chunk_rows, workers=args.workers)
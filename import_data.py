@@ -0,0 +1,403 @@
+"""Streaming importer for claims, payment and audit extracts.
+
+Reads CSV or Parquet files in bounded chunks, coerces each value to the
+column's declared type in tables.py, rejects rows that break a CHECK or
+point at a missing parent row, and upserts the rest with executemany, one
+transaction per chunk. The chunk's checkpoint is saved in that same
+transaction, so after a crash a re-run picks up at the first uncommitted
+chunk.
+
+    python import_data.py --db claims.db claims=claims_2024-06-01.csv audit=claim_audit_logs.parquet
+
+Files are imported in the order given, so list parents before children.
+Rejected rows are appended to <file>.rejects.csv along with the reason.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+import time
+from datetime import date, datetime
+from itertools import islice
+
+from tables import TABLES, create_schema, schema_sql
+
+CHUNK_ROWS = 50_000
+
+# Table name aliases accepted on the command line
+ALIASES = {
+    "audit": "claim_audit_logs",
+    "payments": "premium_payments",
+    "documents": "claim_documents",
+    "communications": "communications_log",
+    "providers": "insurance_providers",
+}
+
+_CHECK_IN = re.compile(r"^\s*(\w+)\s+\w+\s+CHECK\s*\(\s*\1\s+IN\s*\(([^)]*)\)\s*\)", re.MULTILINE)
+_TRUE = {"1", "true", "t", "yes", "y"}
+_FALSE = {"0", "false", "f", "no", "n"}
+
+
+class RowError(ValueError):
+    """A row that cannot be imported; it goes to the rejects file"""
+
+
+def allowed_values() -> dict:
+    """Column -> allowed values, from the ``CHECK (col IN (...))`` clauses in schema_sql"""
+    return {
+        column: {v.strip().strip("'") for v in values.split(",")}
+        for column, values in _CHECK_IN.findall(schema_sql)
+    }
+
+
+def _text(value):
+    return str(value)
+
+
+def _integer(value):
+    if isinstance(value, int):
+        return value
+    number = float(value)
+    if not number.is_integer():
+        raise ValueError(f"{value!r} is not an integer")
+    return int(number)
+
+
+def _real(value):
+    return float(value)
+
+
+def _boolean(value):
+    if isinstance(value, (bool, int)):
+        return int(bool(value))
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return 1
+    if text in _FALSE:
+        return 0
+    raise ValueError(f"{value!r} is not a boolean")
+
+
+def _date(value):
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return date.fromisoformat(str(value).strip()[:10]).isoformat()
+
+
+def _timestamp(value):
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None).isoformat(sep=" ")
+    if isinstance(value, date):
+        return f"{value.isoformat()} 00:00:00"
+    return datetime.fromisoformat(str(value).strip()).replace(tzinfo=None).isoformat(sep=" ")
+
+
+COERCERS = {
+    "TEXT": _text,
+    "INTEGER": _integer,
+    "REAL": _real,
+    "BOOLEAN": _boolean,
+    "DATE": _date,
+    "TIMESTAMP": _timestamp,
+}
+
+
+class TableSpec:
+    """Column types, key, CHECK sets and foreign keys of one target table"""
+
+    def __init__(self, conn: sqlite3.Connection, table: str, checks: dict):
+        info = conn.execute(f"PRAGMA table_info({table})").fetchall()
+        self.table = table
+        self.types = {name: decl.upper() for _, name, decl, _, _, _ in info}
+        self.key = [name for _, name, _, _, _, pk in sorted(info, key=lambda r: r[5]) if pk]
+        self.checks = {column: values for column, values in checks.items() if column in self.types}
+        # (column, parent table, parent column)
+        self.foreign_keys = [
+            (row[3], row[2], row[4]) for row in conn.execute(f"PRAGMA foreign_key_list({table})")
+        ]
+
+    def bind(self, header: list[str]) -> "ChunkWriter":
+        unknown = [c for c in header if c not in self.types]
+        if unknown:
+            raise ValueError(f"{self.table} has no column(s) {', '.join(unknown)}")
+        missing = [c for c in self.key if c not in header]
+        if missing:
+            raise ValueError(f"{self.table} import needs key column(s) {', '.join(missing)}")
+        return ChunkWriter(self, header)
+
+
+class ChunkWriter:
+    """Validates and upserts chunks of rows with a fixed column list"""
+
+    def __init__(self, spec: TableSpec, columns: list[str]):
+        self.spec = spec
+        self.columns = columns
+        self.coercers = [COERCERS.get(spec.types[c], _text) for c in columns]
+        self.checks = [(i, spec.checks[c]) for i, c in enumerate(columns) if c in spec.checks]
+        self.key_positions = [columns.index(c) for c in spec.key]
+        self.fk_positions = [
+            (columns.index(column), parent, parent_column)
+            for column, parent, parent_column in spec.foreign_keys if column in columns
+        ]
+        updates = [c for c in columns if c not in spec.key]
+        conflict = (f"DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in updates)}"
+                    if updates else "DO NOTHING")
+        self.sql = (
+            f"INSERT INTO {spec.table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT ({', '.join(spec.key)}) {conflict}"
+        )
+
+    def coerce(self, raw: list) -> list:
+        if len(raw) != len(self.columns):
+            raise RowError(f"expected {len(self.columns)} fields, got {len(raw)}")
+        row = []
+        for column, coercer, value in zip(self.columns, self.coercers, raw):
+            if value is None or value == "":
+                row.append(None)
+                continue
+            try:
+                row.append(coercer(value))
+            except (TypeError, ValueError) as e:
+                raise RowError(f"{column}: {e}") from None
+        for i in self.key_positions:
+            if row[i] is None:
+                raise RowError(f"{self.columns[i]}: key column is empty")
+        for i, values in self.checks:
+            if row[i] is not None and row[i] not in values:
+                raise RowError(f"{self.columns[i]}: {row[i]!r} not in {sorted(values)}")
+        return row
+
+    def missing_parents(self, conn: sqlite3.Connection, rows: list) -> dict:
+        """Row index -> reason for rows whose foreign keys have no parent row"""
+        bad = {}
+        for i, parent, parent_column in self.fk_positions:
+            keys = list({row[i] for row in rows if row[i] is not None})
+            if not keys:
+                continue
+            # One probe of the parent's key per chunk instead of one per row
+            missing = {value for (value,) in conn.execute(
+                f"SELECT value FROM json_each(?) WHERE value NOT IN (SELECT {parent_column} FROM {parent})",
+                (json.dumps(keys),),
+            )}
+            if not missing:
+                continue
+            for n, row in enumerate(rows):
+                if row[i] in missing:
+                    bad.setdefault(n, f"{self.columns[i]}: no {parent} row with {parent_column} = {row[i]!r}")
+        return bad
+
+    def write(self, conn: sqlite3.Connection, raw_rows: list) -> tuple[int, list]:
+        """Upsert one chunk; returns (rows written, [(raw row, reason)] rejected)"""
+        rows, rejected = [], []
+        for raw in raw_rows:
+            try:
+                rows.append(self.coerce(raw))
+            except RowError as e:
+                rejected.append((raw, str(e)))
+        bad = self.missing_parents(conn, rows)
+        if bad:
+            rejected.extend((rows[n], reason) for n, reason in bad.items())
+            rows = [row for n, row in enumerate(rows) if n not in bad]
+        conn.executemany(self.sql, rows)
+        return len(rows), rejected
+
+
+# Sources yield (header, iterator of row-chunks), skipping the first ``skip`` rows
+
+def read_csv(path: str, chunk_rows: int, skip: int):
+    f = open(path, newline="", encoding="utf-8")
+    reader = csv.reader(f)
+    header = [name.strip() for name in next(reader)]
+
+    def chunks():
+        with f:
+            for _ in islice(reader, skip):
+                pass
+            while True:
+                chunk = list(islice(reader, chunk_rows))
+                if not chunk:
+                    return
+                yield chunk
+
+    return header, chunks()
+
+
+def read_parquet(path: str, chunk_rows: int, skip: int):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet import needs pyarrow: pip install pyarrow") from None
+    pf = pq.ParquetFile(path)
+    header = pf.schema_arrow.names
+
+    def chunks():
+        # Whole row groups already committed are skipped without being read
+        groups, to_skip = [], skip
+        for g in range(pf.num_row_groups):
+            rows = pf.metadata.row_group(g).num_rows
+            if to_skip >= rows:
+                to_skip -= rows
+            else:
+                groups.append(g)
+        for batch in pf.iter_batches(batch_size=chunk_rows, row_groups=groups):
+            if to_skip:
+                if to_skip >= batch.num_rows:
+                    to_skip -= batch.num_rows
+                    continue
+                batch, to_skip = batch.slice(to_skip), 0
+            columns = [column.to_pylist() for column in batch.columns]
+            yield [list(row) for row in zip(*columns)]
+
+    return header, chunks()
+
+
+READERS = {".csv": read_csv, ".parquet": read_parquet, ".pq": read_parquet}
+
+
+def create_checkpoints(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS import_checkpoints (
+            source TEXT,
+            table_name TEXT,
+            fingerprint TEXT,
+            rows_done INTEGER NOT NULL DEFAULT 0,
+            rows_rejected INTEGER NOT NULL DEFAULT 0,
+            completed BOOLEAN NOT NULL DEFAULT FALSE,
+            updated_at TIMESTAMP,
+            PRIMARY KEY (source, table_name)
+        )
+    """)
+
+
+def fingerprint(path: str) -> str:
+    st = os.stat(path)
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def load_checkpoint(conn: sqlite3.Connection, source: str, table: str) -> tuple[int, int, bool]:
+    """(rows already read, rows rejected, completed) for this file; a changed file starts over"""
+    row = conn.execute(
+        "SELECT fingerprint, rows_done, rows_rejected, completed FROM import_checkpoints "
+        "WHERE source = ? AND table_name = ?", (source, table),
+    ).fetchone()
+    if row is None:
+        return 0, 0, False
+    if row[0] != fingerprint(source):
+        print(f"{source} changed since its last import; starting from the top")
+        return 0, 0, False
+    return row[1], row[2], bool(row[3])
+
+
+def save_checkpoint(conn: sqlite3.Connection, source: str, table: str, rows_done: int,
+                    rows_rejected: int, completed: bool = False) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO import_checkpoints "
+        "(source, table_name, fingerprint, rows_done, rows_rejected, completed, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, datetime('now'))",
+        (source, table, fingerprint(source), rows_done, rows_rejected, completed),
+    )
+
+
+def write_rejects(path: str, header: list[str], rejected: list) -> None:
+    new = not os.path.exists(path)
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if new:
+            writer.writerow(header + ["_error"])
+        writer.writerows(list(row) + [reason] for row, reason in rejected)
+
+
+def import_file(conn: sqlite3.Connection, table: str, path: str, chunk_rows: int = CHUNK_ROWS,
+                checks: dict | None = None) -> dict:
+    """Stream one file into ``table``, resuming from its checkpoint"""
+    source = os.path.abspath(path)
+    done, rejected_total, completed = load_checkpoint(conn, source, table)
+    if completed:
+        print(f"{table} <- {path}: already imported ({done:,} rows)")
+        return {"table": table, "rows": 0, "rejected": 0, "skipped": True}
+    if done:
+        print(f"{table} <- {path}: resuming after row {done:,}")
+
+    reader = READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        raise ValueError(f"don't know how to read {path}; expected one of {', '.join(READERS)}")
+    header, chunks = reader(path, chunk_rows, done)
+    writer = TableSpec(conn, table, allowed_values() if checks is None else checks).bind(header)
+
+    rows_written = rows_rejected = 0
+    started = time.perf_counter()
+    for chunk in chunks:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            written, rejected = writer.write(conn, chunk)
+            done += len(chunk)
+            rejected_total += len(rejected)
+            save_checkpoint(conn, source, table, done, rejected_total)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        # Rejects are written after the commit; a crash in between can at
+        # worst repeat a chunk's rejects, never lose them
+        if rejected:
+            write_rejects(path + ".rejects.csv", header, rejected)
+        rows_written += written
+        rows_rejected += len(rejected)
+        elapsed = time.perf_counter() - started
+        print(f"{table}: {done:,} rows read, {rows_written:,} written, {rows_rejected:,} rejected "
+              f"({(rows_written + rows_rejected) / max(elapsed, 1e-9):,.0f} rows/s)")
+
+    conn.execute("BEGIN IMMEDIATE")
+    save_checkpoint(conn, source, table, done, rejected_total, completed=True)
+    conn.execute("COMMIT")
+    elapsed = time.perf_counter() - started
+    print(f"{table} <- {path}: {rows_written:,} rows upserted, {rows_rejected:,} rejected in {elapsed:.1f}s")
+    return {"table": table, "rows": rows_written, "rejected": rows_rejected, "skipped": False}
+
+
+def connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, isolation_level=None, timeout=30.0)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-256000")  # ~256 MiB
+    conn.execute("PRAGMA temp_store=MEMORY")
+    # Rows removed by a REPLACE conflict still fire the maintenance delete triggers
+    conn.execute("PRAGMA recursive_triggers=ON")
+    create_schema(conn)
+    create_checkpoints(conn)
+    return conn
+
+
+def parse_source(text: str) -> tuple[str, str]:
+    table, sep, path = text.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected TABLE=FILE, got {text!r}")
+    table = ALIASES.get(table, table)
+    if table not in TABLES:
+        raise argparse.ArgumentTypeError(f"unknown table {table!r}")
+    return table, path
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="+", type=parse_source, metavar="TABLE=FILE")
+    parser.add_argument("--db", default="claims.db")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--restart", action="store_true", help="ignore saved checkpoints for these files")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    conn = connect(args.db)
+    if args.restart:
+        for table, path in args.sources:
+            conn.execute("DELETE FROM import_checkpoints WHERE source = ? AND table_name = ?",
+                         (os.path.abspath(path), table))
+    for table, path in args.sources:
+        import_file(conn, table, path, chunk_rows=args.chunk_rows)
+    conn.close()
@@ -0,0 +1,110 @@
+import re
+import sqlite3
+import sys
+
+from batch import IN_LIST_THRESHOLD, batch_query
+from pagination import KEYSETS, page_query
+from queries import BATCH_QUERIES, QUERIES
+
+# Managed secondary indexes: (name, table, columns).
+# Each one matches the WHERE / ORDER BY of the tool queries in queries.py,
+# with trailing columns added where that lets SQLite answer from the index alone.
+INDEXES = [
+    ("idx_users_provider", "users", ("provider_id", "user_id", "name", "email", "phone")),
+    ("idx_policies_user_active", "policies", ("user_id", "active")),
+    ("idx_provider_plans_provider", "provider_plans", ("provider_id",)),
+    ("idx_premium_payments_policy_due", "premium_payments", ("policy_id", "due_date", "payment_id")),
+    ("idx_claims_user_service_date", "claims", ("user_id", "service_date", "claim_id")),
+    ("idx_pre_authorizations_user_date", "pre_authorizations", ("user_id", "request_date")),
+    ("idx_claim_audit_logs_claim_time", "claim_audit_logs", ("claim_id", "event_time", "audit_id")),
+    ("idx_claim_documents_claim_uploaded", "claim_documents", ("claim_id", "uploaded_at")),
+    ("idx_communications_log_user_sent", "communications_log", ("user_id", "sent_at", "log_id")),
+    # Covers the per-month rollup in summaries.py, so a refresh reads only the changed months
+    ("idx_claims_service_date", "claims",
+     ("service_date", "provider_id", "claim_type", "status", "amount_claimed", "amount_approved")),
+    # Incremental snapshot exports (snapshots.py) read only the claims past their watermark
+    ("idx_claims_submitted_at", "claims", ("submitted_at",)),
+]
+
+# Tools that are expected to read a whole table (the summary tables are small
+# or already reduced to the rows these tools list)
+ALLOW_SCAN = {"get_active_policies", "get_provider_claim_totals", "get_claims_missing_documents"}
+
+_PARAM = re.compile(r":(\w+)")
+
+
+def index_ddl() -> list[str]:
+    return [
+        f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+        for name, table, columns in INDEXES
+    ]
+
+
+def create_indexes(conn: sqlite3.Connection) -> None:
+    """Create the managed index set, rebuilding any whose columns have changed"""
+    for (name, _, columns), ddl in zip(INDEXES, index_ddl()):
+        existing = tuple(row[2] for row in conn.execute(f"PRAGMA index_info({name})"))
+        if existing and existing != columns:
+            conn.execute(f"DROP INDEX {name}")
+        conn.execute(ddl)
+    # Refresh planner statistics only where they are missing or stale
+    conn.execute("PRAGMA optimize")
+
+
+def query_plan(conn: sqlite3.Connection, query: str) -> list[str]:
+    """The EXPLAIN QUERY PLAN steps of ``query``, with every parameter bound to NULL"""
+    params = {name: None for name in _PARAM.findall(query)}
+    return [detail for _, _, _, detail in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+
+def table_scans(conn: sqlite3.Connection, query: str) -> list[str]:
+    """Return the EXPLAIN QUERY PLAN steps of ``query`` that scan a table"""
+    return [
+        detail for detail in query_plan(conn, query)
+        if detail.startswith("SCAN ")
+        and not detail.startswith("SCAN CONSTANT ROW")
+        and "VIRTUAL TABLE" not in detail
+    ]
+
+
+def check_query_plans(conn: sqlite3.Connection, queries: dict = QUERIES, batch_queries: dict = BATCH_QUERIES,
+                      allow_scan: set = ALLOW_SCAN) -> dict:
+    """Map each tool whose query still scans a table to the offending plan steps"""
+    failures = {}
+    for tool, query in batch_queries.items():
+        # Check the json_each() form used for long ID lists
+        sql = batch_query(query, [str(i) for i in range(IN_LIST_THRESHOLD + 1)])[0]
+        scans = table_scans(conn, sql)
+        if scans:
+            failures[tool] = scans
+    for tool, query in queries.items():
+        if tool in allow_scan:
+            continue
+        if tool in KEYSETS:
+            # Check both the first page and the seek page of list tools
+            scans = table_scans(conn, page_query(tool, query, seek=False))
+            scans += table_scans(conn, page_query(tool, query, seek=True))
+        else:
+            scans = table_scans(conn, query)
+        if scans:
+            failures[tool] = scans
+    return failures
+
+
+if __name__ == "__main__":
+    # Check against a fresh in-memory copy of the schema, or an existing database file
+    if len(sys.argv) > 1:
+        conn = sqlite3.connect(sys.argv[1])
+    else:
+        from tables import create_schema
+
+        conn = sqlite3.connect(":memory:")
+        create_schema(conn)
+
+    failures = check_query_plans(conn)
+    conn.close()
+    for tool, scans in failures.items():
+        print(f"{tool}: {'; '.join(scans)}")
+    if failures:
+        sys.exit(f"{len(failures)} tool queries still scan a table")
+    print(f"All {len(QUERIES) + len(BATCH_QUERIES) - len(ALLOW_SCAN)} tool queries use an index")
@@ -0,0 +1,258 @@
+import bisect
+import functools
+import inspect
+import json
+import logging
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+LATENCY_MS_BOUNDS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+ROW_BOUNDS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+BYTE_BOUNDS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# Per-call counters filled in by the query helpers while a tool runs
+_CALL = ContextVar("tool_call", default=None)
+# Open trace file while tool calls are being recorded for replay (see bench.py)
+_trace = None
+_trace_lock = threading.Lock()
+
+
+class Histogram:
+    """Fixed-bucket histogram; quantiles are reported as bucket upper bounds"""
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q: float) -> float | None:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class ToolMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.wall_ms = Histogram(LATENCY_MS_BOUNDS)
+        self.sql_ms = Histogram(LATENCY_MS_BOUNDS)
+        self.rows = Histogram(ROW_BOUNDS)
+        self.bytes = Histogram(BYTE_BOUNDS)
+
+    def record(self, wall_ms: float, call: dict, size: int, error: bool) -> None:
+        with self.lock:
+            self.calls += 1
+            self.errors += error
+            self.wall_ms.observe(wall_ms)
+            self.bytes.observe(size)
+            if call["queries"]:
+                self.sql_ms.observe(call["sql_ms"])
+                self.rows.observe(call["rows"])
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "wall_ms": self.wall_ms.snapshot(),
+                "sql_ms": self.sql_ms.snapshot(),
+                "rows": self.rows.snapshot(),
+                "bytes": self.bytes.snapshot(),
+            }
+
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def _tool_metrics(tool: str) -> ToolMetrics:
+    with _metrics_lock:
+        return _metrics.setdefault(tool, ToolMetrics())
+
+
+@contextmanager
+def sql_timer():
+    """Attribute the time spent in the block to the running tool's SQL time"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        call = _CALL.get()
+        if call is not None:
+            call["sql_ms"] += (time.perf_counter() - start) * 1000
+            call["queries"] += 1
+
+
+def record_rows(count: int) -> None:
+    """Add to the running tool's returned-row count"""
+    call = _CALL.get()
+    if call is not None:
+        call["rows"] += count
+
+
+def counted(fn, *args):
+    """Run ``fn(*args)`` on call counters of its own; returns (result, counters).
+
+    For work a tool fans out to other threads: each part counts into its own
+    dict and the tool adds them up with ``add_counts`` after the join, so no
+    two threads ever update the same counters.
+    """
+    if _CALL.get() is None:
+        return fn(*args), None
+    counters = {"sql_ms": 0.0, "rows": 0, "queries": 0}
+    token = _CALL.set(counters)
+    try:
+        return fn(*args), counters
+    finally:
+        _CALL.reset(token)
+
+
+def add_counts(counters: dict | None) -> None:
+    """Add the counters of a part returned by ``counted`` to the running tool's"""
+    call = _CALL.get()
+    if call is not None and counters is not None:
+        for name, value in counters.items():
+            call[name] += value
+
+
+def _result_size(result) -> int:
+    if isinstance(result, str):
+        return len(result.encode())
+    return len(json.dumps(result, default=str).encode())
+
+
+def start_trace(path: str) -> None:
+    """Append one JSON line per tool call (tool, arguments, timing) to ``path``"""
+    global _trace
+    with _trace_lock:
+        _trace = open(path, "a", buffering=1, encoding="utf-8")
+
+
+def _record_trace(tool: str, kwargs: dict, started: float, wall_ms: float, error: bool) -> None:
+    line = json.dumps({"ts": started, "tool": tool, "arguments": kwargs, "wall_ms": round(wall_ms, 3),
+                       "error": error}, default=str)
+    with _trace_lock:
+        if _trace is not None:
+            _trace.write(line + "\n")
+
+
+def process_memory() -> dict:
+    """Current and peak resident set size of this process, in bytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # kilobytes on Linux
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        rss = None
+    return {"rss_bytes": rss, "peak_rss_bytes": peak}
+
+
+def instrumented(fn):
+    """Record wall time, SQL time, rows, payload bytes and errors for a tool"""
+    tool = fn.__name__
+    metrics = _tool_metrics(tool)
+
+    def finish(start, call, result, error, kwargs):
+        wall_ms = (time.perf_counter() - start) * 1000
+        # Tools report errors by raising ToolError
+        metrics.record(wall_ms, call, 0 if error else _result_size(result), error)
+        if _trace is not None:
+            _record_trace(tool, kwargs, time.time() - wall_ms / 1000, wall_ms, error)
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            call = {"sql_ms": 0.0, "rows": 0, "queries": 0}
+            token = _CALL.set(call)
+            start = time.perf_counter()
+            result, error = None, True
+            try:
+                result = await fn(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                _CALL.reset(token)
+                finish(start, call, result, error, kwargs)
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            call = {"sql_ms": 0.0, "rows": 0, "queries": 0}
+            token = _CALL.set(call)
+            start = time.perf_counter()
+            result, error = None, True
+            try:
+                result = fn(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                _CALL.reset(token)
+                finish(start, call, result, error, kwargs)
+
+    return wrapper
+
+
+def snapshot() -> dict:
+    """Per-tool histograms, busiest tools by total wall time first"""
+    with _metrics_lock:
+        items = list(_metrics.items())
+    tools = {tool: m.snapshot() for tool, m in items}
+    return dict(sorted(
+        tools.items(),
+        key=lambda kv: -(kv[1]["wall_ms"]["mean"] or 0) * kv[1]["calls"],
+    ))
+
+
+def start_periodic_log(interval: float) -> threading.Thread:
+    """Log a compact stats summary every ``interval`` seconds.
+
+    Goes through logging, which the server points at stderr, so it never
+    mixes with the stdio protocol stream.
+    """
+    def loop():
+        while True:
+            time.sleep(interval)
+            summary = {
+                tool: {"calls": s["calls"], "errors": s["errors"],
+                       "p50_ms": s["wall_ms"]["p50"], "p99_ms": s["wall_ms"]["p99"]}
+                for tool, s in snapshot().items() if s["calls"]
+            }
+            logger.info("tool stats %s", json.dumps(summary))
+
+    thread = threading.Thread(target=loop, name="stats-log", daemon=True)
+    thread.start()
+    return thread
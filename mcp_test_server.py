@@ -1,384 +1,713 @@
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.server.fastmcp.exceptions import ToolError
 from typing import List, Dict
-from langchain_community.utilities import SQLDatabase
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import json
 import logging
-import sqlite3
+import os
+import sys
+
+from batch import batch_query
+from backends import open_backend
+from instrumentation import (add_counts, counted, instrumented, process_memory, snapshot, sql_timer, start_periodic_log,
+                             start_trace)
+from pagination import DEFAULT_PAGE_SIZE, next_cursor_fn, page_query, paginate
+from queries import BATCH_QUERIES, QUERIES
+from query_executor import QueryExecutor
+from result_cache import NoCache, ResultCache
+from result_encoder import MAX_RESULT_BYTES, encode_grouped, encode_rows
+from streaming import CHUNK_ROWS, MAX_CHUNK_ROWS, MAX_STREAM_ROWS, ResultStreamer, can_stream
+import summaries
 
 mcp = FastMCP("Claims")
-db = SQLDatabase.from_uri("sqlite:///claims.db")  # Replace with your actual DB URI
+backend = open_backend()  # Shared by every tool; set CLAIMS_DATABASE_URL to pick the database
+cache = ResultCache(backend.path) if backend.dialect == "sqlite" else NoCache()
+executor = QueryExecutor(max_workers=backend.size)  # Keeps blocking database work off the event loop
+section_executor = ThreadPoolExecutor(max_workers=backend.size, thread_name_prefix="user360")
+streamer = ResultStreamer(backend)  # Large list results go out in chunks (streaming.py)
 logger = logging.getLogger(__name__)
 
+DEFAULT_SEARCH_RESULTS = 20
+MAX_SEARCH_RESULTS = 100
+
+
+def run_query(query: str, parameters: dict | None = None, limit: int | None = None,
+              offset: int = 0, max_bytes: int | None = MAX_RESULT_BYTES, stream: bool = False) -> str:
+    """Run a read-only query on a pooled connection and return columnar JSON.
+
+    ``stream`` fetches the rows through a server-side cursor where the backend has them.
+    """
+    with sql_timer(), backend.cursor(query, parameters, stream=stream) as cursor:
+        return encode_rows(cursor, limit=limit, offset=offset, max_bytes=max_bytes)
+
+
+def run_page(tool: str, parameters: dict, page_size: int | None, cursor: str | None) -> str:
+    """Run one keyset-paginated page of a list tool; the result carries next_cursor"""
+    query, params, page_size = paginate(tool, backend.queries[tool], parameters, page_size, cursor)
+    with sql_timer(), backend.cursor(query, params) as rows:
+        return encode_rows(rows, limit=page_size, next_cursor=next_cursor_fn(tool, rows.description))
+
+
+def run_search(tool: str, text: str, user_id: str | None, match_any: bool, max_results: int) -> str:
+    """Run a full-text search tool's query for free ``text``"""
+    match = backend.search_query(text, any_term=match_any)
+    if not match:
+        raise ValueError("search text has no words to match")
+    max_results = max(1, min(max_results, MAX_SEARCH_RESULTS))
+    return run_query(backend.queries[tool], parameters={"query": match, "user_id": user_id, "max_results": max_results})
+
+
+async def stream_page(ctx: Context, tool: str, parameters: dict, cursor: str | None,
+                      max_rows: int, chunk_rows: int) -> str:
+    """Stream a list tool's rows from ``cursor`` on as progress notifications.
+
+    Without a progress token the client gets one page of chunk_rows rows instead.
+    """
+    chunk_rows = max(1, min(chunk_rows, MAX_CHUNK_ROWS))
+    if not can_stream(ctx):
+        return await streamer.call(run_page, tool, parameters, chunk_rows, cursor)
+    max_rows = max(1, min(max_rows, MAX_STREAM_ROWS))
+    query, params, _ = paginate(tool, backend.queries[tool], parameters, None, cursor)
+    params["page_limit"] = max_rows + 1
+    return await streamer.stream(ctx, query, params, chunk_rows=chunk_rows, max_rows=max_rows, tool=tool)
+
+
+def run_batch(tool: str, ids: list[str]) -> str:
+    """Run a batch tool's single IN query and return its rows grouped by ID"""
+    query, params, ids = batch_query(backend.batch_queries[tool], ids, dialect=backend.dialect)
+    with sql_timer(), backend.cursor(query, params) as cursor:
+        return encode_grouped(cursor, ids)
+
 @mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["get_user_by_id"])
 def get_user_by_id(user_id: str) -> str:
     """Retrieve a single user's details by their user_id"""
-    query = """
-    SELECT user_id, name, dob, health_card, email, phone, provider_id 
-    FROM users 
-    WHERE user_id = :user_id
-    """
+    query = backend.queries["get_user_by_id"]
     try:
-        results = db.run(query, parameters={"user_id": user_id})
-        print(f"[get_user_by_id] Raw result: {results}")  # ✅ Debug line
+        results = run_query(query, parameters={"user_id": user_id})
+        logger.debug("[get_user_by_id] Raw result: %s", results)
         return results
     except Exception as e:
-        print(f"[get_user_by_id] ❗ Database error: {str(e)}")
-        return []
+        logger.error("[get_user_by_id] Database error: %s", e)
+        raise ToolError(str(e)) from e
 
 @mcp.tool()
-def get_users_by_provider(provider_id: str) -> str:
-    """Find all users associated with a specific insurance provider"""
-    query = """
-    SELECT user_id, name, email, phone 
-    FROM users 
-    WHERE provider_id = :provider_id
-    """
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["get_users_by_provider"])
+def get_users_by_provider(provider_id: str, page_size: int = DEFAULT_PAGE_SIZE, cursor: str | None = None) -> str:
+    """Find all users associated with a specific insurance provider.
+    Pass the returned next_cursor as cursor to fetch the next page."""
     try:
-        results = db.run(query, parameters={"provider_id": provider_id})
+        results = run_page("get_users_by_provider", {"provider_id": provider_id}, page_size, cursor)
         return results
     except Exception as e:
-        print(f"Database error: {str(e)}")
-        return []
+        logger.error("[get_users_by_provider] Database error: %s", e)
+        raise ToolError(str(e)) from e
 
 # Policy tools
 @mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["get_policies_by_user"])
 def get_policies_by_user(user_id: str) -> str:
     """Retrieve all insurance policies for a specific user"""
-    query = """
-    SELECT p.policy_id, p.policy_number, p.plan_type, 
-           p.coverage_start, p.coverage_end, p.monthly_premium,
-           ip.name as provider_name
-    FROM policies p
-    JOIN insurance_providers ip ON p.provider_id = ip.provider_id
-    WHERE p.user_id = :user_id AND p.active = TRUE
-    """
+    query = backend.queries["get_policies_by_user"]
     try:
-        return db.run(query, parameters={"user_id": user_id})
+        return run_query(query, parameters={"user_id": user_id})
     except Exception as e:
-        print(f"Database error: {str(e)}")
-        return []
+        logger.error("[get_policies_by_user] Database error: %s", e)
+        raise ToolError(str(e)) from e
 
 @mcp.tool()
-def get_active_policies() -> str:
-    """List all currently active insurance policies"""
-    query = """
-    SELECT p.policy_id, u.name as user_name, ip.name as provider_name,
-           p.policy_number, p.coverage_end, p.monthly_premium
-    FROM policies p
-    JOIN users u ON p.user_id = u.user_id
-    JOIN insurance_providers ip ON p.provider_id = ip.provider_id
-    WHERE p.active = TRUE
-    """
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["get_active_policies"])
+def get_active_policies(page_size: int = DEFAULT_PAGE_SIZE, cursor: str | None = None) -> str:
+    """List all currently active insurance policies.
+    Pass the returned next_cursor as cursor to fetch the next page."""
     try:
-        return db.run(query)
+        return run_page("get_active_policies", {}, page_size, cursor)
     except Exception as e:
-        print(f"Database error: {str(e)}")
-        return []
+        logger.error("[get_active_policies] Database error: %s", e)
+        raise ToolError(str(e)) from e
 
 # Claim tools
 @mcp.tool()
-def get_claims_by_user_id(user_id: str) -> list[Dict]:
-    import sqlite3
-    """Retrieve all claims submitted by a specific user"""
-    try:
-        query= """
-                SELECT c.claim_id, c.service_date, c.claim_type, 
-                       c.amount_claimed, c.amount_approved, c.status,
-                       p.policy_number
-                FROM claims c
-                JOIN policies p ON c.policy_id = p.policy_id
-                WHERE c.user_id = ?
-                ORDER BY c.service_date DESC
-            """
-            
-        conn = sqlite3.connect("claims.db")
-        cursor = conn.cursor()
-        cursor.execute(query, (user_id,))
-            
-            # Convert to list of dictionaries
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
-            
-    except Exception as e:
-        print("Inside error in get_claims_by_user")
-        print(f"Database error: {str(e)}")
-        return []
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["get_claims_by_user_id"])
+def get_claims_by_user_id(user_id: str, page_size: int = DEFAULT_PAGE_SIZE, cursor: str | None = None) -> str:
+    """Retrieve all claims submitted by a specific user, newest first.
+    Pass the returned next_cursor as cursor to fetch the next page."""
+    try:
+        return run_page("get_claims_by_user_id", {"user_id": user_id}, page_size, cursor)
+    except Exception as e:
+        logger.error("[get_claims_by_user_id] Database error: %s", e)
+        raise ToolError(str(e)) from e
 
 @mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["get_claim_details"])
 def get_claim_details(claim_id: str) -> str:
     """Get detailed information about a specific claim"""
-    query = """
-    SELECT c.claim_id,
-    c.user_id,
-    c.provider_id,
-    c.policy_id,
-    c.service_date,
-    c.claim_type,
-    c.service_code,
-    c.description,
-    c.amount_claimed,
-    c.amount_approved,
-    c.status,
-    c.submitted_at,
-    u.name as user_name, 
-    p.policy_number,
-    ip.name as provider_name
-    FROM claims c
-    JOIN users u ON c.user_id = u.user_id
-    JOIN policies p ON c.policy_id = p.policy_id
-    JOIN insurance_providers ip ON c.provider_id = ip.provider_id
-    WHERE c.claim_id = :claim_id
-    """
+    query = backend.queries["get_claim_details"]
     try:
-        return db.run(query, parameters={"claim_id": claim_id})
+        return run_query(query, parameters={"claim_id": claim_id})
     except Exception as e:
-        print(f"Database error: {str(e)}")
-        return []
+        logger.error("[get_claim_details] Database error: %s", e)
+        raise ToolError(str(e)) from e
 
 # Provider tools
 @mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["get_provider_details"])
 def get_provider_details(provider_id: str) -> str:
     """Get information about an insurance provider"""
-    query = """
-    SELECT provider_id, name, description
-    FROM insurance_providers
-    WHERE provider_id = :provider_id
-    """
+    query = backend.queries["get_provider_details"]
     try:
-        return db.run(query, parameters={"provider_id": provider_id})
+        return run_query(query, parameters={"provider_id": provider_id})
     except Exception as e:
-        print(f"Database error: {str(e)}")
-        return []
+        logger.error("[get_provider_details] Database error: %s", e)
+        raise ToolError(str(e)) from e
 
 @mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["get_provider_plans"])
 def get_provider_plans(provider_id: str) -> str:
     """List all available plans from a specific insurance provider"""
-    query = """
-    SELECT plan_id, name, description, base_premium,
-           drug_limit, dental_limit, vision_limit
-    FROM provider_plans
-    WHERE provider_id = :provider_id
-    """
+    query = backend.queries["get_provider_plans"]
     try:
-        return db.run(query, parameters={"provider_id": provider_id})
+        return run_query(query, parameters={"provider_id": provider_id})
     except Exception as e:
-        print(f"Database error: {str(e)}")
-        return []
+        logger.error("[get_provider_plans] Database error: %s", e)
+        raise ToolError(str(e)) from e
 
 # Payment tools
 @mcp.tool()
-def get_payments_by_policy(policy_id: str) -> str:
-    """Retrieve payment history for a specific policy"""
-    query = """
-    SELECT payment_id, due_date, paid_date, 
-           amount_due, amount_paid, payment_status
-    FROM premium_payments
-    WHERE policy_id = :policy_id
-    ORDER BY due_date DESC
-    """
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["get_payments_by_policy"])
+def get_payments_by_policy(policy_id: str, page_size: int = DEFAULT_PAGE_SIZE, cursor: str | None = None) -> str:
+    """Retrieve payment history for a specific policy, latest due date first.
+    Pass the returned next_cursor as cursor to fetch the next page."""
     try:
-        return db.run(query, parameters={"policy_id": policy_id})
+        return run_page("get_payments_by_policy", {"policy_id": policy_id}, page_size, cursor)
     except Exception as e:
-        print(f"Database error: {str(e)}")
-        return []
+        logger.error("[get_payments_by_policy] Database error: %s", e)
+        raise ToolError(str(e)) from e
 
 # Coverage tools
 @mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["get_coverage_limits"])
 def get_coverage_limits(user_id: str) -> str:
     """Get coverage limits and usage for a specific user"""
-    query = """
-    SELECT claim_type, year, max_coverage, used_coverage
-    FROM coverage_limits
-    WHERE user_id = :user_id
-    ORDER BY year DESC, claim_type
-    """
+    query = backend.queries["get_coverage_limits"]
     try:
-        return db.run(query, parameters={"user_id": user_id})
+        return run_query(query, parameters={"user_id": user_id})
     except Exception as e:
-        print(f"Database error: {str(e)}")
-        return []
+        logger.error("[get_coverage_limits] Database error: %s", e)
+        raise ToolError(str(e)) from e
 
 # Pre-authorization tools
 @mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["get_pre_authorizations"])
 def get_pre_authorizations(user_id: str) -> str:
     """Retrieve pre-authorization requests for a user"""
-    query = """
-    SELECT auth_id, service_requested, estimated_cost,
-           request_date, approved_date, status
-    FROM pre_authorizations
-    WHERE user_id = :user_id
-    ORDER BY request_date DESC
-    """
+    query = backend.queries["get_pre_authorizations"]
     try:
-        return db.run(query, parameters={"user_id": user_id})
+        return run_query(query, parameters={"user_id": user_id})
     except Exception as e:
-        print(f"Database error: {str(e)}")
-        return []
+        logger.error("[get_pre_authorizations] Database error: %s", e)
+        raise ToolError(str(e)) from e
     
 
 # Dental details Tools
 @mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["get_dental_details_by_user"])
 def get_dental_details_by_user(user_id: str) -> str:
     """Retrieve all dental details for a specific user with procedure details"""
-    query = """
-    SELECT c.claim_id, c.service_date, c.status, 
-           d.category, d.tooth_code, d.procedure_code
-    FROM claims c
-    JOIN dental_details d ON c.claim_id = d.claim_id
-    WHERE c.user_id = :user_id
-    ORDER BY c.service_date DESC
-    """
+    query = backend.queries["get_dental_details_by_user"]
     try:
-        return db.run(query, parameters={"user_id": user_id})
+        return run_query(query, parameters={"user_id": user_id})
     except Exception as e:
-        print(f"Database error: {str(e)}")
-        return []
+        logger.error("[get_dental_details_by_user] Database error: %s", e)
+        raise ToolError(str(e)) from e
 
 # Drug details Tools  
 @mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["get_drug_details_by_user"])
 def get_drug_details_by_user(user_id: str) -> str:
     """Get all prescription drug details for a user with medication details"""
-    query = """
-    SELECT c.claim_id, c.service_date, c.status,
-           d.drug_name, d.DIN_code, d.quantity, d.dosage
-    FROM claims c
-    JOIN drug_details d ON c.claim_id = d.claim_id
-    WHERE c.user_id = :user_id
-    ORDER BY c.service_date DESC
-    """
+    query = backend.queries["get_drug_details_by_user"]
     try:
-        return db.run(query, parameters={"user_id": user_id})
+        return run_query(query, parameters={"user_id": user_id})
     except Exception as e:
-        print(f"Database error: {str(e)}")
-        return []
+        logger.error("[get_drug_details_by_user] Database error: %s", e)
+        raise ToolError(str(e)) from e
 
 # Hospital Visits Tools
 @mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["get_hospital_visits_by_user"])
 def get_hospital_visits_by_user(user_id: str) -> str:
     """Retrieve all hospital visits for a user with stay details"""
-    query = """
-    SELECT c.claim_id, c.service_date, c.status,
-           h.room_type, h.admission_date, h.discharge_date
-    FROM claims c
-    JOIN hospital_visits h ON c.claim_id = h.claim_id
-    WHERE c.user_id = :user_id
-    ORDER BY h.admission_date DESC
-    """
+    query = backend.queries["get_hospital_visits_by_user"]
     try:
-        return db.run(query, parameters={"user_id": user_id})
+        return run_query(query, parameters={"user_id": user_id})
     except Exception as e:
-        print(f"Database error: {str(e)}")
-        return []
+        logger.error("[get_hospital_visits_by_user] Database error: %s", e)
+        raise ToolError(str(e)) from e
 
 # Vision Claims Tools
 @mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["get_vision_claims_by_user"])
 def get_vision_claims_by_user(user_id: str) -> str:
     """Get all vision care claims for a user with product details"""
-    query = """
-    SELECT c.claim_id, c.service_date, c.status,
-           v.product_type, v.coverage_limit, v.eligibility_date
-    FROM claims c
-    JOIN vision_claims v ON c.claim_id = v.claim_id
-    WHERE c.user_id = :user_id
-    ORDER BY c.service_date DESC
-    """
+    query = backend.queries["get_vision_claims_by_user"]
     try:
-        return db.run(query, parameters={"user_id": user_id})
+        return run_query(query, parameters={"user_id": user_id})
     except Exception as e:
-        print(f"Database error: {str(e)}")
-        return []
+        logger.error("[get_vision_claims_by_user] Database error: %s", e)
+        raise ToolError(str(e)) from e
 
 # Coverage Limits Tools
 @mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["get_user_coverage_limits"])
 def get_user_coverage_limits(user_id: str)  -> str:
     """Retrieve all coverage limits and usage for a specific user"""
-    query = """
-    SELECT claim_type, year, max_coverage, used_coverage,
-           (max_coverage - used_coverage) as remaining_coverage
-    FROM coverage_limits
-    WHERE user_id = :user_id
-    ORDER BY year DESC, claim_type
-    """
+    query = backend.queries["get_user_coverage_limits"]
     try:
-        return db.run(query, parameters={"user_id": user_id})
+        return run_query(query, parameters={"user_id": user_id})
     except Exception as e:
-        print(f"Database error: {str(e)}")
-        return []
+        logger.error("[get_user_coverage_limits] Database error: %s", e)
+        raise ToolError(str(e)) from e
 
 # Claim Audit Tools
 @mcp.tool()
-def get_claim_audit_logs(user_id: str) -> str:
-    """Get audit history for all claims belonging to a user"""
-    query = """
-    SELECT a.audit_id, a.event_time, a.event_type,
-           a.performed_by, c.claim_id, c.claim_type
-    FROM claim_audit_logs a
-    JOIN claims c ON a.claim_id = c.claim_id
-    WHERE c.user_id = :user_id
-    ORDER BY a.event_time DESC
-    LIMIT 50
-    """
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["get_claim_audit_logs"])
+def get_claim_audit_logs(user_id: str, page_size: int = DEFAULT_PAGE_SIZE, cursor: str | None = None) -> str:
+    """Get audit history for all claims belonging to a user, newest first.
+    Pass the returned next_cursor as cursor to fetch the next page."""
     try:
-        return db.run(query, parameters={"user_id": user_id})
+        return run_page("get_claim_audit_logs", {"user_id": user_id}, page_size, cursor)
     except Exception as e:
-        print(f"Database error: {str(e)}")
-        return []
+        logger.error("[get_claim_audit_logs] Database error: %s", e)
+        raise ToolError(str(e)) from e
 
 # Claim Documents Tools
 @mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["get_user_claim_documents"])
 def get_user_claim_documents(user_id: str) -> str:
     """Retrieve all documents submitted with a user's claims"""
-    query = """
-    SELECT d.document_id, d.file_name, d.uploaded_at,
-           d.document_type, c.claim_id, c.claim_type
-    FROM claim_documents d
-    JOIN claims c ON d.claim_id = c.claim_id
-    WHERE c.user_id = :user_id
-    ORDER BY d.uploaded_at DESC
-    """
+    query = backend.queries["get_user_claim_documents"]
     try:
-        return db.run(query, parameters={"user_id": user_id})
+        return run_query(query, parameters={"user_id": user_id})
     except Exception as e:
-        print(f"Database error: {str(e)}")
-        return []
+        logger.error("[get_user_claim_documents] Database error: %s", e)
+        raise ToolError(str(e)) from e
 
 # User Preferences Tools
 @mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["get_user_preferences"])
 def get_user_preferences(user_id: str)  -> str:
     """Get communication preferences and settings for a user"""
-    query = """
-    SELECT communication_opt_in, consent_to_share_data,
-           language_preference, timezone
-    FROM user_preferences
-    WHERE user_id = :user_id
-    """
+    query = backend.queries["get_user_preferences"]
     try:
-        return db.run(query, parameters={"user_id": user_id})
+        return run_query(query, parameters={"user_id": user_id})
     except Exception as e:
-        print(f"Database error: {str(e)}")
-        return []
+        logger.error("[get_user_preferences] Database error: %s", e)
+        raise ToolError(str(e)) from e
 
 # Communications Log Tools
 @mcp.tool()
-def get_user_communications(user_id: str)  -> str:
-    """Retrieve all communications sent to/from a user"""
-    query = """
-    SELECT log_id, type, subject, sent_at, status
-    FROM communications_log
-    WHERE user_id = :user_id
-    ORDER BY sent_at DESC
-    LIMIT 50
-    """
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["get_user_communications"])
+def get_user_communications(user_id: str, page_size: int = DEFAULT_PAGE_SIZE, cursor: str | None = None) -> str:
+    """Retrieve all communications sent to/from a user, newest first.
+    Pass the returned next_cursor as cursor to fetch the next page."""
     try:
-        return db.run(query, parameters={"user_id": user_id})
+        return run_page("get_user_communications", {"user_id": user_id}, page_size, cursor)
     except Exception as e:
-        print(f"Database error: {str(e)}")
-        return []
+        logger.error("[get_user_communications] Database error: %s", e)
+        raise ToolError(str(e)) from e
 
+# Batch tools: one query for a whole list of users
 @mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(BATCH_QUERIES["get_users_by_ids"])
+def get_users_by_ids(user_ids: list[str]) -> str:
+    """Retrieve details for many users in one call, grouped by user_id"""
+    try:
+        return run_batch("get_users_by_ids", user_ids)
+    except Exception as e:
+        logger.error("[get_users_by_ids] Database error: %s", e)
+        raise ToolError(str(e)) from e
+
+@mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(BATCH_QUERIES["get_policies_by_users"])
+def get_policies_by_users(user_ids: list[str]) -> str:
+    """Retrieve active insurance policies for many users in one call, grouped by user_id"""
+    try:
+        return run_batch("get_policies_by_users", user_ids)
+    except Exception as e:
+        logger.error("[get_policies_by_users] Database error: %s", e)
+        raise ToolError(str(e)) from e
+
+@mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(BATCH_QUERIES["get_claims_by_user_ids"])
+def get_claims_by_user_ids(user_ids: list[str]) -> str:
+    """Retrieve claims for many users in one call, grouped by user_id, newest first"""
+    try:
+        return run_batch("get_claims_by_user_ids", user_ids)
+    except Exception as e:
+        logger.error("[get_claims_by_user_ids] Database error: %s", e)
+        raise ToolError(str(e)) from e
+
+@mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(BATCH_QUERIES["get_coverage_limits_by_users"])
+def get_coverage_limits_by_users(user_ids: list[str]) -> str:
+    """Get coverage limits, usage and remaining coverage for many users in one call, grouped by user_id"""
+    try:
+        return run_batch("get_coverage_limits_by_users", user_ids)
+    except Exception as e:
+        logger.error("[get_coverage_limits_by_users] Database error: %s", e)
+        raise ToolError(str(e)) from e
+
+@mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(BATCH_QUERIES["get_pre_authorizations_by_users"])
+def get_pre_authorizations_by_users(user_ids: list[str]) -> str:
+    """Retrieve pre-authorization requests for many users in one call, grouped by user_id"""
+    try:
+        return run_batch("get_pre_authorizations_by_users", user_ids)
+    except Exception as e:
+        logger.error("[get_pre_authorizations_by_users] Database error: %s", e)
+        raise ToolError(str(e)) from e
+
+@mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(BATCH_QUERIES["get_dental_details_by_users"])
+def get_dental_details_by_users(user_ids: list[str]) -> str:
+    """Retrieve dental details for many users in one call, grouped by user_id"""
+    try:
+        return run_batch("get_dental_details_by_users", user_ids)
+    except Exception as e:
+        logger.error("[get_dental_details_by_users] Database error: %s", e)
+        raise ToolError(str(e)) from e
+
+@mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(BATCH_QUERIES["get_drug_details_by_users"])
+def get_drug_details_by_users(user_ids: list[str]) -> str:
+    """Get prescription drug details for many users in one call, grouped by user_id"""
+    try:
+        return run_batch("get_drug_details_by_users", user_ids)
+    except Exception as e:
+        logger.error("[get_drug_details_by_users] Database error: %s", e)
+        raise ToolError(str(e)) from e
+
+@mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(BATCH_QUERIES["get_hospital_visits_by_users"])
+def get_hospital_visits_by_users(user_ids: list[str]) -> str:
+    """Retrieve hospital visits for many users in one call, grouped by user_id"""
+    try:
+        return run_batch("get_hospital_visits_by_users", user_ids)
+    except Exception as e:
+        logger.error("[get_hospital_visits_by_users] Database error: %s", e)
+        raise ToolError(str(e)) from e
+
+@mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(BATCH_QUERIES["get_vision_claims_by_users"])
+def get_vision_claims_by_users(user_ids: list[str]) -> str:
+    """Get vision care claims for many users in one call, grouped by user_id"""
+    try:
+        return run_batch("get_vision_claims_by_users", user_ids)
+    except Exception as e:
+        logger.error("[get_vision_claims_by_users] Database error: %s", e)
+        raise ToolError(str(e)) from e
+
+@mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(BATCH_QUERIES["get_user_preferences_by_users"])
+def get_user_preferences_by_users(user_ids: list[str]) -> str:
+    """Get communication preferences and settings for many users in one call, grouped by user_id"""
+    try:
+        return run_batch("get_user_preferences_by_users", user_ids)
+    except Exception as e:
+        logger.error("[get_user_preferences_by_users] Database error: %s", e)
+        raise ToolError(str(e)) from e
+
+# Composite tools
+# Sections of the user 360 profile and the tool query behind each one
+USER_360_SECTIONS = {
+    "profile": "get_user_by_id",
+    "policies": "get_policies_by_user",
+    "claims": "get_claims_by_user_id",
+    "coverage_limits": "get_user_coverage_limits",
+    "pre_authorizations": "get_pre_authorizations",
+    "preferences": "get_user_preferences",
+}
+
+
+def run_section(tool: str, user_id: str, max_rows: int) -> str:
+    query = backend.queries[tool]
+    params = {"user_id": user_id}
+    if "{seek}" in query:
+        query = page_query(tool, query, seek=False)
+        params["page_limit"] = max_rows + 1
+    return run_query(query, params, limit=max_rows)
+
+
+@mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached("\n".join(QUERIES[tool] for tool in USER_360_SECTIONS.values()))
+def get_user_360(user_id: str, max_rows_per_section: int = 20) -> str:
+    """Full profile of a user in one call: details, active policies, recent claims,
+    coverage limits, pre-authorizations and preferences.
+    Each section holds at most max_rows_per_section rows."""
+    max_rows = max(1, min(max_rows_per_section, 200))
+    try:
+        # Sections are independent, so each runs on its own pooled connection and
+        # counts its SQL time and rows separately; the counts are added up after the join
+        futures = {
+            section: section_executor.submit(contextvars.copy_context().run, counted,
+                                             run_section, tool, user_id, max_rows)
+            for section, tool in USER_360_SECTIONS.items()
+        }
+        results = {section: future.result() for section, future in futures.items()}
+        for _, counters in results.values():
+            add_counts(counters)
+        body = ",".join(json.dumps(section) + ":" + result for section, (result, _) in results.items())
+        return '{"user_id":' + json.dumps(user_id) + ',"sections":{' + body + "}}"
+    except Exception as e:
+        logger.error("[get_user_360] Database error: %s", e)
+        raise ToolError(str(e)) from e
+
+# Analytics tools: read the materialized summaries kept fresh by summaries.py
+@mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["get_provider_claim_totals"])
+def get_provider_claim_totals(month_from: str = "0000-01", month_to: str = "9999-12",
+                              claim_type: str | None = None) -> str:
+    """Claim counts and total claimed / approved amounts per insurance provider,
+    highest approved total first. Months are YYYY-MM service months (inclusive);
+    claim_type optionally narrows to drug, dental, vision or hospital."""
+    query = backend.queries["get_provider_claim_totals"]
+    try:
+        return run_query(query, parameters={"month_from": month_from, "month_to": month_to,
+                                            "claim_type": claim_type}, stream=True)
+    except Exception as e:
+        logger.error("[get_provider_claim_totals] Database error: %s", e)
+        raise ToolError(str(e)) from e
+
+@mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["get_provider_monthly_claims"])
+def get_provider_monthly_claims(provider_id: str, month_from: str = "0000-01", month_to: str = "9999-12") -> str:
+    """Per-month, per-claim_type claim counts by status and claimed / approved
+    totals for one provider. Months are YYYY-MM service months (inclusive)."""
+    query = backend.queries["get_provider_monthly_claims"]
+    try:
+        return run_query(query, parameters={"provider_id": provider_id, "month_from": month_from,
+                                            "month_to": month_to}, stream=True)
+    except Exception as e:
+        logger.error("[get_provider_monthly_claims] Database error: %s", e)
+        raise ToolError(str(e)) from e
+
+@mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["get_claims_missing_documents"])
+def get_claims_missing_documents(pending_preauths_only: bool = False, page_size: int = DEFAULT_PAGE_SIZE,
+                                 cursor: str | None = None) -> str:
+    """List claims with no supporting documents, with how many pending
+    pre-authorizations the claimant has. Set pending_preauths_only to keep only
+    claimants with at least one pending pre-authorization.
+    Pass the returned next_cursor as cursor to fetch the next page."""
+    try:
+        return run_page("get_claims_missing_documents", {"pending_preauths_only": int(pending_preauths_only)},
+                        page_size, cursor)
+    except Exception as e:
+        logger.error("[get_claims_missing_documents] Database error: %s", e)
+        raise ToolError(str(e)) from e
+
+# Streaming tools: the whole result goes out as progress notifications, one
+# chunk of rows each, and the result itself is a summary (streaming.py)
+@mcp.tool()
+@instrumented
+async def stream_active_policies(ctx: Context, max_rows: int = MAX_STREAM_ROWS, chunk_rows: int = CHUNK_ROWS,
+                                 cursor: str | None = None) -> str:
+    """Stream every active insurance policy in chunks of chunk_rows rows, each sent
+    as a progress notification; the result gives the total row count. A stream cut
+    at max_rows returns a next_cursor that resumes it (or get_active_policies)."""
+    try:
+        return await stream_page(ctx, "get_active_policies", {}, cursor, max_rows, chunk_rows)
+    except Exception as e:
+        logger.error("[stream_active_policies] Database error: %s", e)
+        raise ToolError(str(e)) from e
+
+@mcp.tool()
+@instrumented
+async def stream_users_by_provider(ctx: Context, provider_id: str, max_rows: int = MAX_STREAM_ROWS,
+                                   chunk_rows: int = CHUNK_ROWS, cursor: str | None = None) -> str:
+    """Stream all users of an insurance provider in chunks of chunk_rows rows, each
+    sent as a progress notification; the result gives the total row count."""
+    try:
+        return await stream_page(ctx, "get_users_by_provider", {"provider_id": provider_id}, cursor,
+                                 max_rows, chunk_rows)
+    except Exception as e:
+        logger.error("[stream_users_by_provider] Database error: %s", e)
+        raise ToolError(str(e)) from e
+
+@mcp.tool()
+@instrumented
+async def stream_claims_missing_documents(ctx: Context, pending_preauths_only: bool = False,
+                                          max_rows: int = MAX_STREAM_ROWS, chunk_rows: int = CHUNK_ROWS,
+                                          cursor: str | None = None) -> str:
+    """Stream every claim with no supporting documents in chunks of chunk_rows rows,
+    each sent as a progress notification; the result gives the total row count."""
+    try:
+        return await stream_page(ctx, "get_claims_missing_documents",
+                                 {"pending_preauths_only": int(pending_preauths_only)}, cursor, max_rows, chunk_rows)
+    except Exception as e:
+        logger.error("[stream_claims_missing_documents] Database error: %s", e)
+        raise ToolError(str(e)) from e
+
+# Full-text search tools: BM25-ranked probes of the FTS5 indexes in fulltext.py
+@mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["search_claims"])
+def search_claims(query: str, user_id: str | None = None, match_any: bool = False,
+                  max_results: int = DEFAULT_SEARCH_RESULTS) -> str:
+    """Full-text search over claim descriptions, best BM25 match first, e.g. "root canal".
+    Each hit carries a snippet with the matched words in [brackets].
+    Words must all match unless match_any is set; "quoted phrases" and
+    prefix* terms are supported. Pass user_id to search one user's records."""
+    try:
+        return run_search("search_claims", query, user_id, match_any, max_results)
+    except Exception as e:
+        logger.error("[search_claims] Database error: %s", e)
+        raise ToolError(str(e)) from e
+
+@mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["search_claim_audit_notes"])
+def search_claim_audit_notes(query: str, user_id: str | None = None, match_any: bool = False,
+                             max_results: int = DEFAULT_SEARCH_RESULTS) -> str:
+    """Full-text search over claim audit log notes, best BM25 match first.
+    Each hit carries the claim's user_id and a snippet with the matched words in [brackets].
+    Words must all match unless match_any is set; "quoted phrases" and
+    prefix* terms are supported. Pass user_id to search one user's records."""
+    try:
+        return run_search("search_claim_audit_notes", query, user_id, match_any, max_results)
+    except Exception as e:
+        logger.error("[search_claim_audit_notes] Database error: %s", e)
+        raise ToolError(str(e)) from e
+
+@mcp.tool()
+@instrumented
+@executor.offload
+@cache.cached(QUERIES["search_communications"])
+def search_communications(query: str, user_id: str | None = None, match_any: bool = False,
+                          max_results: int = DEFAULT_SEARCH_RESULTS) -> str:
+    """Full-text search over communication subjects and contents, best BM25
+    match first (subject matches weigh double), e.g. "denied reimbursement".
+    Words must all match unless match_any is set; "quoted phrases" and
+    prefix* terms are supported. Pass user_id to search one user's records."""
+    try:
+        return run_search("search_communications", query, user_id, match_any, max_results)
+    except Exception as e:
+        logger.error("[search_communications] Database error: %s", e)
+        raise ToolError(str(e)) from e
+
+@mcp.tool()
+@instrumented
+@executor.offload
+def summary_status() -> dict:
+    """When each analytics summary was last refreshed, its age in seconds and
+    how many changed buckets are still waiting for the next refresh"""
+    try:
+        if backend.dialect != "sqlite":
+            return {"summaries": {}, "note": f"analytics tools aggregate the base tables live on {backend.dialect}"}
+        with sql_timer(), backend.connection() as conn:
+            return {"summaries": summaries.status(conn)}
+    except Exception as e:
+        logger.error("[summary_status] Database error: %s", e)
+        raise ToolError(str(e)) from e
+
+@mcp.tool()
+@instrumented
 def ping() -> str:
     """Health check tool"""
     return "pong"
 
+@mcp.tool()
+@instrumented
+def server_stats() -> dict:
+    """Per-tool latency, SQL time, row count and payload size histograms,
+    plus connection pool, result cache, streaming and process memory statistics"""
+    return {"tools": snapshot(), "pool": backend.stats(), "cache": cache.stats(), "streams": streamer.stats(),
+            "process": process_memory()}
+
+@mcp.tool()
+@instrumented
+def pool_stats() -> dict:
+    """Connection pool checkout/return metrics"""
+    return backend.stats()
+
+@mcp.tool()
+@instrumented
+def cache_stats() -> dict:
+    """Result cache hit/miss statistics, overall and per tool"""
+    return cache.stats()
+
 tools = [
     get_user_by_id,
     get_users_by_provider,
@@ -398,14 +727,41 @@ tools = [
     get_claim_audit_logs,
     get_user_claim_documents,
     get_user_preferences,
-    get_user_communications
+    get_user_communications,
+    get_users_by_ids,
+    get_policies_by_users,
+    get_claims_by_user_ids,
+    get_coverage_limits_by_users,
+    get_pre_authorizations_by_users,
+    get_dental_details_by_users,
+    get_drug_details_by_users,
+    get_hospital_visits_by_users,
+    get_vision_claims_by_users,
+    get_user_preferences_by_users,
+    get_user_360,
+    get_provider_claim_totals,
+    get_provider_monthly_claims,
+    get_claims_missing_documents,
+    stream_active_policies,
+    stream_users_by_provider,
+    stream_claims_missing_documents,
+    search_claims,
+    search_claim_audit_notes,
+    search_communications,
+    summary_status
 ]
 
 
 
 if __name__ == "__main__":
-    logger = logging.getLogger(__name__)
+    # stdout carries the stdio protocol, so all logging goes to stderr
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO)
     logger.info("Starting MCP server...")
+    if os.environ.get("CLAIMS_STATS_INTERVAL"):
+        start_periodic_log(float(os.environ["CLAIMS_STATS_INTERVAL"]))
+    if os.environ.get("CLAIMS_TRACE_FILE"):
+        # Records every tool call for bench.py replay
+        start_trace(os.environ["CLAIMS_TRACE_FILE"])
     #import sqlite3
     #print("[DEBUG] Manual test of get_user_by_id:")
     #mcp = FastMCP("Claims")
@@ -0,0 +1,184 @@
+"""Concurrent execution of planner-decomposed questions.
+
+A compound question ("claims with missing documents and pending
+pre-authorizations") is answered by a plan of independent steps, each an
+SQL sub-query or a tool call. The steps run concurrently, SQL ones on the
+connection pool's worker threads and tool calls on the event loop, so the
+whole plan takes as long as its slowest step rather than the sum of all of
+them. The step results are then hash-joined in memory on a shared key
+(claim_id or user_id).
+
+    plan = [SubQuery("missing_docs", sql_a), SubQuery("pending_preauths", sql_b, how="inner")]
+    merged = asyncio.run(MultiQueryExecutor(GUARD).run(plan))
+    merged.rows, merged.truncated  # truncated: steps whose rows were cut by the cost guard
+
+A step cut short by the cost guard's row budget or injected LIMIT can drop
+join matches, so the merged rows are then incomplete and say so.
+"""
+import asyncio
+import functools
+import inspect
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple
+
+# Join keys tried in order when a step does not name one
+JOIN_KEYS = ("claim_id", "user_id", "policy_id", "provider_id")
+# How long a step waits on a query the cost guard sent to its background queue
+QUEUE_WAIT = 30.0
+
+# Marker the SQL generator puts before each part of a decomposed question
+_STEP = re.compile(r"^\s*--\s*step:\s*(\w+)\s*(?:\((\w+)\))?\s*$", re.MULTILINE | re.IGNORECASE)
+
+
+class SubQuery(NamedTuple):
+    name: str
+    sql: str | None = None
+    params: dict | None = None
+    call: Callable | None = None  # tool step: sync or async callable returning a list of dicts
+    kwargs: dict | None = None
+    on: str | None = None         # join key with the steps before it; None picks from JOIN_KEYS
+    how: str = "inner"            # "inner" or "left"
+
+
+class StepResult(NamedTuple):
+    name: str
+    rows: list[dict]
+    elapsed_ms: float
+    truncated: bool = False
+
+
+class Merged(NamedTuple):
+    rows: list[dict]
+    truncated: list[str]  # names of the steps whose results were cut short
+
+
+def parse_plan(text: str) -> list[SubQuery] | None:
+    """Split generated SQL on ``-- step: <name> [(left)]`` markers.
+
+    Returns None for a single query without markers.
+    """
+    markers = list(_STEP.finditer(text))
+    if not markers:
+        return None
+    plan = []
+    for marker, following in zip(markers, markers[1:] + [None]):
+        sql = text[marker.end():following.start() if following else len(text)].strip().rstrip(";").strip()
+        if sql:
+            plan.append(SubQuery(marker.group(1), sql, how=(marker.group(2) or "inner").lower()))
+    return plan or None
+
+
+def hash_join(left: list[dict], right: list[dict], key: str, how: str = "inner") -> list[dict]:
+    """Join two lists of row dicts on ``key``.
+
+    The hash table is built on the smaller side for an inner join and on the
+    right side for a left join. Right-hand columns that clash with left-hand
+    ones keep the left value.
+    """
+    if how not in ("inner", "left"):
+        raise ValueError(f"unsupported join type: {how}")
+    build_right = how == "left" or len(right) <= len(left)
+    build, probe = (right, left) if build_right else (left, right)
+    table = {}
+    for row in build:
+        value = row.get(key)
+        if value is not None:
+            table.setdefault(value, []).append(row)
+
+    joined = []
+    for row in probe:
+        matches = table.get(row.get(key), ())
+        for match in matches:
+            left_row, right_row = (row, match) if build_right else (match, row)
+            joined.append({**right_row, **left_row})
+        if not matches and how == "left":
+            joined.append(dict(row))
+    return joined
+
+
+def join_key(left: list[dict], right: list[dict], on: str | None = None) -> str:
+    if on is not None:
+        return on
+    left_columns = set(left[0]) if left else set()
+    right_columns = set(right[0]) if right else set()
+    for key in JOIN_KEYS:
+        if key in left_columns and key in right_columns:
+            return key
+    raise ValueError(f"no shared join key among {', '.join(JOIN_KEYS)}")
+
+
+def merge(plan: list[SubQuery], results: dict[str, StepResult]) -> Merged:
+    """Fold the step results together in plan order.
+
+    ``truncated`` lists the steps that hit a row limit: the joined rows may
+    then be missing matches that lay past the cut.
+    """
+    truncated = [step.name for step in plan if results[step.name].truncated]
+    merged = results[plan[0].name].rows
+    for step in plan[1:]:
+        rows = results[step.name].rows
+        if not merged and step.how == "inner":
+            return Merged([], truncated)
+        if not rows and step.how == "left":
+            continue
+        merged = hash_join(merged, rows, join_key(merged, rows, step.on), step.how)
+    return Merged(merged, truncated)
+
+
+class MultiQueryExecutor:
+    """Runs a plan's steps concurrently through a CostGuard.
+
+    Concurrency is capped at the connection pool size, so a wide plan waits
+    for connections here instead of timing out in the pool.
+    """
+
+    def __init__(self, guard, max_concurrency: int | None = None):
+        self.guard = guard
+        self.max_concurrency = max_concurrency or guard.registry.pool.size
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="subquery")
+
+    def _run_sql(self, step: SubQuery) -> tuple[list[dict], bool]:
+        outcome = self.guard.run(step.sql, step.params)
+        if outcome["status"] == "queued":
+            outcome = self.guard.job(outcome["job_id"], timeout=QUEUE_WAIT)
+        if outcome["status"] == "failed":
+            raise RuntimeError(f"{step.name}: {outcome['error']}")
+        if outcome["status"] != "done":
+            raise TimeoutError(f"{step.name}: still running as background job {outcome['job_id']}")
+        columns = outcome["columns"]
+        return [dict(zip(columns, row)) for row in outcome["rows"]], outcome["truncated"]
+
+    async def _run_step(self, step: SubQuery, semaphore: asyncio.Semaphore) -> StepResult:
+        async with semaphore:
+            start = time.perf_counter()
+            truncated = False
+            if step.call is not None:
+                if inspect.iscoroutinefunction(step.call):
+                    rows = await step.call(**(step.kwargs or {}))
+                else:
+                    loop = asyncio.get_running_loop()
+                    rows = await loop.run_in_executor(self._executor, functools.partial(step.call, **(step.kwargs or {})))
+            else:
+                loop = asyncio.get_running_loop()
+                rows, truncated = await loop.run_in_executor(self._executor, self._run_sql, step)
+            return StepResult(step.name, list(rows), (time.perf_counter() - start) * 1000, truncated)
+
+    async def run_steps(self, plan: list[SubQuery]) -> dict[str, StepResult]:
+        """Every step's rows, by step name"""
+        names = [step.name for step in plan]
+        if len(set(names)) != len(names):
+            raise ValueError("plan step names must be unique")
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        results = await asyncio.gather(*(self._run_step(step, semaphore) for step in plan))
+        return {result.name: result for result in results}
+
+    async def run(self, plan: list[SubQuery]) -> Merged:
+        """Run the plan and join its steps' results"""
+        if not plan:
+            return Merged([], [])
+        return merge(plan, await self.run_steps(plan))
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,103 @@
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Keyset (seek) pagination for the list tools: sort direction plus the
+# ORDER BY keys as (sql expression, result column). The last key is always
+# unique (and NOT NULL) so pages never skip or repeat rows that share a sort
+# value. The other keys may be NULL: NULL sorts lowest, so the queries order
+# ASC NULLS FIRST / DESC NULLS LAST (SQLite's default, explicit for Postgres).
+KEYSETS = {
+    "get_users_by_provider": ("ASC", (("user_id", "user_id"),)),
+    "get_active_policies": ("ASC", (("p.policy_id", "policy_id"),)),
+    "get_claims_by_user_id": ("DESC", (("c.service_date", "service_date"), ("c.claim_id", "claim_id"))),
+    "get_payments_by_policy": ("DESC", (("due_date", "due_date"), ("payment_id", "payment_id"))),
+    "get_claim_audit_logs": ("DESC", (("a.event_time", "event_time"), ("a.audit_id", "audit_id"))),
+    "get_user_communications": ("DESC", (("sent_at", "sent_at"), ("log_id", "log_id"))),
+    "get_claims_missing_documents": ("ASC", (("claim_id", "claim_id"),)),
+}
+
+
+class InvalidCursor(ValueError):
+    """Raised when a continuation token is malformed or belongs to another tool"""
+
+
+def encode_cursor(tool: str, values: list) -> str:
+    raw = json.dumps([tool, values], separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(tool: str, token: str) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        owner, values = json.loads(raw)
+        valid = owner == tool and isinstance(values, list) and len(values) == len(KEYSETS[tool][1])
+    except (ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor(f"malformed cursor: {e}") from None
+    if not valid or values[-1] is None:
+        raise InvalidCursor(f"cursor was not issued by {tool}")
+    return values
+
+
+def _after(keys: list[str], values: list | None, op: str, i: int = 0) -> str:
+    """Rows past the cursor in keys[i:], with NULL sorting lowest"""
+    expr, param = keys[i], f":seek_{i}"
+    if values is not None and values[i] is None:
+        # The cursor is inside this key's NULL group: finish the group, then (ASC) the non-NULL rows
+        group = f"{expr} IS NULL AND {_after(keys, values, op, i + 1)}"
+        return f"({expr} IS NOT NULL OR {group})" if op == ">" else group
+    if values is None or None not in values[i + 1:]:
+        columns = ", ".join(keys[i:])
+        params = ", ".join(f":seek_{j}" for j in range(i, len(keys)))
+        compare = f"({columns}) {op} ({params})"
+        if op == ">":
+            return compare
+        # DESC: the NULL groups of the non-unique keys come after every non-NULL value
+        nulls, equal = [], []
+        for j in range(i, len(keys) - 1):
+            nulls.append(" AND ".join(equal + [f"{keys[j]} IS NULL"]))
+            equal.append(f"{keys[j]} = :seek_{j}")
+        return f"({' OR '.join([compare] + nulls)})" if nulls else compare
+    same = f"{expr} = {param}"
+    return f"({expr} {op} {param}{f' OR {expr} IS NULL' if op == '<' else ''} OR {same} AND {_after(keys, values, op, i + 1)})"
+
+
+def seek_predicate(tool: str, values: list | None = None) -> str:
+    """Comparison that starts the page right after the previous one.
+
+    ``values`` is the decoded cursor; without it the predicate assumes no
+    cursor value is NULL (the shape the index checks plan). A non-NULL
+    cursor uses a row-value comparison SQLite can seek on; a DESC keyset
+    adds the NULL groups sorted after it, which the index can only filter.
+    """
+    direction, keys = KEYSETS[tool]
+    op = "<" if direction == "DESC" else ">"
+    return f"AND {_after([expr for expr, _ in keys], values, op)}"
+
+
+def page_query(tool: str, query: str, seek: bool, values: list | None = None) -> str:
+    """Render a ``{seek}`` query template for the first page or a follow-up page"""
+    return query.format(seek=seek_predicate(tool, values) if seek else "")
+
+
+def paginate(tool: str, query: str, parameters: dict, page_size: int | None, cursor: str | None):
+    """Return (sql, parameters, page_size) for one page of a list tool.
+
+    One extra row is fetched so the encoder can tell whether another page exists.
+    """
+    page_size = max(1, min(page_size or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+    params = dict(parameters, page_limit=page_size + 1)
+    values = decode_cursor(tool, cursor) if cursor else None
+    for i, value in enumerate(values or ()):
+        if value is not None:
+            params[f"seek_{i}"] = value
+    return page_query(tool, query, seek=bool(cursor), values=values), params, page_size
+
+
+def next_cursor_fn(tool: str, description):
+    """Build the callback that turns the last row of a page into a continuation token"""
+    columns = [col[0] for col in description]
+    positions = [columns.index(name) for _, name in KEYSETS[tool][1]]
+    return lambda row: encode_cursor(tool, [row[i] for i in positions])
@@ -0,0 +1,136 @@
+"""Prepared-statement registry for LLM-generated SQL.
+
+Generated SQL embeds its literals ("... WHERE user_id = 'User1'"), so every
+variant is a new statement text that SQLite parses and plans from scratch.
+The registry parses the SQL once with sqlglot, lifts comparison, IN, BETWEEN
+and LIMIT literals into bound parameters (:v0, :v1, ...) and renders a
+canonical text. Every variant of a question shape then has the same text,
+so each pooled connection's statement cache (``cached_statements`` in
+db_pool.py) hands back the already prepared statement. Per-shape counters
+show which shapes are hot.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import sqlglot
+from sqlglot import exp
+
+# Literal positions that can be bound without changing meaning. Literals in
+# GROUP BY / ORDER BY (column positions) and function arguments stay inline.
+LIFTABLE_PARENTS = (exp.Binary, exp.In, exp.Between, exp.Limit, exp.Offset, exp.Neg, exp.Paren, exp.Tuple)
+# Raw SQL texts whose canonical form is remembered, so repeats skip sqlglot too
+MAX_TEXTS = 4096
+MAX_SHAPES = 1024
+
+
+class Shape:
+    __slots__ = ("sql", "calls", "total_ms", "max_ms", "rows", "last_used")
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.last_used = 0.0
+
+
+def canonicalize(sql: str, dialect: str = "sqlite") -> tuple[str, list]:
+    """(canonical SQL, lifted literal values in parameter order)"""
+    tree = sqlglot.parse_one(sql, read=dialect)
+    values = []
+    # walk() is deterministic, so one shape always numbers its parameters alike
+    for node in list(tree.walk()):
+        if not isinstance(node, exp.Literal) or not isinstance(node.parent, LIFTABLE_PARENTS):
+            continue
+        if isinstance(node.parent, (exp.Limit, exp.Offset)) or not node.is_string:
+            value = float(node.this) if any(c in node.this for c in ".eE") else int(node.this)
+        else:
+            value = node.this
+        node.replace(exp.Placeholder(this=f"v{len(values)}"))
+        values.append(value)
+    return tree.sql(dialect=dialect), values
+
+
+class StatementRegistry:
+    """Canonicalizes ad hoc SQL, runs it on a connection pool and tracks hot shapes"""
+
+    def __init__(self, pool, dialect: str = "sqlite"):
+        self.pool = pool
+        self.dialect = dialect
+        self._lock = threading.Lock()
+        self._texts = OrderedDict()   # raw SQL -> (canonical SQL, values)
+        self._shapes = OrderedDict()  # canonical SQL -> Shape
+        self._stats = {"calls": 0, "text_hits": 0, "parse_errors": 0}
+
+    def prepare(self, sql: str, params: dict | None = None) -> tuple[str, dict]:
+        """Canonical SQL plus the parameters to bind: lifted literals and ``params``"""
+        with self._lock:
+            self._stats["calls"] += 1
+            cached = self._texts.get(sql)
+            if cached is not None:
+                self._texts.move_to_end(sql)
+                self._stats["text_hits"] += 1
+        if cached is None:
+            try:
+                cached = canonicalize(sql, self.dialect)
+            except sqlglot.errors.ParseError:
+                # Leave SQL sqlglot can't parse to SQLite as-is
+                with self._lock:
+                    self._stats["parse_errors"] += 1
+                cached = (sql, [])
+            with self._lock:
+                self._texts[sql] = cached
+                if len(self._texts) > MAX_TEXTS:
+                    self._texts.popitem(last=False)
+        canonical, values = cached
+        bound = dict(params or {})
+        bound.update((f"v{i}", value) for i, value in enumerate(values))
+        return canonical, bound
+
+    def _record(self, canonical: str, elapsed_ms: float, rows: int) -> None:
+        with self._lock:
+            shape = self._shapes.get(canonical)
+            if shape is None:
+                shape = self._shapes[canonical] = Shape(canonical)
+                if len(self._shapes) > MAX_SHAPES:
+                    self._shapes.popitem(last=False)
+            else:
+                self._shapes.move_to_end(canonical)
+            shape.calls += 1
+            shape.total_ms += elapsed_ms
+            shape.max_ms = max(shape.max_ms, elapsed_ms)
+            shape.rows += rows
+            shape.last_used = time.time()
+
+    def run(self, sql: str, params: dict | None = None, max_rows: int | None = None) -> tuple[list, list]:
+        """Execute on a pooled connection; returns (column names, rows)"""
+        canonical, bound = self.prepare(sql, params)
+        start = time.perf_counter()
+        with self.pool.connection() as conn:
+            cursor = conn.execute(canonical, bound)
+            rows = cursor.fetchall() if max_rows is None else cursor.fetchmany(max_rows)
+            columns = [col[0] for col in cursor.description or ()]
+            cursor.close()
+        self._record(canonical, (time.perf_counter() - start) * 1000, len(rows))
+        return columns, rows
+
+    def hot_shapes(self, n: int = 10) -> list[dict]:
+        """Most-executed statement shapes, with their timings"""
+        with self._lock:
+            shapes = sorted(self._shapes.values(), key=lambda s: s.calls, reverse=True)[:n]
+            return [
+                {"sql": s.sql, "calls": s.calls, "avg_ms": s.total_ms / s.calls, "max_ms": s.max_ms,
+                 "rows": s.rows, "last_used": s.last_used}
+                for s in shapes
+            ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["texts"] = len(self._texts)
+            stats["shapes"] = len(self._shapes)
+        # Statements shared across shapes are what the connection caches can reuse
+        stats["statement_cache_size"] = self.pool.cached_statements
+        return stats
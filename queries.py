@@ -0,0 +1,316 @@
+# SQL behind each MCP tool in mcp_test_server.py, keyed by tool name.
+# Kept in one place so the schema setup can check every tool query plan
+# against the managed index set (see indexes.py). List tools carry a
+# ``{seek}`` placeholder that pagination.py fills in for follow-up pages.
+
+QUERIES = {
+    "get_user_by_id": """
+        SELECT user_id, name, dob, health_card, email, phone, provider_id
+        FROM users
+        WHERE user_id = :user_id
+    """,
+    "get_users_by_provider": """
+        SELECT user_id, name, email, phone
+        FROM users
+        WHERE provider_id = :provider_id {seek}
+        ORDER BY user_id
+        LIMIT :page_limit
+    """,
+    "get_policies_by_user": """
+        SELECT p.policy_id, p.policy_number, p.plan_type,
+               p.coverage_start, p.coverage_end, p.monthly_premium,
+               ip.name as provider_name
+        FROM policies p
+        JOIN insurance_providers ip ON p.provider_id = ip.provider_id
+        WHERE p.user_id = :user_id AND p.active = TRUE
+    """,
+    "get_active_policies": """
+        SELECT p.policy_id, u.name as user_name, ip.name as provider_name,
+               p.policy_number, p.coverage_end, p.monthly_premium
+        FROM policies p
+        JOIN users u ON p.user_id = u.user_id
+        JOIN insurance_providers ip ON p.provider_id = ip.provider_id
+        WHERE p.active = TRUE {seek}
+        ORDER BY p.policy_id
+        LIMIT :page_limit
+    """,
+    "get_claims_by_user_id": """
+        SELECT c.claim_id, c.service_date, c.claim_type,
+               c.amount_claimed, c.amount_approved, c.status,
+               p.policy_number
+        FROM claims c
+        JOIN policies p ON c.policy_id = p.policy_id
+        WHERE c.user_id = :user_id {seek}
+        ORDER BY c.service_date DESC NULLS LAST, c.claim_id DESC
+        LIMIT :page_limit
+    """,
+    "get_claim_details": """
+        SELECT c.claim_id,
+               c.user_id,
+               c.provider_id,
+               c.policy_id,
+               c.service_date,
+               c.claim_type,
+               c.service_code,
+               c.description,
+               c.amount_claimed,
+               c.amount_approved,
+               c.status,
+               c.submitted_at,
+               u.name as user_name,
+               p.policy_number,
+               ip.name as provider_name
+        FROM claims c
+        JOIN users u ON c.user_id = u.user_id
+        JOIN policies p ON c.policy_id = p.policy_id
+        JOIN insurance_providers ip ON c.provider_id = ip.provider_id
+        WHERE c.claim_id = :claim_id
+    """,
+    "get_provider_details": """
+        SELECT provider_id, name, description
+        FROM insurance_providers
+        WHERE provider_id = :provider_id
+    """,
+    "get_provider_plans": """
+        SELECT plan_id, name, description, base_premium,
+               drug_limit, dental_limit, vision_limit
+        FROM provider_plans
+        WHERE provider_id = :provider_id
+    """,
+    "get_payments_by_policy": """
+        SELECT payment_id, due_date, paid_date,
+               amount_due, amount_paid, payment_status
+        FROM premium_payments
+        WHERE policy_id = :policy_id {seek}
+        ORDER BY due_date DESC NULLS LAST, payment_id DESC
+        LIMIT :page_limit
+    """,
+    "get_coverage_limits": """
+        SELECT claim_type, year, max_coverage, used_coverage
+        FROM coverage_limits
+        WHERE user_id = :user_id
+        ORDER BY year DESC, claim_type
+    """,
+    "get_pre_authorizations": """
+        SELECT auth_id, service_requested, estimated_cost,
+               request_date, approved_date, status
+        FROM pre_authorizations
+        WHERE user_id = :user_id
+        ORDER BY request_date DESC
+    """,
+    "get_dental_details_by_user": """
+        SELECT c.claim_id, c.service_date, c.status,
+               d.category, d.tooth_code, d.procedure_code
+        FROM claims c
+        JOIN dental_details d ON c.claim_id = d.claim_id
+        WHERE c.user_id = :user_id
+        ORDER BY c.service_date DESC
+    """,
+    "get_drug_details_by_user": """
+        SELECT c.claim_id, c.service_date, c.status,
+               d.drug_name, d.DIN_code, d.quantity, d.dosage
+        FROM claims c
+        JOIN drug_details d ON c.claim_id = d.claim_id
+        WHERE c.user_id = :user_id
+        ORDER BY c.service_date DESC
+    """,
+    "get_hospital_visits_by_user": """
+        SELECT c.claim_id, c.service_date, c.status,
+               h.room_type, h.admission_date, h.discharge_date
+        FROM claims c
+        JOIN hospital_visits h ON c.claim_id = h.claim_id
+        WHERE c.user_id = :user_id
+        ORDER BY h.admission_date DESC
+    """,
+    "get_vision_claims_by_user": """
+        SELECT c.claim_id, c.service_date, c.status,
+               v.product_type, v.coverage_limit, v.eligibility_date
+        FROM claims c
+        JOIN vision_claims v ON c.claim_id = v.claim_id
+        WHERE c.user_id = :user_id
+        ORDER BY c.service_date DESC
+    """,
+    "get_user_coverage_limits": """
+        SELECT claim_type, year, max_coverage, used_coverage,
+               (max_coverage - used_coverage) as remaining_coverage
+        FROM coverage_limits
+        WHERE user_id = :user_id
+        ORDER BY year DESC, claim_type
+    """,
+    "get_claim_audit_logs": """
+        SELECT a.audit_id, a.event_time, a.event_type,
+               a.performed_by, c.claim_id, c.claim_type
+        FROM claim_audit_logs a
+        JOIN claims c ON a.claim_id = c.claim_id
+        WHERE c.user_id = :user_id {seek}
+        ORDER BY a.event_time DESC NULLS LAST, a.audit_id DESC
+        LIMIT :page_limit
+    """,
+    "get_user_claim_documents": """
+        SELECT d.document_id, d.file_name, d.uploaded_at,
+               d.document_type, c.claim_id, c.claim_type
+        FROM claim_documents d
+        JOIN claims c ON d.claim_id = c.claim_id
+        WHERE c.user_id = :user_id
+        ORDER BY d.uploaded_at DESC
+    """,
+    "get_user_preferences": """
+        SELECT communication_opt_in, consent_to_share_data,
+               language_preference, timezone
+        FROM user_preferences
+        WHERE user_id = :user_id
+    """,
+    "get_user_communications": """
+        SELECT log_id, type, subject, sent_at, status
+        FROM communications_log
+        WHERE user_id = :user_id {seek}
+        ORDER BY sent_at DESC NULLS LAST, log_id DESC
+        LIMIT :page_limit
+    """,
+    # Analytics tools read the materialized summaries (summaries.py)
+    "get_provider_claim_totals": """
+        SELECT s.provider_id, ip.name as provider_name,
+               sum(s.claim_count) as claim_count,
+               sum(s.approved_count) as approved_count,
+               round(sum(s.amount_claimed), 2) as amount_claimed,
+               round(sum(s.amount_approved), 2) as amount_approved
+        FROM summary_provider_month s
+        LEFT JOIN insurance_providers ip ON s.provider_id = ip.provider_id
+        WHERE s.month BETWEEN :month_from AND :month_to
+          AND (:claim_type IS NULL OR s.claim_type = :claim_type)
+        GROUP BY s.provider_id
+        ORDER BY amount_approved DESC
+    """,
+    "get_provider_monthly_claims": """
+        SELECT month, claim_type, claim_count, approved_count,
+               pending_count, rejected_count, amount_claimed, amount_approved
+        FROM summary_provider_month
+        WHERE provider_id = :provider_id
+          AND month BETWEEN :month_from AND :month_to
+        ORDER BY month, claim_type
+    """,
+    "get_claims_missing_documents": """
+        SELECT claim_id, user_id, provider_id, claim_type, service_date,
+               status, amount_claimed, pending_preauths
+        FROM summary_missing_documents
+        WHERE (:pending_preauths_only = 0 OR pending_preauths > 0) {seek}
+        ORDER BY claim_id
+        LIMIT :page_limit
+    """,
+    # Full-text search over the FTS5 indexes in fulltext.py; rank is BM25
+    "search_claims": """
+        SELECT c.claim_id, c.user_id, c.claim_type, c.service_date, c.status,
+               c.amount_claimed,
+               snippet(claims_fts, 0, '[', ']', '...', 12) as snippet,
+               round(claims_fts.rank, 4) as score
+        FROM claims_fts
+        JOIN claims c ON c.rowid = claims_fts.rowid
+        WHERE claims_fts MATCH :query
+          AND (:user_id IS NULL OR c.user_id = :user_id)
+        ORDER BY claims_fts.rank
+        LIMIT :max_results
+    """,
+    "search_claim_audit_notes": """
+        SELECT a.audit_id, a.claim_id, cl.user_id, a.event_time, a.event_type,
+               a.performed_by,
+               snippet(claim_audit_logs_fts, 0, '[', ']', '...', 12) as snippet,
+               round(claim_audit_logs_fts.rank, 4) as score
+        FROM claim_audit_logs_fts
+        JOIN claim_audit_logs a ON a.rowid = claim_audit_logs_fts.rowid
+        JOIN claims cl ON cl.claim_id = a.claim_id
+        WHERE claim_audit_logs_fts MATCH :query
+          AND (:user_id IS NULL OR cl.user_id = :user_id)
+        ORDER BY claim_audit_logs_fts.rank
+        LIMIT :max_results
+    """,
+    "search_communications": """
+        SELECT m.log_id, m.user_id, m.type, m.subject, m.sent_at, m.status,
+               snippet(communications_log_fts, -1, '[', ']', '...', 12) as snippet,
+               round(bm25(communications_log_fts, 2.0, 1.0), 4) as score
+        FROM communications_log_fts
+        JOIN communications_log m ON m.rowid = communications_log_fts.rowid
+        WHERE communications_log_fts MATCH :query
+          AND (:user_id IS NULL OR m.user_id = :user_id)
+        ORDER BY score
+        LIMIT :max_results
+    """,
+}
+
+# Batch forms of the per-user tools. The first column is the ID the rows are
+# grouped under; ``{ids}`` becomes an IN list or a json_each() probe (batch.py).
+BATCH_QUERIES = {
+    "get_users_by_ids": """
+        SELECT user_id, name, dob, health_card, email, phone, provider_id
+        FROM users
+        WHERE user_id IN ({ids})
+    """,
+    "get_policies_by_users": """
+        SELECT p.user_id, p.policy_id, p.policy_number, p.plan_type,
+               p.coverage_start, p.coverage_end, p.monthly_premium,
+               ip.name as provider_name
+        FROM policies p
+        JOIN insurance_providers ip ON p.provider_id = ip.provider_id
+        WHERE p.user_id IN ({ids}) AND p.active = TRUE
+    """,
+    "get_claims_by_user_ids": """
+        SELECT c.user_id, c.claim_id, c.service_date, c.claim_type,
+               c.amount_claimed, c.amount_approved, c.status,
+               p.policy_number
+        FROM claims c
+        JOIN policies p ON c.policy_id = p.policy_id
+        WHERE c.user_id IN ({ids})
+        ORDER BY c.service_date DESC NULLS LAST, c.claim_id DESC
+    """,
+    "get_coverage_limits_by_users": """
+        SELECT user_id, claim_type, year, max_coverage, used_coverage,
+               (max_coverage - used_coverage) as remaining_coverage
+        FROM coverage_limits
+        WHERE user_id IN ({ids})
+        ORDER BY year DESC, claim_type
+    """,
+    "get_pre_authorizations_by_users": """
+        SELECT user_id, auth_id, service_requested, estimated_cost,
+               request_date, approved_date, status
+        FROM pre_authorizations
+        WHERE user_id IN ({ids})
+        ORDER BY request_date DESC
+    """,
+    "get_dental_details_by_users": """
+        SELECT c.user_id, c.claim_id, c.service_date, c.status,
+               d.category, d.tooth_code, d.procedure_code
+        FROM claims c
+        JOIN dental_details d ON c.claim_id = d.claim_id
+        WHERE c.user_id IN ({ids})
+        ORDER BY c.service_date DESC
+    """,
+    "get_drug_details_by_users": """
+        SELECT c.user_id, c.claim_id, c.service_date, c.status,
+               d.drug_name, d.DIN_code, d.quantity, d.dosage
+        FROM claims c
+        JOIN drug_details d ON c.claim_id = d.claim_id
+        WHERE c.user_id IN ({ids})
+        ORDER BY c.service_date DESC
+    """,
+    "get_hospital_visits_by_users": """
+        SELECT c.user_id, c.claim_id, c.service_date, c.status,
+               h.room_type, h.admission_date, h.discharge_date
+        FROM claims c
+        JOIN hospital_visits h ON c.claim_id = h.claim_id
+        WHERE c.user_id IN ({ids})
+        ORDER BY h.admission_date DESC
+    """,
+    "get_vision_claims_by_users": """
+        SELECT c.user_id, c.claim_id, c.service_date, c.status,
+               v.product_type, v.coverage_limit, v.eligibility_date
+        FROM claims c
+        JOIN vision_claims v ON c.claim_id = v.claim_id
+        WHERE c.user_id IN ({ids})
+        ORDER BY c.service_date DESC
+    """,
+    "get_user_preferences_by_users": """
+        SELECT user_id, communication_opt_in, consent_to_share_data,
+               language_preference, timezone
+        FROM user_preferences
+        WHERE user_id IN ({ids})
+    """,
+}
@@ -0,0 +1,52 @@
+import asyncio
+import contextvars
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from db_pool import QUERY_DEADLINE
+
+DEFAULT_TIMEOUT = 10.0
+
+# Tools that can run long get fewer concurrent slots and a tighter budget,
+# so they cannot crowd out the cheap point lookups
+TOOL_CONCURRENCY = {
+    "get_active_policies": 2,
+    "get_user_360": 2,
+}
+TOOL_TIMEOUTS = {
+    "get_active_policies": 5.0,
+}
+
+
+class QueryExecutor:
+    """Runs blocking tool bodies on a bounded thread pool off the event loop.
+
+    Each tool gets its own semaphore, so one hot or slow tool can only take a
+    share of the workers. Each call also gets a deadline that the connection
+    pool enforces with a SQLite progress handler.
+    """
+
+    def __init__(self, max_workers: int = 8, default_concurrency: int | None = None):
+        self.max_workers = max_workers
+        self.default_concurrency = default_concurrency or max(1, max_workers // 2)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+
+    def offload(self, fn):
+        """Turn a synchronous tool function into an async handler"""
+        tool = fn.__name__
+        semaphore = asyncio.Semaphore(TOOL_CONCURRENCY.get(tool, self.default_concurrency))
+        timeout = TOOL_TIMEOUTS.get(tool, DEFAULT_TIMEOUT)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            async with semaphore:
+                ctx = contextvars.copy_context()
+                ctx.run(QUERY_DEADLINE.set, time.monotonic() + timeout)
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, functools.partial(ctx.run, fn, *args, **kwargs))
+
+        return wrapper
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
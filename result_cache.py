@@ -0,0 +1,184 @@
+import functools
+import inspect
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL = 60.0
+
+# Per-tool time-to-live in seconds; reference data changes rarely
+TOOL_TTLS = {
+    "get_provider_details": 600.0,
+    "get_provider_plans": 600.0,
+    "get_user_preferences": 300.0,
+    "get_active_policies": 30.0,
+}
+
+_TABLE_REF = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)", re.IGNORECASE)
+
+
+def tables_for(query: str) -> tuple[str, ...]:
+    """Tables a query reads from, used to decide which writes invalidate it"""
+    return tuple(sorted({name.lower() for name in _TABLE_REF.findall(query)}))
+
+
+def create_change_counters(conn: sqlite3.Connection, tables: list[str]) -> None:
+    """Keep a per-table write counter in table_versions, bumped by triggers"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS table_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    for table in tables:
+        conn.execute("INSERT OR IGNORE INTO table_versions (table_name, version) VALUES (?, 0)", (table,))
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_version
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE table_versions SET version = version + 1 WHERE table_name = '{table}';
+                END
+            """)
+
+
+class ResultCache:
+    """Process-wide LRU cache of tool results, bounded by entry count and bytes.
+
+    Entries are stamped with the change counters of the tables they read.
+    ``PRAGMA data_version`` on a dedicated connection tells us cheaply when
+    another connection committed; only then are the counters re-read, and
+    entries whose tables moved on are dropped at lookup time.
+    """
+
+    def __init__(self, path: str, max_entries: int = 2048, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._data_version = None
+        self._versions = {}
+        self._generation = 0
+        self._stats = {}
+
+    def _tool_stats(self, tool: str) -> dict:
+        return self._stats.setdefault(tool, {"hits": 0, "misses": 0, "expired": 0, "invalidated": 0})
+
+    def _refresh_versions(self) -> None:
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+        try:
+            self._versions = dict(self._conn.execute("SELECT table_name, version FROM table_versions"))
+        except sqlite3.OperationalError:
+            # No change counters in this database: any commit invalidates everything
+            self._generation += 1
+
+    def _stamp(self, tables: tuple) -> tuple:
+        return (self._generation,) + tuple(self._versions.get(t, 0) for t in tables)
+
+    def _evict(self) -> None:
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, _, _, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+
+    def get_or_load(self, tool: str, key: str, tables: tuple, ttl: float, loader):
+        with self._lock:
+            self._refresh_versions()
+            stamp = self._stamp(tables)
+            stats = self._tool_stats(tool)
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, entry_stamp, expires, size = entry
+                if entry_stamp != stamp:
+                    stats["invalidated"] += 1
+                elif expires < time.monotonic():
+                    stats["expired"] += 1
+                else:
+                    self._entries.move_to_end(key)
+                    stats["hits"] += 1
+                    return value
+                del self._entries[key]
+                self._bytes -= size
+            stats["misses"] += 1
+
+        # Load outside the lock; the stamp was taken first, so a write that
+        # lands during the load only makes this entry look older, never newer
+        value = loader()  # a failed load raises, so errors are never cached
+        size = len(value) if isinstance(value, str) else len(json.dumps(value, default=str))
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries[key][3]
+            self._entries[key] = (value, stamp, time.monotonic() + ttl, size)
+            self._bytes += size
+            self._evict()
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            tools = {tool: dict(s) for tool, s in self._stats.items()}
+            entries, size = len(self._entries), self._bytes
+        hits = sum(s["hits"] for s in tools.values())
+        lookups = hits + sum(s["misses"] for s in tools.values())
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "lookups": lookups,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "tools": tools,
+        }
+
+    def cached(self, query: str, ttl: float | None = None):
+        """Decorator caching a tool function by its name and bound arguments.
+
+        ``query`` is the SQL the tool runs; writes to any table it reads
+        invalidate the cached results.
+        """
+        tables = tables_for(query)
+
+        def decorator(fn):
+            tool = fn.__name__
+            tool_ttl = TOOL_TTLS.get(tool, DEFAULT_TTL) if ttl is None else ttl
+            signature = inspect.signature(fn)
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                key = tool + json.dumps(bound.arguments, sort_keys=True, default=str)
+                return self.get_or_load(tool, key, tables, tool_ttl, lambda: fn(*args, **kwargs))
+
+            return wrapper
+
+        return decorator
+
+
+class NoCache:
+    """Stand-in for ResultCache on backends without SQLite change counters.
+
+    Writes from other server processes sharing a Postgres database would go
+    unseen by a per-process cache, so tool results are not cached there.
+    """
+
+    def cached(self, query: str, ttl: float | None = None):
+        return lambda fn: fn
+
+    def clear(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"enabled": False, "entries": 0, "hits": 0, "lookups": 0, "hit_rate": 0.0, "tools": {}}
@@ -0,0 +1,104 @@
+import json
+import sqlite3
+from typing import Callable
+
+from instrumentation import record_rows
+
+# Default cap on the serialized size of a single tool result
+MAX_RESULT_BYTES = 64 * 1024
+# Batch tools answer for many IDs at once, so they get a larger budget
+BATCH_MAX_BYTES = 512 * 1024
+
+_dumps = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, default=str).encode
+
+
+def encode_rows(cursor: sqlite3.Cursor, limit: int | None = None, offset: int = 0,
+                max_bytes: int | None = MAX_RESULT_BYTES, batch_size: int = 512,
+                next_cursor: Callable[[tuple], str] | None = None) -> str:
+    """Stream rows from ``cursor`` into a compact columnar JSON document.
+
+    The payload lists the column names once, followed by one array per row:
+    ``{"columns": [...], "rows": [[...], ...], "row_count": n, "truncated": false}``.
+    Rows are encoded as they are fetched, so nothing beyond one batch is held
+    besides the output itself. ``truncated`` is set when ``limit`` or the byte
+    budget cut the result short; if ``next_cursor`` is given it is called with
+    the last row returned to produce a continuation token for the next page.
+    """
+    columns = [col[0] for col in cursor.description or ()]
+    head = '{"columns":' + _dumps(columns) + ',"rows":['
+    parts = []
+    size = len(head.encode()) + (200 if next_cursor else 40)  # room for the closing fields
+    row_count = 0
+    skipped = 0
+    truncated = False
+    last_row = None
+
+    while not truncated:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            break
+        for row in batch:
+            if skipped < offset:
+                skipped += 1
+                continue
+            if limit is not None and row_count >= limit:
+                truncated = True
+                break
+            encoded = _dumps(row)
+            row_bytes = len(encoded.encode()) + 1
+            if max_bytes is not None and row_count and size + row_bytes > max_bytes:
+                truncated = True
+                break
+            parts.append(encoded)
+            size += row_bytes
+            row_count += 1
+            last_row = row
+
+    cursor.close()
+    record_rows(row_count)
+    tail = '],"row_count":' + str(row_count) + ',"truncated":' + ("true" if truncated else "false")
+    if next_cursor is not None:
+        token = next_cursor(last_row) if truncated and last_row is not None else None
+        tail += ',"next_cursor":' + _dumps(token)
+    return head + ",".join(parts) + tail + "}"
+
+
+def encode_grouped(cursor: sqlite3.Cursor, ids: list[str], max_bytes: int | None = BATCH_MAX_BYTES,
+                   batch_size: int = 512) -> str:
+    """Encode rows keyed by their first column into per-ID groups.
+
+    ``{"columns": [...], "groups": {"id": [[...], ...]}, "row_count": n, "truncated": false}``.
+    The key column is dropped from each row, and every requested ID gets a
+    group, empty if nothing matched.
+    """
+    columns = [col[0] for col in cursor.description or ()][1:]
+    groups = {key: [] for key in ids}
+    size = len(_dumps(columns)) + sum(len(_dumps(key)) + 4 for key in ids) + 80
+    row_count = 0
+    truncated = False
+
+    while not truncated:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            break
+        for row in batch:
+            encoded = _dumps(row[1:])
+            row_bytes = len(encoded.encode()) + 1
+            if max_bytes is not None and row_count and size + row_bytes > max_bytes:
+                truncated = True
+                break
+            groups.setdefault(row[0], []).append(encoded)
+            size += row_bytes
+            row_count += 1
+
+    cursor.close()
+    record_rows(row_count)
+    body = ",".join(_dumps(key) + ":[" + ",".join(rows) + "]" for key, rows in groups.items())
+    return ('{"columns":' + _dumps(columns) + ',"groups":{' + body + "}"
+            + ',"row_count":' + str(row_count)
+            + ',"truncated":' + ("true" if truncated else "false") + "}")
+
+
+def encode_chunk(chunk: int, columns: list[str], rows: list) -> str:
+    """One chunk of a streamed result (streaming.py): ``{"chunk": i, "columns": [...], "rows": [[...], ...]}``"""
+    return '{"chunk":' + str(chunk) + ',"columns":' + _dumps(columns) + ',"rows":[' + ",".join(map(_dumps, rows)) + "]}"
@@ -0,0 +1,164 @@
+"""Persistent embedding index for schema retrieval.
+
+The SQL agent's retrieve_schema step used to embed every CREATE TABLE chunk
+and compare it to the question one pair at a time on each run. This builds
+the table embeddings once from tables.py, stores them as a normalized
+float32 matrix (.npy, memory-mapped on load) and keys the files by a hash
+of the model name and schema text. Until the schema changes, no chunk is
+ever re-embedded, and a lookup is one matrix-vector product plus an
+argpartition for the top k.
+
+    index = SchemaIndex.load_or_build(encode=model.encode)
+    index.search("total approved amount per provider", k=5)
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from tables import schema_sql
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+INDEX_DIR = ".schema_index"
+# Query embeddings kept so repeated questions skip the encoder entirely
+QUERY_CACHE_SIZE = 1024
+
+_CREATE_TABLE = re.compile(r"CREATE TABLE IF NOT EXISTS (\w+) \((.*?)\n\);", re.DOTALL)
+
+
+def schema_chunks(sql: str = schema_sql) -> list[dict]:
+    """One chunk per table: its CREATE TABLE statement, like load_schema_chunks in the notebook"""
+    return [
+        {"text": match.group(0).strip(), "metadata": {"table": match.group(1)}}
+        for match in _CREATE_TABLE.finditer(sql)
+    ]
+
+
+def schema_hash(chunks: list[dict], model_name: str = MODEL_NAME) -> str:
+    digest = hashlib.sha256(model_name.encode())
+    for chunk in chunks:
+        digest.update(b"\0" + chunk["text"].encode())
+    return digest.hexdigest()
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def _default_encoder(model_name: str):
+    # Imported lazily: loading the model is the slow part we are avoiding
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name).encode
+
+
+class SchemaIndex:
+    """Row-normalized chunk embeddings with their chunk texts and metadata.
+
+    ``encode`` maps a string or list of strings to embeddings; when omitted the
+    SentenceTransformer model is loaded on the first question that is not in
+    the query cache.
+    """
+
+    def __init__(self, embeddings: np.ndarray, chunks: list[dict], digest: str,
+                 encode=None, model_name: str = MODEL_NAME):
+        self.embeddings = embeddings
+        self.chunks = chunks
+        self.digest = digest
+        self.model_name = model_name
+        self._encode = encode
+        self._queries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, chunks: list[dict], encode=None, model_name: str = MODEL_NAME) -> "SchemaIndex":
+        encode = encode or _default_encoder(model_name)
+        embeddings = _normalize(encode([chunk["text"] for chunk in chunks]))
+        return cls(embeddings, chunks, schema_hash(chunks, model_name), encode, model_name)
+
+    def save(self, directory: str = INDEX_DIR) -> None:
+        os.makedirs(directory, exist_ok=True)
+        # Write both files under temporary names first; the metadata, which
+        # carries the hash, is swapped in last so a half-written index is never valid
+        matrix_tmp = os.path.join(directory, "embeddings.tmp.npy")
+        np.save(matrix_tmp, np.ascontiguousarray(self.embeddings, dtype=np.float32))
+        os.replace(matrix_tmp, os.path.join(directory, "embeddings.npy"))
+        meta_tmp = os.path.join(directory, "chunks.json.tmp")
+        with open(meta_tmp, "w", encoding="utf-8") as f:
+            json.dump({"hash": self.digest, "model": self.model_name, "chunks": self.chunks}, f)
+        os.replace(meta_tmp, os.path.join(directory, "chunks.json"))
+
+    @classmethod
+    def load(cls, directory: str = INDEX_DIR, encode=None) -> "SchemaIndex | None":
+        try:
+            with open(os.path.join(directory, "chunks.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            embeddings = np.load(os.path.join(directory, "embeddings.npy"), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if embeddings.shape[0] != len(meta["chunks"]):
+            return None
+        return cls(embeddings, meta["chunks"], meta["hash"], encode, meta["model"])
+
+    @classmethod
+    def load_or_build(cls, directory: str = INDEX_DIR, encode=None, model_name: str = MODEL_NAME,
+                      sql: str = schema_sql) -> "SchemaIndex":
+        """Reuse the saved index while the schema hash matches; otherwise rebuild and save it"""
+        chunks = schema_chunks(sql)
+        index = cls.load(directory, encode)
+        if index is not None and index.digest == schema_hash(chunks, model_name):
+            return index
+        index = cls.build(chunks, encode, model_name)
+        index.save(directory)
+        return index
+
+    def embed_query(self, question: str) -> np.ndarray:
+        with self._lock:
+            vector = self._queries.get(question)
+            if vector is not None:
+                self._queries.move_to_end(question)
+                return vector
+            if self._encode is None:
+                self._encode = _default_encoder(self.model_name)
+        vector = _normalize(np.squeeze(self._encode(question)))
+        with self._lock:
+            self._queries[question] = vector
+            if len(self._queries) > QUERY_CACHE_SIZE:
+                self._queries.popitem(last=False)
+        return vector
+
+    def search(self, question: str | None = None, k: int = 5, threshold: float = 0.4,
+               query_embedding: np.ndarray | None = None) -> list[dict]:
+        """Top ``k`` chunks by cosine similarity above ``threshold``, best first.
+
+        Pass ``query_embedding`` when the caller already has one.
+        """
+        vector = self.embed_query(question) if query_embedding is None else _normalize(query_embedding)
+        scores = self.embeddings @ vector
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            {"text": self.chunks[i]["text"], "similarity": float(scores[i]), "metadata": self.chunks[i]["metadata"]}
+            for i in top if scores[i] > threshold
+        ]
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    start = time.perf_counter()
+    index = SchemaIndex.load_or_build()
+    print(f"{len(index.chunks)} chunks, hash {index.digest[:12]}, ready in {time.perf_counter() - start:.2f}s")
+    for question in sys.argv[1:]:
+        for match in index.search(question):
+            print(f"  {match['similarity']:.3f} {match['metadata']['table']}")
@@ -0,0 +1,355 @@
+"""Columnar snapshots of the claims database for analytical queries.
+
+``export`` copies every table in tables.py to Parquet (or Arrow IPC) files
+under one directory. All tables are read inside a single SQLite read
+transaction, so every snapshot is consistent. ``claims`` is partitioned
+Hive-style by claim type and service month:
+
+    snapshots/claims/claim_type=dental/service_month=2024-03/part-<run>-0.parquet
+
+Claims and their per-type detail rows are exported incrementally. Each run
+appends, as new part files, only the rows loaded since the previous run:
+those past each table's rowid watermark, whatever their submitted_at (a
+feed loaded late by import_data.py carries old dates). The other tables
+are small or change in place, so each run rewrites them. ``_manifest.json``
+lists the files and row counts that make up the current snapshot and is
+replaced atomically as the last step of a run, so readers never see a
+half-written export. Later changes to already exported claims (e.g. a
+status update) and deletions appear only after an ``export --full``; a run
+that finds a watermark row gone or renumbered (VACUUM may renumber rowids)
+rebuilds in full by itself. ``status`` compares the snapshot's row counts
+with claims.db.
+
+``query`` runs SQLite-dialect SQL on the snapshot with DuckDB. DuckDB scans
+the columnar files vectorized, prunes claims partitions on claim_type /
+service_month filters and memory-maps Arrow IPC files. Aggregate questions
+are answered this way without touching claims.db:
+
+    python snapshots.py --db claims.db --dir snapshots export
+    python snapshots.py --dir snapshots query "SELECT claim_type, sum(amount_claimed) FROM claims GROUP BY 1"
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+
+import sqlglot
+from sqlglot import exp
+
+from db_pool import DB_PATH
+from sql_validator import default_catalog
+from tables import TABLES
+
+SNAPSHOT_DIR = "snapshots"
+MANIFEST = "_manifest.json"
+BATCH_ROWS = 50_000
+FORMATS = {"parquet": "parquet", "arrow": "arrow"}  # format -> file extension
+
+# Partition columns of each partitioned table
+PARTITIONS = {"claims": ("claim_type", "service_month")}
+# Exported columns that are not in the table, and the SQL that derives them
+DERIVED = {"claims": {"service_month": "substr(t.service_date, 1, 7)"}}
+# Tables exported incrementally, each by its own rowid (load order) watermark
+CLAIM_TABLES = ("claims", "dental_details", "drug_details", "hospital_visits", "vision_claims")
+
+
+def arrow_type(decl: str):
+    import pyarrow as pa
+
+    return {
+        "INTEGER": pa.int64(),
+        "REAL": pa.float64(),
+        "DATE": pa.date32(),
+        "TIMESTAMP": pa.timestamp("s"),
+        "BOOLEAN": pa.bool_(),
+    }.get(decl, pa.string())
+
+
+def arrow_schema(table: str):
+    """Arrow schema of a table from its declared column types, plus its derived columns"""
+    import pyarrow as pa
+
+    fields = [pa.field(column, arrow_type(decl)) for column, decl in default_catalog().columns[table].items()]
+    fields += [pa.field(name, pa.string()) for name in DERIVED.get(table, {})]
+    return pa.schema(fields)
+
+
+def _batches(cursor: sqlite3.Cursor, schema, counts: dict, table: str):
+    """Record batches from a cursor; SQLite's text dates and 0/1 booleans are cast to the schema types"""
+    import pyarrow as pa
+
+    while rows := cursor.fetchmany(BATCH_ROWS):
+        columns = []
+        for i, field in enumerate(schema):
+            values = [row[i] for row in rows]
+            if pa.types.is_string(field.type):
+                columns.append(pa.array([None if v is None else str(v) for v in values], pa.string()))
+            elif pa.types.is_floating(field.type):
+                columns.append(pa.array([None if v is None else float(v) for v in values], pa.float64()))
+            else:
+                columns.append(pa.array(values).cast(field.type))
+        counts[table] += len(rows)
+        yield pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def _select(table: str, since: int | None, watermark: int | None) -> tuple[str, dict]:
+    """SELECT for one table; for the claim tables, only the rows with a rowid
+    in (since, watermark], i.e. loaded after the previous run"""
+    columns = [f"t.{column}" for column in default_catalog().columns[table]]
+    columns += [f"{expr} AS {name}" for name, expr in DERIVED.get(table, {}).items()]
+    sql = f"SELECT {', '.join(columns)} FROM {table} t"
+    if table not in CLAIM_TABLES:
+        return sql, {}
+    if since is None:
+        return sql + " WHERE t.rowid <= :watermark", {"watermark": watermark}
+    return sql + " WHERE t.rowid > :since AND t.rowid <= :watermark", {"since": since, "watermark": watermark}
+
+
+def _watermarks(conn: sqlite3.Connection) -> dict:
+    """table -> [max rowid, key of that row] for the claim tables"""
+    marks = {}
+    for table in CLAIM_TABLES:
+        row = conn.execute(f"SELECT rowid, claim_id FROM {table} ORDER BY rowid DESC LIMIT 1").fetchone()
+        marks[table] = list(row) if row else [0, None]
+    return marks
+
+
+def _watermarks_hold(conn: sqlite3.Connection, marks) -> bool:
+    """Whether each previous watermark row still has its rowid, so rowids above it are new rows"""
+    if not isinstance(marks, dict) or set(marks) != set(CLAIM_TABLES):
+        return False  # a manifest from before rowid watermarks
+    for table, (rowid, key) in marks.items():
+        if rowid and conn.execute(f"SELECT claim_id FROM {table} WHERE rowid = ?", (rowid,)).fetchone() != (key,):
+            return False
+    return True
+
+
+def read_manifest(root) -> dict | None:
+    path = Path(root) / MANIFEST
+    return json.loads(path.read_text()) if path.exists() else None
+
+
+def _write_manifest(root: Path, manifest: dict) -> None:
+    tmp = root / f"{MANIFEST}.tmp"
+    tmp.write_text(json.dumps(manifest, indent=1))
+    os.replace(tmp, root / MANIFEST)
+
+
+def export(db: str = DB_PATH, root: str = SNAPSHOT_DIR, fmt: str = "parquet", full: bool = False) -> dict:
+    """Write one snapshot run; returns {table: rows written}.
+
+    The first run, and any ``full`` run, is built in a sibling directory and
+    swapped in whole; later runs append claims and rewrite the other tables.
+    A failed incremental run removes the part files it wrote.
+    """
+    import pyarrow.dataset as ds
+
+    root = Path(root)
+    previous = None if full else read_manifest(root)
+    if previous is None and root.exists() and read_manifest(root) is None and any(root.iterdir()):
+        raise ValueError(f"{root} exists and holds no snapshot")
+    if previous is not None and previous["format"] != fmt:
+        raise ValueError(f"snapshot in {root} is {previous['format']}; export with --full to switch formats")
+    run = time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+    # pyarrow pulls the record batches from its own thread
+    conn = sqlite3.connect(f"file:{db}?mode=ro", uri=True, isolation_level=None, check_same_thread=False)
+    conn.execute("BEGIN")  # one read transaction: every table comes from the same database state
+    tables, counts, target = {}, {}, None
+    try:
+        if previous is not None and not _watermarks_hold(conn, previous["watermark"]):
+            previous = None  # rows renumbered or deleted: rowids no longer tell new rows apart
+        target = root if previous is not None else root.with_name(f"{root.name}.{run}")
+        watermark = _watermarks(conn)
+        for table in TABLES:
+            schema = arrow_schema(table)
+            since = previous["watermark"][table][0] if previous is not None and table in CLAIM_TABLES else None
+            sql, params = _select(table, since, watermark.get(table, [None])[0])
+            partitioning = list(PARTITIONS.get(table, ()))
+            files = []
+            counts[table] = 0
+            ds.write_dataset(
+                _batches(conn.execute(sql, params), schema, counts, table), target / table, schema=schema,
+                format=fmt, partitioning=partitioning or None, partitioning_flavor="hive" if partitioning else None,
+                basename_template=f"part-{run}-{{i}}.{FORMATS[fmt]}", existing_data_behavior="overwrite_or_ignore",
+                max_rows_per_group=BATCH_ROWS, file_visitor=lambda f: files.append(f.path),
+            )
+            kept = previous["tables"][table] if previous is not None and table in CLAIM_TABLES else {}
+            tables[table] = {"files": kept.get("files", []) + [str(Path(path).relative_to(target)) for path in files],
+                             "rows": kept.get("rows", 0) + counts[table], "partitioning": partitioning}
+    except BaseException:
+        if target is not None and previous is None:
+            shutil.rmtree(target, ignore_errors=True)
+        elif target is not None:
+            # Everything this run wrote, including a file pyarrow had not finished
+            for path in target.rglob(f"part-{run}-*"):
+                path.unlink(missing_ok=True)
+        raise
+    finally:
+        conn.execute("COMMIT")
+        conn.close()
+
+    manifest = {"format": fmt, "run": run, "exported_at": time.time(), "watermark": watermark,
+                "source": str(db), "tables": tables}
+    _write_manifest(target, manifest)
+    if previous is None:
+        if root.exists():
+            old = root.with_name(f"{root.name}.old-{run}")
+            os.replace(root, old)
+            os.replace(target, root)
+            shutil.rmtree(old)
+        else:
+            os.replace(target, root)
+        return counts
+
+    # Rewritten tables: drop the files the new manifest no longer lists
+    for table, entry in previous["tables"].items():
+        if table not in CLAIM_TABLES:
+            for path in set(entry["files"]) - set(tables[table]["files"]):
+                (root / path).unlink(missing_ok=True)
+    return counts
+
+
+class SnapshotQuery:
+    """Read-only DuckDB session over the tables of a snapshot.
+
+    Each table is a view over exactly the files its manifest lists. Parquet
+    is scanned with DuckDB's own reader; Arrow IPC files go through a
+    memory-mapped pyarrow dataset.
+    """
+
+    def __init__(self, root: str = SNAPSHOT_DIR, threads: int | None = None):
+        import duckdb
+
+        self.root = Path(root)
+        self.manifest = read_manifest(self.root)
+        if self.manifest is None:
+            raise FileNotFoundError(f"no snapshot in {self.root}; run: python snapshots.py export")
+        self.conn = duckdb.connect()
+        if threads:
+            self.conn.execute(f"SET threads = {int(threads)}")
+        self._datasets = {}
+        for table, entry in self.manifest["tables"].items():
+            self._register(table, entry)
+
+    def _register(self, table: str, entry: dict) -> None:
+        files = [str(self.root / path) for path in entry["files"]]
+        if not files:
+            # Nothing exported yet: an empty view with the table's columns
+            import pyarrow as pa
+
+            self.conn.register(table, pa.table({f.name: pa.array([], f.type) for f in arrow_schema(table)}))
+        elif self.manifest["format"] == "parquet":
+            listed = ", ".join("'" + path.replace("'", "''") + "'" for path in files)
+            hive = "true" if entry["partitioning"] else "false"
+            self.conn.execute(f"CREATE VIEW {table} AS SELECT * FROM read_parquet([{listed}], "
+                              f"hive_partitioning = {hive}, union_by_name = true)")
+        else:
+            import pyarrow as pa
+            import pyarrow.dataset as ds
+            from pyarrow import fs
+
+            schema = arrow_schema(table)
+            partitioning = ds.partitioning(pa.schema([schema.field(name) for name in entry["partitioning"]]),
+                                           flavor="hive") if entry["partitioning"] else None
+            dataset = ds.dataset(files, schema=schema, format="ipc", partitioning=partitioning,
+                                 partition_base_dir=str(self.root / table),
+                                 filesystem=fs.LocalFileSystem(use_mmap=True))
+            self._datasets[table] = dataset  # DuckDB scans it in place; keep it alive
+            self.conn.register(table, dataset)
+
+    @property
+    def age(self) -> float:
+        """Seconds since the snapshot was exported"""
+        return time.time() - self.manifest["exported_at"]
+
+    def answers(self, sql: str) -> bool:
+        """Whether ``sql`` is an aggregate question the snapshot can answer:
+        a SELECT with GROUP BY or aggregate functions over snapshot tables only"""
+        try:
+            tree = sqlglot.parse_one(sql, read="sqlite")
+        except sqlglot.errors.ParseError:
+            return False
+        if not isinstance(tree, exp.Select):
+            return False
+        ctes = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+        tables = {table.name.lower() for table in tree.find_all(exp.Table)} - ctes
+        if not tables or not tables <= set(self.manifest["tables"]):
+            return False
+        return bool(tree.args.get("group")) or any(isinstance(e.unalias(), exp.AggFunc) for e in tree.expressions)
+
+    def run(self, sql: str, params: dict | None = None) -> tuple[list[str], list[tuple]]:
+        """Run SQLite-dialect SQL (``:name`` parameters) on the snapshot; returns (columns, rows)"""
+        query = sqlglot.transpile(sql, read="sqlite", write="duckdb")[0]
+        cursor = self.conn.execute(query, params or {})
+        return [col[0] for col in cursor.description], cursor.fetchall()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def status(db: str, manifest: dict) -> dict:
+    """table -> (rows in ``db``, rows in the snapshot)"""
+    conn = sqlite3.connect(f"file:{db}?mode=ro", uri=True)
+    try:
+        return {table: (conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0], entry.get("rows"))
+                for table, entry in manifest["tables"].items()}
+    finally:
+        conn.close()
+
+
+def open_snapshot(root: str = SNAPSHOT_DIR) -> SnapshotQuery | None:
+    """The snapshot in ``root``, or None if none has been exported"""
+    return SnapshotQuery(root) if read_manifest(root) is not None else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--dir", default=SNAPSHOT_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("export", help="write a snapshot, incrementally unless --full")
+    run.add_argument("--format", choices=list(FORMATS), default="parquet")
+    run.add_argument("--full", action="store_true", help="rebuild every table from scratch")
+    sub.add_parser("status", help="show the snapshot's watermark, age and file counts")
+    query = sub.add_parser("query", help="run an SQLite-dialect query on the snapshot")
+    query.add_argument("sql")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        start = time.perf_counter()
+        manifest = read_manifest(args.dir)
+        fmt = manifest["format"] if manifest is not None and not args.full else args.format
+        counts = export(args.db, args.dir, fmt=fmt, full=args.full)
+        for table, rows in counts.items():
+            print(f"{table}: {rows} rows")
+        print(f"export of {sum(counts.values())} rows to {args.dir} done in {time.perf_counter() - start:.1f}s")
+        return
+
+    manifest = read_manifest(args.dir)
+    if manifest is None:
+        raise SystemExit(f"no snapshot in {args.dir}")
+    if args.command == "status":
+        print(f"format: {manifest['format']}, age: {time.time() - manifest['exported_at']:.0f}s")
+        for table, (db_rows, snapshot_rows) in status(args.db, manifest).items():
+            behind = f", {db_rows - snapshot_rows:+} rows in {args.db}" if snapshot_rows not in (None, db_rows) else ""
+            print(f"{table}: {len(manifest['tables'][table]['files'])} files, {snapshot_rows} rows{behind}")
+        return
+
+    snapshot = SnapshotQuery(args.dir)
+    start = time.perf_counter()
+    columns, rows = snapshot.run(args.sql)
+    elapsed = (time.perf_counter() - start) * 1000
+    snapshot.close()
+    print("\t".join(columns))
+    for row in rows:
+        print("\t".join("" if v is None else str(v) for v in row))
+    print(f"({len(rows)} rows in {elapsed:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""Persistent natural-language -> SQL cache for the SQL agent.
+
+Questions are normalized (case, whitespace, trailing punctuation) and their
+literal IDs, dates, numbers and quoted strings are lifted out, so "claims for
+User1 over 500" and "Claims for User7 over 20?" share one entry. The
+validated SQL is stored with those literals turned into named parameters
+(:p0 for strings, :n0 for numbers, ...) and keyed by the normalized question
+plus a fingerprint of the tables.py schema, so a schema change never serves
+stale SQL. With an encoder, a question that misses exactly can still hit a
+cached paraphrase by embedding similarity, but only one whose skeleton (the
+kinds of its literals, in order) is the same. Each hit binds the asking
+question's own literals, never the cached question's.
+
+    cache = SQLCache(encode=model.encode)
+    hit = cache.lookup(question)          # CachedSQL(sql, params, kind) or None
+    ...generate, validate and run the SQL...
+    cache.store(question, sql, generation_ms)
+"""
+import hashlib
+import re
+import sqlite3
+import threading
+from typing import NamedTuple
+
+import numpy as np
+
+from tables import schema_sql
+
+CACHE_PATH = "nl_sql_cache.db"
+# Cosine similarity a paraphrase needs to reuse another question's SQL
+SEMANTIC_THRESHOLD = 0.92
+
+# Literals lifted out of questions as (kind, pattern), most specific first;
+# the template keeps a <kind> placeholder for each
+LITERAL_PATTERNS = [
+    ("text", r"'([^']+)'"),
+    ("text", r'"([^"]+)"'),
+    ("id", r"\b([0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12})\b"),
+    ("date", r"\b(\d{4}-\d{2}-\d{2})\b"),
+    ("month", r"\b(\d{4}-\d{2})\b"),
+    # Entity IDs as the data uses them: User1, prov3, POL0000000042, CLM..., PA..., etc.
+    ("id", r"\b((?:User|prov|POL|CLM|PLN|PAY|AUD|DOC|PA|COM)\d+)\b"),
+    ("number", r"(?<![\w.-])(\d+(?:\.\d+)?)(?!\w|[.-]\d)"),
+]
+_LITERAL = re.compile("|".join(pattern for _, pattern in LITERAL_PATTERNS))
+_KIND = re.compile(r"<(\w+)>")
+# A string literal, or a number outside one
+_SQL_LITERAL = re.compile(r"'((?:[^']|'')*)'|(?<![\w.:])(\d+(?:\.\d+)?)(?![\w.])")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_SQL_PARAM = re.compile(r":([pn])(\d+)\b")
+
+_schema = """
+CREATE TABLE IF NOT EXISTS nl_sql_cache (
+    key TEXT PRIMARY KEY,
+    schema_hash TEXT,
+    template TEXT,
+    sql TEXT,
+    param_count INTEGER,
+    embedding BLOB,
+    generation_ms REAL,
+    hits INTEGER DEFAULT 0,
+    saved_ms REAL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_hit_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_nl_sql_cache_schema ON nl_sql_cache (schema_hash);
+"""
+
+
+class CachedSQL(NamedTuple):
+    sql: str
+    params: dict
+    kind: str  # "exact" or "semantic"
+
+
+def schema_fingerprint(sql: str = schema_sql) -> str:
+    return hashlib.sha256(sql.encode()).hexdigest()[:16]
+
+
+def normalize_question(question: str) -> tuple[str, list[str]]:
+    """(template, literals): the question with each literal replaced by <kind>"""
+    literals = []
+
+    def lift(match):
+        group = next(i for i, value in enumerate(match.groups()) if value is not None)
+        literals.append(match.group(group + 1))
+        return f" <{LITERAL_PATTERNS[group][0]}> "
+
+    template = _LITERAL.sub(lift, question)
+    template = re.sub(r"\s+", " ", template.lower()).strip().rstrip("?.!").strip()
+    return template, literals
+
+
+def skeleton(template: str) -> list[str]:
+    """Kinds of a template's literals, in order"""
+    return _KIND.findall(template)
+
+
+def _number(value: str) -> int | float:
+    return int(value) if value.isdigit() else float(value)
+
+
+def parameterize(sql: str, literals: list[str]) -> str | None:
+    """Replace each question literal's SQL literal with :p<i> (a string) or :n<i> (a number).
+
+    Returns None if some literal does not appear in the SQL, or a number
+    appears more than once (it may be an unrelated constant): then the SQL
+    cannot safely be reused for other values.
+    """
+    if len(set(literals)) != len(literals):
+        return None  # a repeated value can't tell which slot each SQL literal fills
+    strings, numbers = set(), []
+
+    def swap(match):
+        text, number = match.groups()
+        for i, value in enumerate(literals):
+            if text is not None and text.replace("''", "'") == value:
+                strings.add(i)
+                return f":p{i}"
+            if number is not None and _NUMBER.fullmatch(value) and _number(number) == _number(value):
+                numbers.append(i)
+                return f":n{i}"
+        return match.group(0)
+
+    parameterized = _SQL_LITERAL.sub(swap, sql)
+    if len(numbers) != len(set(numbers)) or strings | set(numbers) != set(range(len(literals))):
+        return None
+    return parameterized
+
+
+def bind(sql: str, literals: list[str]) -> dict:
+    """Parameters for parameterized ``sql`` from the asking question's literals"""
+    return {f"{kind}{i}": _number(literals[int(i)]) if kind == "n" else literals[int(i)]
+            for kind, i in _SQL_PARAM.findall(sql)}
+
+
+def _normalize(vector) -> np.ndarray:
+    vector = np.asarray(np.squeeze(vector), dtype=np.float32)
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+class SQLCache:
+    """NL -> parameterized SQL entries in a small SQLite file.
+
+    Entries for the current schema fingerprint are mirrored in memory, with
+    their template embeddings in one matrix for the similarity fallback.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, encode=None, threshold: float = SEMANTIC_THRESHOLD,
+                 schema_hash: str | None = None):
+        self.encode = encode
+        self.threshold = threshold
+        self.schema_hash = schema_hash or schema_fingerprint()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_schema)
+        self._entries = {}
+        self._keys = []
+        self._vectors = []
+        self._matrix = None
+        for key, template, sql, count, blob, gen_ms in self._conn.execute(
+            "SELECT key, template, sql, param_count, embedding, generation_ms "
+            "FROM nl_sql_cache WHERE schema_hash = ?", (self.schema_hash,)
+        ):
+            vector = np.frombuffer(blob, dtype=np.float32) if blob else None
+            self._remember(key, template, sql, count, vector, gen_ms)
+        self._stats = {"lookups": 0, "hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0,
+                       "rejected": 0, "saved_ms": 0.0}
+
+    def _key(self, template: str) -> str:
+        return hashlib.sha256(f"{self.schema_hash}\0{template}".encode()).hexdigest()
+
+    def _remember(self, key, template, sql, count, vector, gen_ms) -> None:
+        if key not in self._entries and vector is not None:
+            self._keys.append(key)
+            self._vectors.append(vector)
+            self._matrix = None
+        self._entries[key] = (template, sql, count, gen_ms or 0.0)
+
+    def _semantic_match(self, template: str, vector: np.ndarray) -> str | None:
+        if not self._vectors:
+            return None
+        if self._matrix is None:
+            self._matrix = np.vstack(self._vectors)
+        scores = self._matrix @ vector
+        # Best candidate first; only entries taking the same kinds of literals in the same order qualify
+        kinds = skeleton(template)
+        for i in np.argsort(-scores):
+            if scores[i] < self.threshold:
+                return None
+            if skeleton(self._entries[self._keys[i]][0]) == kinds:
+                return self._keys[i]
+        return None
+
+    def lookup(self, question: str) -> CachedSQL | None:
+        template, literals = normalize_question(question)
+        key = self._key(template)
+        with self._lock:
+            self._stats["lookups"] += 1
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] != len(literals):
+                entry = None
+            searchable = entry is None and self.encode is not None and bool(self._vectors)
+        kind, vector = "exact", None
+        if searchable:
+            # Encode outside the lock so a slow model call doesn't hold up other lookups
+            vector = _normalize(self.encode(template))
+        with self._lock:
+            if vector is not None:
+                key = self._semantic_match(template, vector)
+                entry = self._entries.get(key) if key else None
+                kind = "semantic"
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            self._stats["semantic_hits"] += kind == "semantic"
+            self._stats["saved_ms"] += entry[3]
+        self._conn.execute(
+            "UPDATE nl_sql_cache SET hits = hits + 1, saved_ms = saved_ms + generation_ms, "
+            "last_hit_at = CURRENT_TIMESTAMP WHERE key = ?", (key,))
+        return CachedSQL(entry[1], bind(entry[1], literals), kind)
+
+    def store(self, question: str, sql: str, generation_ms: float = 0.0) -> bool:
+        """Cache validated SQL for ``question``; False if it can't be parameterized"""
+        template, literals = normalize_question(question)
+        parameterized = parameterize(sql, literals)
+        if parameterized is None:
+            with self._lock:
+                self._stats["rejected"] += 1
+            return False
+        vector = _normalize(self.encode(template)) if self.encode is not None else None
+        key = self._key(template)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO nl_sql_cache "
+            "(key, schema_hash, template, sql, param_count, embedding, generation_ms) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, self.schema_hash, template, parameterized, len(literals),
+             vector.tobytes() if vector is not None else None, generation_ms),
+        )
+        with self._lock:
+            self._remember(key, template, parameterized, len(literals), vector, generation_ms)
+            self._stats["stores"] += 1
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        stats["hit_rate"] = stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+        return stats
+
+    def close(self) -> None:
+        self._conn.close()
+
@@ -0,0 +1,265 @@
+"""Static validation and repair of generated SQL, with no database round trip.
+
+The schema catalog (tables, typed columns, keys, foreign keys) is compiled
+once from tables.py into dict lookups plus a trigram index over every table
+and column name. ``validate`` parses candidate SQL with sqlglot once and
+walks its scopes:
+
+- every table and column reference is resolved against the catalog
+- misspelled identifiers are replaced by their closest trigram match
+- an unconstrained cross join involving a large table is rejected
+- a query that could return a large table unbounded (no LIMIT, no
+  aggregate, no equality on a key column) is rejected
+
+    result = SQLValidator().validate(sql)
+    if result.ok: run(result.sql)
+"""
+import sqlite3
+from collections import defaultdict
+from typing import NamedTuple
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.optimizer.scope import traverse_scope
+
+from tables import TABLES, schema_sql
+
+# Reference tables small enough to read whole
+SMALL_TABLES = {"insurance_providers", "provider_plans"}
+# Minimum trigram similarity for an identifier repair
+REPAIR_CUTOFF = 0.45
+
+
+class ValidationResult(NamedTuple):
+    ok: bool
+    sql: str              # the repaired SQL when repairs were applied
+    errors: list[str]
+    repairs: dict         # original identifier -> replacement
+
+
+def _trigrams(name: str) -> set[str]:
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NgramIndex:
+    """Trigram postings over a fixed set of identifiers"""
+
+    def __init__(self, names):
+        self.names = {name: _trigrams(name) for name in names}
+        self.postings = defaultdict(set)
+        for name, grams in self.names.items():
+            for gram in grams:
+                self.postings[gram].add(name)
+
+    def closest(self, name: str, allowed=None, cutoff: float = REPAIR_CUTOFF) -> str | None:
+        grams = _trigrams(name)
+        overlap = defaultdict(int)
+        for gram in grams:
+            for candidate in self.postings.get(gram, ()):
+                if allowed is None or candidate in allowed:
+                    overlap[candidate] += 1
+        best, best_score = None, cutoff
+        for candidate, shared in overlap.items():
+            score = shared / (len(grams) + len(self.names[candidate]) - shared)
+            if score > best_score or (score == best_score and best is not None and candidate < best):
+                best, best_score = candidate, score
+        return best
+
+
+class Catalog:
+    """Tables, columns, key columns and foreign keys, compiled from a schema script"""
+
+    def __init__(self, sql: str = schema_sql, tables: list[str] = TABLES):
+        conn = sqlite3.connect(":memory:")
+        conn.executescript(sql)
+        self.columns = {}
+        self.keys = {}
+        self.foreign_keys = {}
+        for table in tables:
+            info = conn.execute(f"PRAGMA table_info({table})").fetchall()
+            self.columns[table] = {name.lower(): decl.upper() for _, name, decl, _, _, _ in info}
+            fks = conn.execute(f"PRAGMA foreign_key_list({table})").fetchall()
+            self.foreign_keys[table] = [(row[3].lower(), row[2], row[4].lower()) for row in fks]
+            # Equality on any of these bounds the rows returned (a key or an indexed FK)
+            self.keys[table] = {name.lower() for _, name, _, _, _, pk in info if pk} | {
+                column for column, _, _ in self.foreign_keys[table]}
+        conn.close()
+        self.table_index = NgramIndex(self.columns)
+        self.column_index = NgramIndex({c for cols in self.columns.values() for c in cols})
+
+
+_catalog = None
+
+
+def default_catalog() -> Catalog:
+    global _catalog
+    if _catalog is None:
+        _catalog = Catalog()
+    return _catalog
+
+
+class SQLValidator:
+    def __init__(self, catalog: Catalog | None = None, small_tables: set = SMALL_TABLES, dialect: str = "sqlite"):
+        self.catalog = catalog or default_catalog()
+        self.small_tables = small_tables
+        self.dialect = dialect
+
+    def validate(self, sql: str) -> ValidationResult:
+        try:
+            tree = sqlglot.parse_one(sql, read=self.dialect)
+        except sqlglot.errors.ParseError as e:
+            return ValidationResult(False, sql, [f"parse error: {e}"], {})
+        if not isinstance(tree, exp.Query):
+            return ValidationResult(False, sql, [f"only SELECT statements are allowed, got {tree.key.upper()}"], {})
+        errors, repairs = [], {}
+
+        self._resolve_tables(tree, errors, repairs)
+        for scope in traverse_scope(tree):
+            self._resolve_columns(scope, errors, repairs)
+            self._check_joins(scope, errors)
+        if not errors:
+            self._check_bounded(tree, errors)
+
+        repaired = tree.sql(dialect=self.dialect) if repairs else sql
+        return ValidationResult(not errors, repaired, errors, repairs)
+
+    def _resolve_tables(self, tree, errors, repairs) -> None:
+        ctes = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+        for table in tree.find_all(exp.Table):
+            name = table.name.lower()
+            if not name or name in self.catalog.columns or name in ctes:
+                continue
+            if isinstance(table.parent, exp.Func) or table.args.get("db"):
+                continue  # table-valued functions such as json_each
+            fix = self.catalog.table_index.closest(name)
+            if fix is None:
+                errors.append(f"unknown table '{name}'")
+                continue
+            repairs[name] = fix
+            table.set("this", exp.to_identifier(fix))
+
+    def _frame(self, scope) -> tuple:
+        """The names one scope makes visible: tables by alias, derived tables' outputs, opaque sources"""
+        tables = {alias.lower(): source.name.lower() for alias, source in scope.sources.items()
+                  if isinstance(source, exp.Table) and source.name.lower() in self.catalog.columns}
+        derived = {alias.lower(): {n.lower() for n in getattr(source.expression, "named_selects", [])}
+                   for alias, source in scope.sources.items() if not isinstance(source, exp.Table)}
+        opaque = any(not isinstance(source, exp.Table) and not hasattr(source, "expression")
+                     for source in scope.sources.values())
+        in_scope = set().union(*(self.catalog.columns[t] for t in tables.values())) if tables else set()
+        return tables, derived, opaque, in_scope
+
+    def _resolve_columns(self, scope, errors, repairs) -> None:
+        # Innermost scope first; correlated subqueries may reference any enclosing one
+        frames, outer = [], scope
+        while outer is not None:
+            frames.append((outer, self._frame(outer)))
+            outer = outer.parent
+        in_scope = frames[0][1][3]
+        # Select-list aliases, which ORDER BY / HAVING may reference
+        outputs = {e.alias.lower() for e in getattr(scope.expression, "expressions", []) if isinstance(e, exp.Alias)}
+        # A subquery's outer references also show up here; they are checked in the subquery's own scope
+        nested = {id(c) for child in scope.subquery_scopes for c in child.columns}
+
+        for column in scope.columns:
+            if id(column) in nested:
+                continue
+            name = column.name.lower()
+            qualifier = column.table.lower() if column.table else None
+            if qualifier:
+                owner = next((frame for s, frame in frames if qualifier in s.sources), None)
+                if owner is None:
+                    errors.append(f"unknown table or alias '{qualifier}' for column '{name}'")
+                    continue
+                owner_tables, owner_derived = owner[0], owner[1]
+                if qualifier in owner_derived:
+                    if name not in owner_derived[qualifier]:
+                        errors.append(f"unknown column '{qualifier}.{name}'")
+                    continue
+                if qualifier not in owner_tables:
+                    continue
+                table = owner_tables[qualifier]
+                known = self.catalog.columns[table]
+            else:
+                if name in outputs or any(
+                    name in frame_columns or opaque_source or any(name in cols for cols in frame_derived.values())
+                    for _, (_, frame_derived, opaque_source, frame_columns) in frames
+                ):
+                    continue
+                table, known = None, in_scope
+            if name in known:
+                continue
+            fix = self.catalog.column_index.closest(name, allowed=known)
+            if fix is None:
+                where = f" in {table}" if table else ""
+                errors.append(f"unknown column '{name}'{where}")
+                continue
+            repairs[name] = fix
+            column.set("this", exp.to_identifier(fix))
+
+    def _is_big(self, source) -> bool:
+        return isinstance(source, exp.Table) and source.name.lower() in self.catalog.columns \
+            and source.name.lower() not in self.small_tables
+
+    def _check_joins(self, scope, errors) -> None:
+        select = scope.expression
+        if not isinstance(select, exp.Select):
+            return
+        where = select.args.get("where")
+        for join in select.args.get("joins") or ():
+            if join.args.get("on") or join.args.get("using"):
+                continue
+            # Table-valued functions (json_each) join per row; only tables multiply
+            joined = join.this
+            if not isinstance(joined, exp.Table) or joined.name.lower() not in self.catalog.columns:
+                continue
+            if not any(self._is_big(source) for source in scope.sources.values()):
+                continue
+            alias = joined.alias_or_name.lower()
+            # A comma join constrained in WHERE (a.x = b.y) is a regular join
+            if where is not None and any(
+                isinstance(eq.left, exp.Column) and isinstance(eq.right, exp.Column)
+                and alias in {eq.left.table.lower(), eq.right.table.lower()}
+                and eq.left.table.lower() != eq.right.table.lower()
+                for eq in where.find_all(exp.EQ)
+            ):
+                continue
+            errors.append(f"unconstrained cross join with '{joined.sql(dialect=self.dialect)}'")
+
+    def _check_bounded(self, tree, errors) -> None:
+        select = tree
+        if not isinstance(select, exp.Select) or select.args.get("limit"):
+            return
+        if not select.args.get("group") and any(
+            isinstance(e.unalias(), exp.AggFunc) for e in select.expressions
+        ):
+            return  # plain aggregate: one row
+        scope = next(s for s in traverse_scope(tree) if s.expression is select)
+        big = {alias.lower(): source.name.lower() for alias, source in scope.sources.items() if self._is_big(source)}
+        if not big:
+            return
+        where = select.args.get("where")
+        bound = set()
+        for eq in where.find_all(exp.EQ) if where is not None else ():
+            column, other = (eq.left, eq.right) if isinstance(eq.left, exp.Column) else (eq.right, eq.left)
+            if not isinstance(column, exp.Column) or isinstance(other, exp.Column):
+                continue
+            for alias, table in big.items():
+                if (not column.table or column.table.lower() == alias) and column.name.lower() in self.catalog.keys[table]:
+                    bound.add(alias)
+        if not bound and not select.args.get("group"):
+            errors.append(f"no LIMIT on a query over large table(s) {', '.join(sorted(set(big.values())))}; "
+                          "add a LIMIT or filter on a key column")
+
+
+
+def route_after_validation(state: dict) -> str:
+    """Next agent graph node once validate_sql has run.
+
+    Rejected SQL (a single query or any step of a plan) is never executed:
+    the rejection goes straight to the response.
+    """
+    if state.get("sql_valid") is False:
+        return "format_response"
+    return "execute_plan" if state.get("sql_plan") else "execute"
@@ -0,0 +1,174 @@
+"""Chunked streaming of large list-tool results over MCP progress notifications.
+
+A streaming tool reads its rows CHUNK_ROWS at a time from one cursor on a
+worker thread (a server-side cursor on Postgres). Each chunk is encoded and
+sent to the client as the message of a progress notification, with the
+running row count as the progress value:
+
+    {"chunk": 0, "columns": [...], "rows": [[...], ...]}
+
+At most QUEUE_CHUNKS encoded chunks wait between the database thread and
+the client. A slow client therefore blocks the fetch, and peak memory
+depends on the chunk size, not on how many rows match. The tool result is
+only a summary:
+
+    {"columns": [...], "row_count": n, "chunks": k, "truncated": false, "next_cursor": null}
+
+If the client cancels the request, the fetch stops before the next chunk
+and the pooled connection goes back to the pool. A client that sends no
+progress token cannot receive chunks, so it gets one regular page instead.
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from db_pool import QUERY_DEADLINE
+from instrumentation import record_rows, sql_timer
+from pagination import KEYSETS, next_cursor_fn
+from result_encoder import encode_chunk
+
+CHUNK_ROWS = 500
+MAX_CHUNK_ROWS = 5000
+MAX_STREAM_ROWS = 100_000
+# Encoded chunks buffered per stream before the fetch waits for the client
+QUEUE_CHUNKS = 2
+# Streams hold a connection for as long as the client takes to read them
+MAX_STREAMS = 2
+STREAM_TIMEOUT = 120.0
+
+
+class StreamCancelled(Exception):
+    """Raised on the fetching thread once the client cancelled the stream"""
+
+
+def can_stream(ctx) -> bool:
+    """Whether the client asked for progress notifications on this request"""
+    meta = ctx.request_context.meta
+    return meta is not None and meta.progressToken is not None
+
+
+class ResultStreamer:
+    """Streams query results to MCP clients with bounded buffering.
+
+    Streams run on their own small thread pool, so they never occupy the
+    query executor's workers, and at most ``max_streams`` run at once.
+    """
+
+    def __init__(self, backend, max_streams: int = MAX_STREAMS, queue_chunks: int = QUEUE_CHUNKS):
+        self.backend = backend
+        self.max_streams = max_streams
+        self.queue_chunks = queue_chunks
+        self._executor = ThreadPoolExecutor(max_workers=max_streams, thread_name_prefix="stream")
+        self._semaphore = asyncio.Semaphore(max_streams)
+        self._lock = threading.Lock()
+        self._stats = {"streams": 0, "active": 0, "completed": 0, "cancelled": 0, "failed": 0,
+                       "chunks": 0, "rows": 0, "bytes": 0, "max_chunk_bytes": 0}
+
+    def _count(self, **deltas) -> None:
+        with self._lock:
+            for name, delta in deltas.items():
+                self._stats[name] += delta
+
+    async def call(self, fn, *args):
+        """Run a blocking function on a stream worker; for the non-streaming fallback"""
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            ctx = contextvars.copy_context()
+            return await loop.run_in_executor(self._executor, functools.partial(ctx.run, fn, *args))
+
+    def _produce(self, query: str, params: dict, chunk_rows: int, max_rows: int, tool: str | None,
+                 deliver, stop: threading.Event) -> str:
+        """Fetch, encode and hand over chunks; returns the summary document"""
+        row_count = chunks = 0
+        truncated = False
+        last_row = None
+        with sql_timer(), self.backend.cursor(query, params, stream=True) as cursor:
+            columns = [col[0] for col in cursor.description or ()]
+            cursor_fn = next_cursor_fn(tool, cursor.description) if tool in KEYSETS else None
+            while not stop.is_set():
+                # One row past max_rows tells a truncated result from an exact fit
+                rows = cursor.fetchmany(min(chunk_rows, max_rows + 1 - row_count))
+                if row_count + len(rows) > max_rows:
+                    rows, truncated = rows[:max_rows - row_count], True
+                if rows:
+                    deliver(len(rows), encode_chunk(chunks, columns, rows))
+                    chunks += 1
+                    row_count += len(rows)
+                    last_row = rows[-1]
+                if truncated or not rows:
+                    break
+            cursor.close()
+        record_rows(row_count)
+        token = cursor_fn(last_row) if truncated and cursor_fn and last_row is not None else None
+        return json.dumps({"columns": columns, "row_count": row_count, "chunks": chunks,
+                           "truncated": truncated, "next_cursor": token}, separators=(",", ":"), default=str)
+
+    async def stream(self, ctx, query: str, params: dict, chunk_rows: int = CHUNK_ROWS,
+                     max_rows: int = MAX_STREAM_ROWS, tool: str | None = None) -> str:
+        """Send ``query``'s rows to the client as progress notifications.
+
+        ``tool`` names the keyset (pagination.py) the query is ordered by;
+        a stream cut at ``max_rows`` then ends with a next_cursor that the
+        tool's paginated form accepts.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        credits = threading.BoundedSemaphore(self.queue_chunks)
+        stop = threading.Event()
+
+        def deliver(rows: int, chunk: str) -> None:
+            while not credits.acquire(timeout=0.1):
+                if stop.is_set():
+                    raise StreamCancelled
+            loop.call_soon_threadsafe(queue.put_nowait, (rows, chunk))
+
+        def produce() -> str | None:
+            try:
+                return self._produce(query, params, chunk_rows, max_rows, tool, deliver, stop)
+            except StreamCancelled:
+                return None
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, None)
+
+        async with self._semaphore:
+            context = contextvars.copy_context()
+            context.run(QUERY_DEADLINE.set, time.monotonic() + STREAM_TIMEOUT)
+            self._count(streams=1, active=1)
+            future = loop.run_in_executor(self._executor, context.run, produce)
+            sent = 0
+            try:
+                while (item := await queue.get()) is not None:
+                    rows, chunk = item
+                    sent += rows
+                    await ctx.report_progress(sent, message=chunk)
+                    credits.release()
+                    self._count(chunks=1, rows=rows, bytes=len(chunk))
+                    with self._lock:
+                        self._stats["max_chunk_bytes"] = max(self._stats["max_chunk_bytes"], len(chunk))
+                summary = await future
+                self._count(completed=1)
+                return summary
+            except asyncio.CancelledError:
+                self._count(cancelled=1)
+                raise
+            except Exception:
+                self._count(failed=1)
+                raise
+            finally:
+                # Cancelled or failed while sending: the fetch stops before its next chunk
+                stop.set()
+                self._count(active=-1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["max_streams"] = self.max_streams
+        stats["queue_chunks"] = self.queue_chunks
+        return stats
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,260 @@
+"""Materialized summary tables for provider and claim analytics.
+
+Questions like "total approved claim amount by provider" or "claims with
+missing documents and pending pre-authorizations" would otherwise be full
+GROUP BY scans over claims, claim_documents and pre_authorizations on every
+ask. Two summaries answer them instead:
+
+- summary_provider_month: per provider, service month and claim_type, the
+  claim counts by status and the claimed / approved totals
+- summary_missing_documents: one row per claim without any document, with
+  the number of pending pre-authorizations its user has
+
+Triggers on the source tables record which buckets (service months for the
+rollup, users for the flag table) changed in summary_dirty. ``refresh``
+recomputes only those buckets, and summary_state records when each summary
+was last refreshed so readers can judge its staleness.
+
+    python summaries.py --db claims.db refresh
+    python summaries.py --db claims.db refresh --interval 60
+    python summaries.py --db claims.db status
+"""
+import argparse
+import json
+import sqlite3
+import time
+
+SUMMARY_TABLES = ["summary_provider_month", "summary_missing_documents", "summary_state"]
+
+summary_sql = """
+CREATE TABLE IF NOT EXISTS summary_provider_month (
+    provider_id TEXT,
+    month TEXT,
+    claim_type TEXT,
+    claim_count INTEGER,
+    approved_count INTEGER,
+    pending_count INTEGER,
+    rejected_count INTEGER,
+    amount_claimed REAL,
+    amount_approved REAL,
+    PRIMARY KEY (provider_id, month, claim_type)
+);
+
+CREATE TABLE IF NOT EXISTS summary_missing_documents (
+    claim_id TEXT PRIMARY KEY,
+    user_id TEXT,
+    provider_id TEXT,
+    claim_type TEXT,
+    service_date DATE,
+    status TEXT,
+    amount_claimed REAL,
+    pending_preauths INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS idx_summary_missing_documents_user
+    ON summary_missing_documents (user_id);
+
+CREATE TABLE IF NOT EXISTS summary_dirty (
+    summary TEXT,
+    bucket TEXT,
+    PRIMARY KEY (summary, bucket)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS summary_state (
+    summary TEXT PRIMARY KEY,
+    refreshed_at TIMESTAMP,
+    mode TEXT,
+    buckets_refreshed INTEGER,
+    row_count INTEGER,
+    refresh_ms REAL
+);
+"""
+
+_MONTH = "strftime('%Y-%m', {row}.service_date)"
+
+
+# Marks use an upsert clause, not INSERT OR IGNORE: inside a trigger fired by
+# an upsert's DO UPDATE (import_data.py), SQLite overrides OR IGNORE with
+# the outer statement's ABORT, and a second mark of one bucket then fails
+def _mark_month(row: str) -> str:
+    return (f"INSERT INTO summary_dirty (summary, bucket) "
+            f"SELECT 'summary_provider_month', {_MONTH.format(row=row)} WHERE {row}.service_date IS NOT NULL "
+            f"ON CONFLICT DO NOTHING;")
+
+
+def _mark_user(row: str, user: str = "{row}.user_id") -> str:
+    user = user.format(row=row)
+    return (f"INSERT INTO summary_dirty (summary, bucket) "
+            f"SELECT 'summary_missing_documents', {user} WHERE {user} IS NOT NULL ON CONFLICT DO NOTHING;")
+
+
+_CLAIM_OWNER = "(SELECT user_id FROM claims WHERE claim_id = {row}.claim_id)"
+
+# Dirty-bucket triggers: (name, timing, statements)
+TRIGGERS = [
+    ("trg_claims_summary_insert", "AFTER INSERT ON claims",
+     [_mark_month("NEW"), _mark_user("NEW")]),
+    ("trg_claims_summary_update", "AFTER UPDATE ON claims",
+     [_mark_month("OLD"), _mark_month("NEW"), _mark_user("OLD"), _mark_user("NEW")]),
+    ("trg_claims_summary_delete", "AFTER DELETE ON claims",
+     [_mark_month("OLD"), _mark_user("OLD")]),
+    ("trg_claim_documents_summary_insert", "AFTER INSERT ON claim_documents",
+     [_mark_user("NEW", _CLAIM_OWNER)]),
+    ("trg_claim_documents_summary_update", "AFTER UPDATE OF claim_id ON claim_documents",
+     [_mark_user("OLD", _CLAIM_OWNER), _mark_user("NEW", _CLAIM_OWNER)]),
+    ("trg_claim_documents_summary_delete", "AFTER DELETE ON claim_documents",
+     [_mark_user("OLD", _CLAIM_OWNER)]),
+    ("trg_pre_authorizations_summary_insert", "AFTER INSERT ON pre_authorizations",
+     [_mark_user("NEW")]),
+    ("trg_pre_authorizations_summary_update", "AFTER UPDATE OF user_id, status ON pre_authorizations",
+     [_mark_user("OLD"), _mark_user("NEW")]),
+    ("trg_pre_authorizations_summary_delete", "AFTER DELETE ON pre_authorizations",
+     [_mark_user("OLD")]),
+]
+
+# Rollup of one service month; the range predicate is answered from
+# idx_claims_service_date (indexes.py) without touching the claims rows
+_PROVIDER_MONTH = """
+    INSERT INTO summary_provider_month
+    SELECT provider_id, strftime('%Y-%m', service_date), claim_type,
+           count(*),
+           sum(status = 'Approved'), sum(status = 'Pending'), sum(status = 'Rejected'),
+           round(sum(amount_claimed), 2), round(sum(coalesce(amount_approved, 0)), 2)
+    FROM claims
+    WHERE service_date >= :lo AND service_date < :hi
+    GROUP BY 1, 2, 3
+"""
+
+_MISSING_DOCUMENTS = """
+    INSERT INTO summary_missing_documents
+    SELECT c.claim_id, c.user_id, c.provider_id, c.claim_type, c.service_date,
+           c.status, c.amount_claimed,
+           (SELECT count(*) FROM pre_authorizations pa
+            WHERE pa.user_id = c.user_id AND pa.status = 'Pending')
+    FROM claims c
+    WHERE {users}
+      AND NOT EXISTS (SELECT 1 FROM claim_documents d WHERE d.claim_id = c.claim_id)
+"""
+
+_STATUS = """
+    SELECT s.summary, s.refreshed_at, s.mode, s.buckets_refreshed, s.row_count, s.refresh_ms,
+           round((julianday('now') - julianday(s.refreshed_at)) * 86400, 1) AS age_seconds,
+           (SELECT count(*) FROM summary_dirty d WHERE d.summary = s.summary) AS pending_buckets
+    FROM summary_state s
+    ORDER BY s.summary
+"""
+
+
+def create_summaries(conn: sqlite3.Connection) -> None:
+    """Create the summary tables and the triggers that mark changed buckets"""
+    for statement in filter(str.strip, summary_sql.split(";")):
+        conn.execute(statement)
+    for name, timing, statements in TRIGGERS:
+        # Recreated every time, so databases built with older trigger bodies pick up fixes
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"CREATE TRIGGER {name} {timing} BEGIN {' '.join(statements)} END")
+
+
+def _next_month(month: str) -> str:
+    year, mon = int(month[:4]), int(month[5:7])
+    return f"{year + mon // 12:04d}-{mon % 12 + 1:02d}"
+
+
+def _refresh_provider_month(conn: sqlite3.Connection, buckets: list | None) -> None:
+    if buckets is None:
+        conn.execute("DELETE FROM summary_provider_month")
+        conn.execute(_PROVIDER_MONTH.replace("service_date >= :lo AND service_date < :hi",
+                                             "service_date IS NOT NULL"))
+        return
+    for month in buckets:
+        conn.execute("DELETE FROM summary_provider_month WHERE month = ?", (month,))
+        conn.execute(_PROVIDER_MONTH, {"lo": f"{month}-01", "hi": f"{_next_month(month)}-01"})
+
+
+def _refresh_missing_documents(conn: sqlite3.Connection, buckets: list | None) -> None:
+    if buckets is None:
+        conn.execute("DELETE FROM summary_missing_documents")
+        conn.execute(_MISSING_DOCUMENTS.format(users="1"))
+        return
+    users = json.dumps(buckets)
+    conn.execute("DELETE FROM summary_missing_documents WHERE user_id IN (SELECT value FROM json_each(?))",
+                 (users,))
+    conn.execute(_MISSING_DOCUMENTS.format(users="c.user_id IN (SELECT value FROM json_each(:users))"),
+                 {"users": users})
+
+
+REFRESHERS = {
+    "summary_provider_month": _refresh_provider_month,
+    "summary_missing_documents": _refresh_missing_documents,
+}
+
+
+def refresh(conn: sqlite3.Connection, full: bool = False) -> dict:
+    """Bring every summary up to date; returns {summary: buckets refreshed, or 'full'}.
+
+    A summary that has never been built, or ``full=True``, is rebuilt from
+    scratch. Each summary is refreshed in its own IMMEDIATE transaction, so
+    writes that mark new buckets while it runs are kept for the next refresh.
+    """
+    done = {}
+    for summary, refresher in REFRESHERS.items():
+        start = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            built = conn.execute("SELECT 1 FROM summary_state WHERE summary = ?", (summary,)).fetchone()
+            buckets = None
+            if built and not full:
+                buckets = [b for (b,) in conn.execute(
+                    "SELECT bucket FROM summary_dirty WHERE summary = ?", (summary,))]
+            if buckets != []:
+                refresher(conn, buckets)
+            conn.execute("DELETE FROM summary_dirty WHERE summary = ?", (summary,))
+            row_count = conn.execute(f"SELECT count(*) FROM {summary}").fetchone()[0]
+            conn.execute(
+                "INSERT OR REPLACE INTO summary_state "
+                "(summary, refreshed_at, mode, buckets_refreshed, row_count, refresh_ms) "
+                "VALUES (?, datetime('now'), ?, ?, ?, ?)",
+                (summary, "full" if buckets is None else "incremental",
+                 None if buckets is None else len(buckets), row_count,
+                 round((time.perf_counter() - start) * 1000, 2)),
+            )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        done[summary] = "full" if buckets is None else len(buckets)
+    return done
+
+
+def status(conn: sqlite3.Connection) -> list[dict]:
+    """Last refresh of each summary, its age and how many buckets are waiting"""
+    cursor = conn.execute(_STATUS)
+    columns = [col[0] for col in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor]
+
+
+if __name__ == "__main__":
+    from tables import create_schema
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("refresh", "status"))
+    parser.add_argument("--db", default="claims.db")
+    parser.add_argument("--full", action="store_true", help="rebuild every summary from scratch")
+    parser.add_argument("--interval", type=float, help="keep refreshing every INTERVAL seconds")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, isolation_level=None, timeout=30.0)
+    if args.command == "status":
+        for row in status(conn):
+            print(row)
+    else:
+        create_schema(conn)
+        while True:
+            start = time.perf_counter()
+            result = refresh(conn, full=args.full)
+            print(f"refreshed {result} in {time.perf_counter() - start:.2f}s")
+            if not args.interval:
+                break
+            args.full = False
+            time.sleep(args.interval)
+    conn.close()
@@ -1,10 +1,13 @@
 # Re-run after kernel reset: Re-creating the schema
 
+import re
 import sqlite3
 
-# Connect to SQLite database
-conn = sqlite3.connect("claims.db")
-cursor = conn.cursor()
+from coverage_usage import create_coverage_triggers
+from fulltext import create_fulltext
+from indexes import create_indexes
+from result_cache import create_change_counters
+from summaries import SUMMARY_TABLES, create_summaries
 
 # Schema creation commands
 schema_sql = """
@@ -188,7 +191,32 @@ CREATE TABLE IF NOT EXISTS user_preferences (
 );
 """
 
-# Execute the schema creation
-cursor.executescript(schema_sql)
-conn.commit()
-conn.close()
+TABLES = re.findall(r"CREATE TABLE IF NOT EXISTS (\w+)", schema_sql)
+
+
+def create_schema(conn: sqlite3.Connection) -> None:
+    """Create every table, the managed index set, full-text indexes and the maintenance triggers; safe to re-run"""
+    conn.executescript(schema_sql)
+    create_summaries(conn)
+    create_indexes(conn)
+    create_coverage_triggers(conn)
+    create_fulltext(conn)
+    create_change_counters(conn, TABLES + SUMMARY_TABLES)
+    conn.commit()
+
+
+if __name__ == "__main__":
+    from backends import DATABASE_URL
+
+    if DATABASE_URL.startswith("sqlite:///"):
+        conn = sqlite3.connect(DATABASE_URL[len("sqlite:///"):])
+        create_schema(conn)
+        conn.close()
+    else:
+        # Postgres: schema.sql plus the managed and text search indexes (backends.py)
+        import psycopg
+
+        from backends import create_postgres_schema
+
+        with psycopg.connect(DATABASE_URL) as conn:
+            create_postgres_schema(conn)
@@ -0,0 +1,27 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tables import create_schema  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """An empty claims database with the full schema, indexes and triggers"""
+    path = str(tmp_path / "claims.db")
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    create_schema(conn)
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = sqlite3.connect(db_path)
+    yield conn
+    conn.close()
@@ -0,0 +1,76 @@
+"""Postgres backend tests; set CLAIMS_TEST_DATABASE_URL to a postgresql:// URL to run them.
+
+Each run loads a small generated database into its own Postgres schema and
+drops it afterwards.
+"""
+import os
+import time
+from urllib.parse import quote
+
+import pytest
+
+from backends import STREAM_ROWS, PostgresBackend, check, copy_from_sqlite, create_postgres_schema
+from db_pool import QUERY_DEADLINE, QueryTimeout
+from generate_data import DEFAULT_COUNTS, generate
+
+TEST_DATABASE_URL = os.environ.get("CLAIMS_TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="CLAIMS_TEST_DATABASE_URL is not set")
+
+COUNTS = dict(DEFAULT_COUNTS, providers=5, users=200, policies=240, claims=2_000,
+              pre_authorizations=100, communications=300)
+
+
+@pytest.fixture(scope="module")
+def backend(tmp_path_factory):
+    import psycopg
+
+    schema = f"claims_test_{os.getpid()}"
+    path = str(tmp_path_factory.mktemp("pg") / "claims.db")
+    generate(path, COUNTS, seed=3, chunk_rows=500)
+    separator = "&" if "?" in TEST_DATABASE_URL else "?"
+    url = f"{TEST_DATABASE_URL}{separator}options={quote(f'-csearch_path={schema}')}"
+    with psycopg.connect(TEST_DATABASE_URL, autocommit=True) as conn:
+        conn.execute(f"CREATE SCHEMA {schema}")
+    try:
+        with psycopg.connect(url) as conn:
+            create_postgres_schema(conn)
+            copy_from_sqlite(conn, path)
+        backend = PostgresBackend(url, size=2)
+        yield backend
+        backend.close()
+    finally:
+        with psycopg.connect(TEST_DATABASE_URL, autocommit=True) as conn:
+            conn.execute(f"DROP SCHEMA {schema} CASCADE")
+
+
+def test_every_tool_query_runs(backend):
+    results = check(backend)
+    failed = {tool: result for tool, result in results.items() if isinstance(result, str)}
+    assert not failed
+    assert results["get_claims_by_user_id"][0] > 0
+
+
+def test_stream_uses_a_named_cursor(backend):
+    query = "SELECT claim_id FROM claims ORDER BY claim_id"
+    with backend.cursor(query) as cursor:
+        expected = cursor.fetchall()
+    with backend.cursor(query, stream=True) as cursor:
+        assert cursor.name  # a server-side cursor, fetched itersize rows at a time
+        assert cursor.itersize == STREAM_ROWS
+        assert list(cursor) == expected
+    assert len(expected) == COUNTS["claims"]
+
+
+def test_deadline_sets_statement_timeout(backend):
+    token = QUERY_DEADLINE.set(time.monotonic() + 0.2)
+    try:
+        start = time.perf_counter()
+        with pytest.raises(QueryTimeout):
+            with backend.cursor("SELECT pg_sleep(5)") as cursor:
+                cursor.fetchall()
+        assert time.perf_counter() - start < 2
+    finally:
+        QUERY_DEADLINE.reset(token)
+    with backend.cursor("SHOW statement_timeout") as cursor:
+        assert cursor.fetchone()[0] == "0"  # SET LOCAL ended with the transaction
@@ -0,0 +1,39 @@
+from cost_guard import TableStats
+
+
+def add_claims(conn, start, n, user_id):
+    conn.executemany("INSERT INTO claims (claim_id, user_id, service_date) VALUES (?, ?, '2024-01-01')",
+                     [(f"CLM{i}", user_id) for i in range(start, start + n)])
+    conn.commit()
+
+
+def test_row_count_follows_writes(conn, db_path):
+    stats = TableStats(db_path)
+    assert stats.row_count("claims") == 0
+    add_claims(conn, 0, 25, "User1")
+    assert stats.row_count("claims") == 25
+    assert stats.row_count("no_such_table") is None
+
+
+def test_fanout_recount_is_rate_limited(conn, db_path):
+    add_claims(conn, 0, 40, "User1")
+    stats = TableStats(db_path, recount_seconds=3600)
+    assert stats.fanout("idx_claims_user_service_date", 1) == 40.0
+    # A write makes the fan-out stale, but the table was recounted too recently to scan again
+    add_claims(conn, 40, 40, "User2")
+    assert stats.fanout("idx_claims_user_service_date", 1) == 40.0
+    assert stats.row_count("claims") == 80
+
+    stats.recount_seconds = 0
+    assert stats.fanout("idx_claims_user_service_date", 1) == 80 / 2
+    add_claims(conn, 80, 20, "User3")
+    assert stats.fanout("idx_claims_user_service_date", 1) == 100 / 3
+
+
+def test_fanout_prefers_sqlite_stat1(conn, db_path):
+    add_claims(conn, 0, 30, "User1")
+    conn.execute("ANALYZE")
+    conn.commit()
+    stats = TableStats(db_path)
+    assert stats.fanout("idx_claims_user_service_date", 1) == 30.0
+    assert stats.row_count("claims") == 30
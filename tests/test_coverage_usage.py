@@ -0,0 +1,71 @@
+import pytest
+
+from coverage_usage import rebuild, verify
+
+INSERT = ("INSERT INTO claims (claim_id, user_id, claim_type, service_date, status, amount_approved) "
+          "VALUES (?, ?, ?, ?, ?, ?)")
+
+
+def used(conn, user_id="User1", claim_type="dental", year=2024):
+    row = conn.execute("SELECT used_coverage FROM coverage_limits WHERE user_id = ? AND claim_type = ? AND year = ?",
+                       (user_id, claim_type, year)).fetchone()
+    return row and row[0]
+
+
+@pytest.fixture
+def claims(conn):
+    conn.execute("INSERT INTO coverage_limits VALUES ('User1', 'dental', 2024, 1000.0, 0.0)")
+    conn.executemany(INSERT, [
+        ("CLM1", "User1", "dental", "2024-02-01", "Approved", 100.0),
+        ("CLM2", "User1", "dental", "2024-05-01", "Approved", 50.0),
+        ("CLM3", "User1", "dental", "2024-06-01", "Pending", None),
+    ])
+    conn.commit()
+    return conn
+
+
+def test_insert_adds_approved_amounts(claims):
+    assert used(claims) == 150.0
+    # Usage with no coverage_limits row yet gets one
+    claims.execute(INSERT, ("CLM4", "User1", "vision", "2023-03-01", "Approved", 20.0))
+    assert used(claims, claim_type="vision", year=2023) == 20.0
+
+
+def test_status_and_amount_updates(claims):
+    claims.execute("UPDATE claims SET status = 'Approved', amount_approved = 30.0 WHERE claim_id = 'CLM3'")
+    assert used(claims) == 180.0
+    claims.execute("UPDATE claims SET amount_approved = 70.0 WHERE claim_id = 'CLM1'")
+    assert used(claims) == 150.0
+    claims.execute("UPDATE claims SET status = 'Rejected' WHERE claim_id = 'CLM2'")
+    assert used(claims) == 100.0
+    # Moving a claim to another year moves its amount
+    claims.execute("UPDATE claims SET service_date = '2025-01-10' WHERE claim_id = 'CLM1'")
+    assert (used(claims), used(claims, year=2025)) == (30.0, 70.0)
+
+
+def test_delete_subtracts(claims):
+    claims.execute("DELETE FROM claims WHERE claim_id = 'CLM1'")
+    assert used(claims) == 50.0
+
+
+def test_replace_needs_recursive_triggers(claims):
+    replace = INSERT.replace("INSERT", "INSERT OR REPLACE")
+    claims.execute("PRAGMA recursive_triggers=ON")
+    claims.execute(replace, ("CLM1", "User1", "dental", "2024-02-01", "Approved", 10.0))
+    assert used(claims) == 60.0
+    claims.execute("PRAGMA recursive_triggers=OFF")
+    claims.execute(replace, ("CLM1", "User1", "dental", "2024-02-01", "Approved", 20.0))
+    assert used(claims) == 80.0  # the replaced 10.0 is still counted
+    assert not verify(claims)["ok"]
+
+
+def test_verify_after_rebuild(claims):
+    claims.execute("UPDATE coverage_limits SET used_coverage = 999.0")
+    claims.execute("DELETE FROM coverage_limits WHERE claim_type = 'vision'")
+    claims.execute("DROP TRIGGER trg_claims_coverage_insert")
+    claims.execute(INSERT, ("CLM4", "User1", "vision", "2024-03-01", "Approved", 20.0))
+    report = verify(claims)
+    assert (report["ok"], report["drifted"], report["missing"]) == (False, 1, 1)
+    assert rebuild(claims) == 2
+    assert verify(claims) == {"ok": True, "drifted": 0, "missing": 0, "examples": []}
+    assert (used(claims), used(claims, claim_type="vision")) == (150.0, 20.0)
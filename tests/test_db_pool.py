@@ -0,0 +1,16 @@
+import os
+
+import pytest
+
+from db_pool import ConnectionPool
+
+
+def test_missing_database_is_not_created(tmp_path):
+    path = str(tmp_path / "missing.db")
+    with pytest.raises(FileNotFoundError, match="missing.db"):
+        ConnectionPool(path)
+    assert not os.path.exists(path)
+
+
+def test_existing_database_switches_to_wal(db_path):
+    assert ConnectionPool(db_path).journal_mode == "wal"
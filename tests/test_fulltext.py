@@ -0,0 +1,24 @@
+from fulltext import check, match_query, vacuum
+
+
+def search(conn, text):
+    return [row[0] for row in conn.execute(
+        "SELECT c.claim_id FROM claims_fts JOIN claims c ON c.rowid = claims_fts.rowid "
+        "WHERE claims_fts MATCH ? ORDER BY c.claim_id", (match_query(text),))]
+
+
+def test_vacuum_reindexes_renumbered_rows(conn):
+    conn.executemany("INSERT INTO claims (claim_id, description) VALUES (?, ?)",
+                     [("CLM1", "root canal"), ("CLM2", "eye exam"), ("CLM3", "root filling")])
+    conn.commit()
+    assert search(conn, "root") == ["CLM1", "CLM3"]
+
+    # What a VACUUM renumbering looks like to the index: same rows, new rowids
+    conn.execute("UPDATE claims SET rowid = rowid + 10")
+    conn.commit()
+    assert search(conn, "root") != ["CLM1", "CLM3"]
+
+    vacuum(conn)
+    assert search(conn, "root") == ["CLM1", "CLM3"]
+    assert search(conn, "eye") == ["CLM2"]
+    assert all(error is None for error in check(conn).values())
@@ -0,0 +1,18 @@
+import hashlib
+
+from generate_data import DEFAULT_COUNTS, generate
+
+COUNTS = dict(DEFAULT_COUNTS, providers=5, users=200, policies=240, claims=2_000,
+              pre_authorizations=100, communications=300)
+
+
+def _digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def test_seed_yields_identical_database(tmp_path):
+    first, second = str(tmp_path / "a.db"), str(tmp_path / "b.db")
+    generate(first, COUNTS, seed=7, chunk_rows=500, workers=2)
+    generate(second, COUNTS, seed=7, chunk_rows=500, workers=2)
+    assert _digest(first) == _digest(second)
@@ -0,0 +1,87 @@
+import csv
+
+import pytest
+
+import import_data
+from import_data import connect, import_file
+
+
+def write_csv(path, header, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return str(path)
+
+
+@pytest.fixture
+def importer(tmp_path):
+    conn = connect(str(tmp_path / "claims.db"))
+    conn.executemany("INSERT INTO users (user_id, name) VALUES (?, ?)", [("User1", "a"), ("User2", "b")])
+    yield conn
+    conn.close()
+
+
+class Crash(Exception):
+    pass
+
+
+def read_rejects(path):
+    with open(path + ".rejects.csv", newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def test_bad_rows_go_to_the_rejects_file(importer, tmp_path):
+    path = write_csv(tmp_path / "claims.csv", ["claim_id", "user_id", "service_date", "amount_claimed"], [
+        ["CLM1", "User1", "2024-03-05", "10.5"],
+        ["CLM2", "User9", "2024-03-05", "1"],         # no such user
+        ["CLM3", "User2", "05/03/2024", "1"],         # not a date
+        ["", "User2", "2024-03-05", "1"],             # no key
+        ["CLM5", "User2", "2024-03-06", "twelve"],    # not a number
+        ["CLM6", "User2", "2024-03-07T09:30:00", "3"],
+    ])
+    result = import_file(importer, "claims", path, chunk_rows=4)
+    assert (result["rows"], result["rejected"]) == (2, 4)
+    assert importer.execute("SELECT claim_id, service_date, amount_claimed FROM claims ORDER BY claim_id").fetchall() \
+        == [("CLM1", "2024-03-05", 10.5), ("CLM6", "2024-03-07", 3.0)]
+    reasons = {row["claim_id"]: row["_error"] for row in read_rejects(path)}
+    assert set(reasons) == {"CLM2", "CLM3", "", "CLM5"}
+    assert reasons["CLM2"].startswith("user_id: no users row")
+    assert reasons[""] == "claim_id: key column is empty"
+
+
+def test_rejected_role_outside_check_set(importer, tmp_path):
+    path = write_csv(tmp_path / "auth.csv", ["user_id", "role"], [["User1", "admin"], ["User2", "root"]])
+    assert import_file(importer, "auth_users", path)["rejected"] == 1
+    assert "role: 'root' not in" in read_rejects(path)[0]["_error"]
+
+
+def test_interrupted_import_resumes_after_the_last_committed_chunk(importer, tmp_path, monkeypatch):
+    rows = [[f"CLM{i}", "User1", "2024-03-05", str(i)] for i in range(10)]
+    path = write_csv(tmp_path / "claims.csv", ["claim_id", "user_id", "service_date", "amount_claimed"], rows)
+
+    write = import_data.ChunkWriter.write
+    chunks = []
+
+    def crash_on_third_chunk(self, conn, raw_rows):
+        chunks.append([row[0] for row in raw_rows])
+        if len(chunks) == 3:
+            raise Crash
+        return write(self, conn, raw_rows)
+
+    monkeypatch.setattr(import_data.ChunkWriter, "write", crash_on_third_chunk)
+    with pytest.raises(Crash):
+        import_file(importer, "claims", path, chunk_rows=3)
+    assert importer.execute("SELECT COUNT(*) FROM claims").fetchone()[0] == 6
+
+    chunks.clear()
+    result = import_file(importer, "claims", path, chunk_rows=3)
+    assert chunks == [["CLM6", "CLM7", "CLM8"], ["CLM9"]]
+    assert result["rows"] == 4
+    assert importer.execute("SELECT COUNT(*) FROM claims").fetchone()[0] == 10
+
+    # A finished file is skipped; a changed one starts from the top
+    monkeypatch.undo()
+    assert import_file(importer, "claims", path, chunk_rows=3)["skipped"]
+    write_csv(path, ["claim_id", "user_id", "service_date", "amount_claimed"], rows + [["CLM10", "User2", "", "1"]])
+    assert import_file(importer, "claims", path, chunk_rows=3)["rows"] == 11
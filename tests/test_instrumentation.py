@@ -0,0 +1,53 @@
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from mcp.server.fastmcp.exceptions import ToolError
+
+from instrumentation import _CALL, add_counts, counted, instrumented, record_rows, snapshot, sql_timer
+
+
+def section(rows):
+    for _ in range(rows):
+        with sql_timer():
+            time.sleep(0)
+        record_rows(1)
+    return rows
+
+
+def test_fanned_out_sections_count_separately():
+    call = {"sql_ms": 0.0, "rows": 0, "queries": 0}
+    token = _CALL.set(call)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, counted, section, 2000) for _ in range(8)]
+            results = [future.result() for future in futures]
+        # The sections never touched the tool's counters directly
+        assert call == {"sql_ms": 0.0, "rows": 0, "queries": 0}
+        for _, counters in results:
+            add_counts(counters)
+    finally:
+        _CALL.reset(token)
+    assert [result for result, _ in results] == [2000] * 8
+    assert call["rows"] == call["queries"] == 16000
+    assert call["sql_ms"] == sum(counters["sql_ms"] for _, counters in results)
+
+
+def test_counted_outside_a_tool_call():
+    assert counted(section, 3) == (3, None)
+    add_counts(None)
+
+
+def test_raised_tool_error_counts_as_error():
+    @instrumented
+    def flaky_tool(fail: bool) -> str:
+        if fail:
+            raise ToolError("invalid cursor")
+        return "[]"
+
+    assert flaky_tool(fail=False) == "[]"
+    with pytest.raises(ToolError, match="invalid cursor"):
+        flaky_tool(fail=True)
+    stats = snapshot()["flaky_tool"]
+    assert (stats["calls"], stats["errors"]) == (2, 1)
@@ -0,0 +1,18 @@
+from multi_query import StepResult, SubQuery, merge, parse_plan
+
+
+def test_merge_flags_truncated_steps():
+    plan = parse_plan("-- step: claims\nselect claim_id from claims\n-- step: docs\nselect claim_id from claim_documents")
+    results = {
+        "claims": StepResult("claims", [{"claim_id": "C1"}, {"claim_id": "C2"}], 1.0, truncated=True),
+        "docs": StepResult("docs", [{"claim_id": "C2", "document_type": "receipt"}], 1.0),
+    }
+    merged = merge(plan, results)
+    assert merged.rows == [{"claim_id": "C2", "document_type": "receipt"}]
+    assert merged.truncated == ["claims"]
+
+
+def test_merge_complete_when_no_step_truncated():
+    plan = [SubQuery("a", "select 1"), SubQuery("b", "select 1", how="left")]
+    results = {"a": StepResult("a", [{"user_id": "User1"}], 1.0), "b": StepResult("b", [], 1.0)}
+    assert merge(plan, results) == ([{"user_id": "User1"}], [])
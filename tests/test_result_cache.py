@@ -0,0 +1,63 @@
+import pytest
+
+from queries import QUERIES
+from result_cache import ResultCache
+
+
+@pytest.fixture
+def user_claims(conn, db_path):
+    """A cached tool over claims (with its policies join) and a counter of real queries"""
+    cache = ResultCache(db_path)
+    calls = []
+
+    @cache.cached(QUERIES["get_claims_by_user_id"])
+    def claims_by_user(user_id: str) -> list:
+        calls.append(user_id)
+        return [row[0] for row in conn.execute("SELECT claim_id FROM claims WHERE user_id = ? ORDER BY claim_id",
+                                               (user_id,))]
+
+    conn.execute("INSERT INTO claims (claim_id, user_id) VALUES ('CLM1', 'User1')")
+    conn.commit()
+    return cache, claims_by_user, calls
+
+
+def test_repeat_call_is_served_from_cache(user_claims):
+    cache, claims_by_user, calls = user_claims
+    assert claims_by_user("User1") == ["CLM1"]
+    assert claims_by_user("User1") == ["CLM1"]
+    assert calls == ["User1"]
+    assert cache.stats()["tools"]["claims_by_user"]["hits"] == 1
+
+
+def test_write_to_a_read_table_invalidates(conn, user_claims):
+    cache, claims_by_user, calls = user_claims
+    claims_by_user("User1")
+    conn.execute("INSERT INTO claims (claim_id, user_id) VALUES ('CLM2', 'User1')")
+    conn.commit()
+    assert claims_by_user("User1") == ["CLM1", "CLM2"]
+    assert calls == ["User1", "User1"]
+    assert cache.stats()["tools"]["claims_by_user"]["invalidated"] == 1
+
+    # Joined tables count too
+    conn.execute("INSERT INTO policies (policy_id, user_id) VALUES ('POL1', 'User1')")
+    conn.commit()
+    claims_by_user("User1")
+    assert len(calls) == 3
+
+
+def test_write_to_an_unrelated_table_keeps_the_entry(conn, user_claims):
+    _, claims_by_user, calls = user_claims
+    claims_by_user("User1")
+    conn.execute("INSERT INTO communications_log (log_id, user_id) VALUES ('COM1', 'User1')")
+    conn.commit()
+    claims_by_user("User1")
+    assert calls == ["User1"]
+
+
+def test_uncommitted_write_does_not_invalidate(conn, user_claims):
+    _, claims_by_user, calls = user_claims
+    claims_by_user("User1")
+    conn.execute("INSERT INTO claims (claim_id, user_id) VALUES ('CLM2', 'User1')")
+    assert claims_by_user("User1") == ["CLM1"]
+    conn.rollback()
+    assert calls == ["User1"]
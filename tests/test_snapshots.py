@@ -0,0 +1,77 @@
+import pytest
+
+pytest.importorskip("pyarrow")
+pytest.importorskip("duckdb")
+
+import snapshots  # noqa: E402
+from snapshots import SnapshotQuery, export, read_manifest, status  # noqa: E402
+
+
+def add_claims(conn, ids, submitted_at):
+    conn.executemany(
+        "INSERT INTO claims (claim_id, user_id, claim_type, service_date, amount_claimed, submitted_at) "
+        "VALUES (?, 'User1', 'dental', '2024-03-05', 10.0, ?)",
+        [(claim_id, submitted_at) for claim_id in ids],
+    )
+    conn.executemany("INSERT INTO dental_details (claim_id, category) VALUES (?, 'cleaning')", [(i,) for i in ids])
+    conn.commit()
+
+
+def snapshot_claims(root):
+    snapshot = SnapshotQuery(root)
+    try:
+        return sorted(row[0] for row in snapshot.run("SELECT claim_id FROM claims")[1])
+    finally:
+        snapshot.close()
+
+
+def test_incremental_export_picks_up_late_loaded_claims(conn, db_path, tmp_path):
+    root = tmp_path / "snap"
+    add_claims(conn, ["CLM1", "CLM2"], "2024-06-01 12:00:00")
+    assert export(db_path, root)["claims"] == 2
+    # A feed loaded later with older submission dates, and one with no date at all
+    add_claims(conn, ["CLM3"], "2023-01-01 00:00:00")
+    add_claims(conn, ["CLM4"], None)
+
+    counts = export(db_path, root)
+    assert counts["claims"] == 2 and counts["dental_details"] == 2
+    assert snapshot_claims(root) == ["CLM1", "CLM2", "CLM3", "CLM4"]
+    assert status(db_path, read_manifest(root))["claims"] == (4, 4)
+    assert export(db_path, root)["claims"] == 0
+
+
+def test_failed_incremental_run_leaves_no_part_files(conn, db_path, tmp_path, monkeypatch):
+    root = tmp_path / "snap"
+    add_claims(conn, ["CLM1"], "2024-06-01 12:00:00")
+    export(db_path, root)
+    before = sorted(p.relative_to(root) for p in root.rglob("part-*"))
+    manifest = read_manifest(root)
+    add_claims(conn, ["CLM2"], "2024-06-02 12:00:00")
+
+    batches = snapshots._batches
+
+    def failing(cursor, schema, counts, table):
+        if table == "dental_details":
+            raise OSError("disk full")
+        return batches(cursor, schema, counts, table)
+
+    monkeypatch.setattr(snapshots, "_batches", failing)
+    with pytest.raises(OSError):
+        export(db_path, root)
+    assert sorted(p.relative_to(root) for p in root.rglob("part-*")) == before
+    assert read_manifest(root) == manifest
+
+    monkeypatch.setattr(snapshots, "_batches", batches)
+    assert export(db_path, root)["claims"] == 1
+    assert snapshot_claims(root) == ["CLM1", "CLM2"]
+
+
+def test_missing_watermark_row_rebuilds_in_full(conn, db_path, tmp_path):
+    root = tmp_path / "snap"
+    add_claims(conn, ["CLM1", "CLM2"], "2024-06-01 12:00:00")
+    export(db_path, root)
+    conn.execute("DELETE FROM claims WHERE claim_id = 'CLM2'")
+    add_claims(conn, ["CLM3"], "2024-06-02 12:00:00")
+
+    assert export(db_path, root)["claims"] == 2
+    assert snapshot_claims(root) == ["CLM1", "CLM3"]
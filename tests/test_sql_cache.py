@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from sql_cache import SQLCache, normalize_question, parameterize
+
+
+def same_vector(text):
+    # Every question looks like a perfect paraphrase, so only the skeleton check can refuse a match
+    return np.ones(8, dtype=np.float32)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SQLCache(str(tmp_path / "nl_sql_cache.db"), encode=same_vector)
+    yield cache
+    cache.close()
+
+
+def test_questions_differing_in_a_number_bind_their_own_value(cache):
+    assert cache.store("claims for User1 over 500", "select claim_id from claims "
+                       "where user_id = 'User1' and amount_claimed > 500")
+    hit = cache.lookup("Claims for User7 over 20?")
+    assert hit.kind == "exact"
+    assert hit.sql == "select claim_id from claims where user_id = :p0 and amount_claimed > :n1"
+    assert hit.params == {"p0": "User7", "n1": 20}
+
+
+def test_questions_differing_in_a_date_bind_their_own_value(cache):
+    cache.store("claims serviced on 2024-03-05", "select claim_id from claims where service_date = '2024-03-05'")
+    hit = cache.lookup("claims serviced on 2023-11-30")
+    assert hit.params == {"p0": "2023-11-30"}
+
+
+def test_semantic_fallback_needs_the_same_skeleton(cache):
+    cache.store("total claimed in 2024-01", "select sum(amount_claimed) from claims "
+                "where substr(service_date, 1, 7) = '2024-01'")
+    # Same literal kinds: the paraphrase reuses the SQL with its own month
+    hit = cache.lookup("sum of claimed amounts for 2023-12")
+    assert hit.kind == "semantic" and hit.params == {"p0": "2023-12"}
+    # A number where the month was, or an extra literal: no reuse
+    assert cache.lookup("sum of claimed amounts for 2023") is None
+    assert cache.lookup("sum of claimed amounts for 2023-12 over 100") is None
+
+
+def test_lookup_encodes_without_holding_the_lock(tmp_path):
+    def encode(text):
+        assert not cache._lock.locked()
+        return same_vector(text)
+
+    cache = SQLCache(str(tmp_path / "nl_sql_cache.db"), encode=encode)
+    try:
+        cache.store("total claimed in 2024-01", "select sum(amount_claimed) from claims "
+                    "where substr(service_date, 1, 7) = '2024-01'")
+        assert cache.lookup("sum of claimed amounts for 2023-12").kind == "semantic"
+    finally:
+        cache.close()
+
+
+def test_numbers_that_also_look_like_constants_are_not_cached(cache):
+    # "1" is both the question's value and an unrelated flag in the SQL
+    assert parameterize("select claim_id from claims where active = 1 and amount_claimed > 1", ["1"]) is None
+    assert not cache.store("claims over 1", "select claim_id from claims where active = 1 and amount_claimed > 1")
+    assert cache.lookup("claims over 1") is None
+
+
+def test_normalize_question_lifts_typed_literals():
+    assert normalize_question("Top 5 claims for User3 since 2024-01-02, 'dental'?") == (
+        "top <number> claims for <id> since <date> , <text>", ["5", "User3", "2024-01-02", "dental"])
@@ -0,0 +1,52 @@
+from multi_query import SubQuery
+from sql_validator import SQLValidator, route_after_validation
+
+
+def test_rejected_query_routes_to_response():
+    result = SQLValidator().validate("select claim_id from claims")
+    assert not result.ok
+    assert any(error.startswith("no LIMIT") for error in result.errors)
+    state = {"sql_query": result.sql, "sql_plan": None, "sql_valid": result.ok}
+    assert route_after_validation(state) == "format_response"
+
+
+def test_rejected_plan_routes_to_response():
+    plan = [SubQuery("missing_docs", "select claim_id from claims where user_id = 'User1'"),
+            SubQuery("pending", "delete from pre_authorizations")]
+    results = [SQLValidator().validate(step.sql) for step in plan]
+    assert [r.ok for r in results] == [True, False]
+    state = {"sql_plan": plan, "sql_valid": all(r.ok for r in results)}
+    assert route_after_validation(state) == "format_response"
+
+
+def test_valid_sql_routes_to_execution():
+    result = SQLValidator().validate("select claim_id from claims where user_id = 'User1'")
+    assert result.ok
+    assert route_after_validation({"sql_valid": True, "sql_plan": None}) == "execute"
+    assert route_after_validation({"sql_valid": True, "sql_plan": [object()]}) == "execute_plan"
+
+
+def test_correlated_exists_resolves_outer_alias():
+    result = SQLValidator().validate(
+        "select c.claim_id from claims c where c.user_id = 'User1' and not exists "
+        "(select 1 from claim_documents d where d.claim_id = c.claim_id)")
+    assert result.ok, result.errors
+
+
+def test_in_subquery_resolves_its_own_columns():
+    result = SQLValidator().validate(
+        "select user_id from users where user_id in "
+        "(select user_id from claims where status = 'Pending') limit 5")
+    assert result.ok, result.errors
+
+
+def test_correlated_scalar_subquery_in_select_list():
+    validator = SQLValidator()
+    result = validator.validate(
+        "select u.user_id, (select count(*) from claims c where c.user_id = u.user_id) as n "
+        "from users u limit 5")
+    assert result.ok, result.errors
+    result = validator.validate(
+        "select u.user_id, (select count(*) from claims c where c.user_id = v.user_id) as n "
+        "from users u limit 5")
+    assert result.errors == ["unknown table or alias 'v' for column 'user_id'"]
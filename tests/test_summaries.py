@@ -0,0 +1,11 @@
+def test_upsert_marks_each_dirty_bucket_once(conn):
+    upsert = ("INSERT INTO claims (claim_id, user_id, service_date, amount_claimed) VALUES (?, ?, ?, ?) "
+              "ON CONFLICT (claim_id) DO UPDATE SET amount_claimed = excluded.amount_claimed")
+    rows = [("CLM1", "User1", "2024-03-05", 1.0), ("CLM2", "User1", "2024-03-20", 2.0)]
+    conn.executemany(upsert, rows)
+    conn.execute("DELETE FROM summary_dirty")
+    # Both updates mark the same month and user from inside the upsert's DO UPDATE
+    conn.executemany(upsert, [row[:3] + (row[3] * 10,) for row in rows])
+    conn.commit()
+    assert sorted(conn.execute("SELECT summary, bucket FROM summary_dirty")) == [
+        ("summary_missing_documents", "User1"), ("summary_provider_month", "2024-03")]